@@ -0,0 +1,293 @@
+"""
+Benchmarks for the pricing hot paths.
+
+Every engine is measured against a baseline on seeded synthetic books: the
+original pure-Python level walk (OrderBookWalker.simulate_trade on the ccxt
+dict) for the walker, a full prefix-sum rebuild per quote for the local
+book, and a per-row calculate_total_drag loop for the vectorized calculator. Speedups and regressions are comparable across commits:
+
+    python benchmarks/bench_core.py --output before.json
+    python benchmarks/bench_core.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from backend.calculator import CostCalculator
+from backend.local_book import FakeDeltaFeed, LocalBookEngine
+from backend.orderbook import OrderBookSnapshot
+from backend.simulation import OrderBookWalker, size_grid, slippage_curve
+
+# The baseline walk is O(levels) per call in Python; cap the calls it gets so
+# the 1M-level cases finish, and report per-call figures.
+BASELINE_MAX_CALLS = 200
+
+
+def synthetic_book(levels: int, seed: int = 0, mid: float = 30000.0) -> Dict[str, Any]:
+    """Seeded ccxt-style book with `levels` levels per side (lists of [price, amount])."""
+    rng = np.random.default_rng(seed)
+    tick = mid * 1e-5
+    asks = mid + tick * np.cumsum(rng.integers(1, 4, levels))
+    bids = mid - tick * np.cumsum(rng.integers(1, 4, levels))
+    return {
+        'asks': np.column_stack((asks, rng.lognormal(-1.0, 1.0, levels))).tolist(),
+        'bids': np.column_stack((bids, rng.lognormal(-1.0, 1.0, levels))).tolist(),
+        'timestamp': 1700000000000,
+        'nonce': seed
+    }
+
+
+def book_notional(book: Dict[str, Any], key: str = 'asks') -> float:
+    levels = np.asarray(book[key])
+    return float((levels[:, 0] * levels[:, 1]).sum())
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.5, max_calls: int = 10000, warmup: int = 1) -> Dict[str, float]:
+    """
+    Times repeated calls of `fn`.
+
+    Returns:
+        calls, ops_per_sec, latency percentiles in microseconds and peak traced
+        memory (bytes) of a single call.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples: List[float] = []
+    start = time.perf_counter()
+    while len(samples) < max_calls and (time.perf_counter() - start) < min_time or not samples:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lat = np.array(samples) * 1e6
+    return {
+        "calls": len(samples),
+        "ops_per_sec": len(samples) / lat.sum() * 1e6,
+        "p50_us": float(np.percentile(lat, 50)),
+        "p90_us": float(np.percentile(lat, 90)),
+        "p99_us": float(np.percentile(lat, 99)),
+        "max_us": float(lat.max()),
+        "peak_mem_bytes": int(peak)
+    }
+
+
+def bench_walker(levels: int, points: int, min_time: float) -> List[Dict[str, Any]]:
+    """Pricing `points` sizes on a `levels`-deep book: baseline loop vs compiled engines."""
+    book = synthetic_book(levels, seed=levels)
+    walker = OrderBookWalker()
+    sizes = size_grid(book_notional(book) * 0.9, points=points, scale='log')
+    snapshot = OrderBookSnapshot.from_ccxt(book)
+    results = []
+
+    # Baseline: one interpreted walk per size (sampled), scaled to the full grid
+    sample = sizes[np.linspace(0, points - 1, min(points, BASELINE_MAX_CALLS)).astype(int)]
+    state = {"i": 0}
+
+    def baseline_call():
+        walker.simulate_trade(book, 'buy', sample[state["i"] % len(sample)])
+        state["i"] += 1
+
+    per_call = measure(baseline_call, min_time=min_time, max_calls=len(sample))
+    results.append({
+        "name": "walker_loop_baseline", "levels": levels, "points": points, **per_call,
+        "grid_seconds": points / per_call["ops_per_sec"]
+    })
+    baseline = {"baseline": "walker_loop_baseline"}
+
+    compile_stats = measure(lambda: OrderBookSnapshot.from_ccxt(book).compile(), min_time=min_time, max_calls=200)
+    results.append({"name": "compile_from_ccxt", "levels": levels, "points": points, **compile_stats})
+
+    compiled = snapshot.compile()
+    many = measure(lambda: compiled.simulate_many('buy', sizes), min_time=min_time, max_calls=1000)
+    results.append({"name": "simulate_many", "levels": levels, "points": points, **many,
+                    "grid_seconds": 1 / many["ops_per_sec"], **baseline})
+
+    curve = measure(lambda: slippage_curve(compiled, 'buy', sizes), min_time=min_time, max_calls=1000)
+    results.append({"name": "slippage_curve", "levels": levels, "points": points, **curve,
+                    "grid_seconds": 1 / curve["ops_per_sec"], **baseline})
+    return results
+
+
+def bench_conversion(levels: int, min_time: float) -> List[Dict[str, Any]]:
+    """ccxt dict -> DataFrame depth (as the dashboard did) vs OrderBookSnapshot."""
+    book = synthetic_book(levels, seed=levels)
+
+    def dataframe_depth():
+        bids = pd.DataFrame([x[:2] for x in book['bids']], columns=['price', 'amount'])
+        asks = pd.DataFrame([x[:2] for x in book['asks']], columns=['price', 'amount'])
+        bids['cumulative'] = (bids['price'] * bids['amount']).cumsum()
+        asks['cumulative'] = (asks['price'] * asks['amount']).cumsum()
+
+    def snapshot_depth():
+        OrderBookSnapshot.from_ccxt(book).compile()
+
+    return [
+        {"name": "depth_dataframe_baseline", "levels": levels, **measure(dataframe_depth, min_time=min_time, max_calls=200)},
+        {"name": "depth_snapshot", "levels": levels, **measure(snapshot_depth, min_time=min_time, max_calls=200)},
+    ]
+
+
+def bench_local_book(levels: int, min_time: float) -> List[Dict[str, Any]]:
+    """One L2 delta then one quote on a `levels`-deep local book: full prefix-sum rebuild vs incremental quote."""
+    feed = FakeDeltaFeed(seed=levels, levels=levels, updates=20000, batch=1)
+    events = list(feed)
+    amount = 25.0 * levels  # About a tenth of a side (sizes average ~2.5 at a mid of 100)
+    results = []
+    for name, quote in (("local_book_rebuild_baseline", lambda book: book.compile().simulate_trade('buy', amount)),
+                        ("local_book_quote", lambda book: book.quote('buy', amount))):
+        engine = LocalBookEngine(iter(events))
+        engine.on_event(events[0])
+        state = {"i": 1}
+
+        def update_and_quote():
+            engine.on_event(events[state["i"]])  # Never wraps: max_calls stops before the last event
+            state["i"] += 1
+            quote(engine.book)
+
+        stats = measure(update_and_quote, min_time=min_time, max_calls=len(events) - 1)
+        row = {"name": name, "levels": levels, **stats, "grid_seconds": 1 / stats["ops_per_sec"]}
+        if name != "local_book_rebuild_baseline":
+            row["baseline"] = "local_book_rebuild_baseline"
+        results.append(row)
+    return results
+
+
+def bench_calculator(points: int, min_time: float) -> List[Dict[str, Any]]:
+    """Drag for `points` rows: calculate_total_drag once per row vs calculate_total_drag_many."""
+    calc = CostCalculator(exchange_fee_rate=0.001)
+    rng = np.random.default_rng(points)
+    prices = (30000.0 * (1 + rng.uniform(0, 0.01, points))).tolist()
+
+    def per_row():
+        for p in prices:
+            calc.calculate_total_drag(p, 30000.0, 'buy')
+
+    def vectorized():
+        calc.calculate_total_drag_many(prices, 30000.0, 'buy')
+
+    results = []
+    for name, fn, max_calls in (("calculate_total_drag_loop", per_row, 100),
+                                ("calculate_total_drag_many", vectorized, 10000)):
+        stats = measure(fn, min_time=min_time, max_calls=max_calls)
+        row = {"name": name, "points": points, **stats, "rows_per_sec": stats["ops_per_sec"] * points,
+               "grid_seconds": 1 / stats["ops_per_sec"]}
+        if name != "calculate_total_drag_loop":
+            row["baseline"] = "calculate_total_drag_loop"
+        results.append(row)
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+
+def run(levels: List[int], points: List[int], min_time: float = 0.5) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    for n_levels in levels:
+        results.extend(bench_conversion(n_levels, min_time))
+        results.extend(bench_local_book(n_levels, min_time))
+        for n_points in points:
+            results.extend(bench_walker(n_levels, n_points, min_time))
+    for n_points in points:
+        results.extend(bench_calculator(n_points, min_time))
+    return {"environment": environment(), "results": results}
+
+
+def result_key(r: Dict[str, Any]) -> tuple:
+    return (r["name"], r.get("levels"), r.get("points"))
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Lines describing ops/sec changes vs a previous run; regressions beyond `threshold` are flagged."""
+    prev = {result_key(r): r for r in previous["results"]}
+    lines = []
+    for r in current["results"]:
+        old = prev.get(result_key(r))
+        if old is None:
+            continue
+        change = r["ops_per_sec"] / old["ops_per_sec"] - 1
+        flag = "REGRESSION" if change < -threshold else ""
+        lines.append(f"{r['name']:<28} levels={r.get('levels')!s:>8} points={r.get('points')!s:>7} {change:+8.1%} {flag}")
+    return lines
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'benchmark':<28} {'levels':>8} {'points':>7} {'ops/s':>12} {'p50 us':>10} {'p99 us':>10} {'peak MB':>8}")
+    for r in report["results"]:
+        print(f"{r['name']:<28} {r.get('levels')!s:>8} {r.get('points')!s:>7} {r['ops_per_sec']:>12,.1f} "
+              f"{r['p50_us']:>10,.1f} {r['p99_us']:>10,.1f} {r['peak_mem_bytes'] / 1e6:>8.2f}")
+
+    # Speedup of the same work (a whole grid, or one update plus quote) vs its baseline
+    grids = {result_key(r): r for r in report["results"] if "grid_seconds" in r}
+    print("\nSpeedup vs baseline:")
+    for (name, levels, points), r in grids.items():
+        base = grids.get((r.get("baseline"), levels, points))
+        if base is not None:
+            print(f"  {name:<26} vs {r['baseline']:<28} levels={levels!s:>8} points={points!s:>7} "
+                  f"{base['grid_seconds'] / r['grid_seconds']:>10,.1f}x")
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(',') if v]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark walker, calculator and book conversion.")
+    parser.add_argument("--levels", type=parse_int_list, default=[100, 1000, 10000, 100000, 1000000], help="Book depths")
+    parser.add_argument("--points", type=parse_int_list, default=[1, 100, 10000, 100000], help="Trade-size grid lengths")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds spent per benchmark")
+    parser.add_argument("--quick", action="store_true", help="Small smoke run (levels 100,1000; points 1,100)")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.levels, args.points, args.min_time = [100, 1000], [1, 100], 0.05
+
+    report = run(args.levels, args.points, min_time=args.min_time)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nChange in ops/sec vs {args.compare} ({previous['environment'].get('commit')}):")
+        for line in compare(report, previous):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+End-to-end fetch throughput and tail latency against the simulated exchange.
+
+Drives fetch_order_books (book fetch + snapshot conversion) with many
+concurrent requests on the local 'sim' venues, so runs are reproducible and
+never touch a real exchange's rate limits:
+
+    python benchmarks/bench_fetch.py --venues 4 --concurrency 64 --latency 0.02 --jitter 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from backend.exchange_client import AsyncExchangeClient, fetch_order_books
+
+
+async def load_test(venues: int, symbols: List[str], concurrency: int, rounds: int, depth: int,
+                    config: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Runs `concurrency` workers, each issuing `rounds` fan-out fetches of every venue x symbol.
+
+    Returns:
+        requests, errors by type, wall time, requests/sec and latency
+        percentiles (ms) of the individual fan-out rounds.
+    """
+    clients = [AsyncExchangeClient(f"sim-{i}", config=config, timeout=timeout) for i in range(venues)]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def worker() -> None:
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            results = await fetch_order_books(clients, symbols, limit=depth)
+            latencies.append(time.perf_counter() - t0)
+            for result in results.values():
+                if isinstance(result, Exception):
+                    errors[type(result).__name__] = errors.get(type(result).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+
+    lat = np.array(latencies) * 1e3
+    requests = len(latencies) * venues * len(symbols)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": wall,
+        "requests_per_sec": requests / wall,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(lat.max())
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load-test the book fetch path against simulated venues.")
+    parser.add_argument("--venues", type=int, default=4)
+    parser.add_argument("--symbols", default="BTC/USDT,ETH/USDT,SOL/USDT")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent fan-out workers")
+    parser.add_argument("--rounds", type=int, default=20, help="Fan-out fetches per worker")
+    parser.add_argument("--depth", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean venue latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Latency jitter scale (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/sec per venue")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    config = {
+        'seed': args.seed, 'latency': args.latency, 'jitter': args.jitter,
+        'error_rate': args.error_rate, 'rate_limit': args.rate_limit
+    }
+    symbols = [s for s in args.symbols.split(',') if s]
+    report = asyncio.run(load_test(args.venues, symbols, args.concurrency, args.rounds, args.depth, config, args.timeout))
+
+    print(f"{report['requests']:,} requests in {report['wall_seconds']:.2f}s "
+          f"({report['requests_per_sec']:,.0f} req/s), errors: {report['errors'] or 'none'}")
+    print(f"fan-out latency ms  p50 {report['p50_ms']:.1f}  p95 {report['p95_ms']:.1f}  "
+          f"p99 {report['p99_ms']:.1f}  max {report['max_ms']:.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Quote server throughput and tail latency as the number of clients grows.
+
+Starts quote_server.py on simulated venues in a subprocess (books are polled
+in the background, requests are answered from memory), then drives it with
+an increasing number of keep-alive client connections spread over several
+client processes:
+
+    python benchmarks/bench_quote_server.py --clients 1,2,4,8,16,32,64 --duration 3
+
+Every level reports requests/sec and p50/p99/max latency; throughput grows
+with clients until the server's event loop saturates one core.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PATHS = {
+    'quote': '/quote?symbol=BTC/USDT&side=buy&size=2500000',
+    'otc': '/otc?symbol=BTC/USDT&side=sell&size=5000000&otc_bps=40',
+    'curve': '/curve?exchange=sim-0&symbol=BTC/USDT&side=buy&max_size=20000000&points=200',
+    'liquidity': '/liquidity?symbol=BTC/USDT&side=buy&budgets_bps=5,10,25,50,100'
+}
+
+
+async def _client(port: int, path: str, deadline: float, latencies: List[float]) -> int:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    errors = 0
+    try:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(head.split(b'Content-Length: ')[1].split(b'\r\n')[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            errors += not head.startswith(b'HTTP/1.1 200')
+    finally:
+        writer.close()
+    return errors
+
+
+def _client_process(port: int, path: str, connections: int, duration: float) -> Dict[str, Any]:
+    async def run():
+        latencies: List[float] = []
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(*(_client(port, path, deadline, latencies) for _ in range(connections)))
+        return {"latencies": latencies, "errors": sum(errors)}
+    return asyncio.run(run())
+
+
+def load_level(port: int, path: str, clients: int, duration: float, client_procs: int) -> Dict[str, Any]:
+    """Runs `clients` concurrent connections for `duration` seconds; returns throughput and latency percentiles."""
+    procs = max(1, min(clients, client_procs))
+    shares = [clients // procs + (i < clients % procs) for i in range(procs)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(procs) as pool:
+        parts = pool.starmap(_client_process, [(port, path, n, duration) for n in shares])
+    wall = time.perf_counter() - start
+    latencies = np.concatenate([np.asarray(p["latencies"]) for p in parts]) * 1e3
+    return {
+        "clients": clients, "requests": len(latencies), "errors": sum(p["errors"] for p in parts),
+        "requests_per_sec": len(latencies) / duration, "wall_seconds": wall,
+        "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max())
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,2,4,8,16,32,64", help="Comma-separated connection counts")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per level")
+    parser.add_argument("--route", choices=sorted(PATHS), default="quote")
+    parser.add_argument("--venues", type=int, default=4, help="Simulated venues subscribed")
+    parser.add_argument("--depth", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Client processes (keep below the core count so the server has one)")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'quote_server.py'), '--port', str(args.port), '--depth', str(args.depth),
+         '--exchanges', ','.join(f"sim-{i}" for i in range(args.venues)), '--symbols', 'BTC/USDT', '--refresh', '0.25'],
+        stderr=subprocess.PIPE, text=True
+    )
+    try:
+        server.stderr.readline()  # "listening" banner
+        _client_process(args.port, PATHS[args.route], 1, 0.5)  # First books and warm caches
+
+        report = []
+        print(f"route /{args.route}, {args.venues} venues x {args.depth} levels")
+        for clients in [int(c) for c in args.clients.split(',') if c]:
+            level = load_level(args.port, PATHS[args.route], clients, args.duration, args.client_procs)
+            report.append(level)
+            print(f"{clients:>4} clients  {level['requests_per_sec']:>9,.0f} req/s  p50 {level['p50_ms']:6.2f} ms  "
+                  f"p99 {level['p99_ms']:6.2f} ms  max {level['max_ms']:7.2f} ms  errors {level['errors']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": vars(args), "levels": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Dashboard cold-start timings against the startup budgets.
+
+Each run starts a fresh interpreter, renders the Streamlit app once (headless,
+via streamlit.testing) and reports the app's own import and first-paint
+timings plus which heavy modules had been loaded by then:
+
+    python benchmarks/bench_startup.py --runs 5
+
+Exits non-zero when the median of a timing exceeds its budget, so it can
+gate CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'frontend', 'app.py')
+HEAVY_MODULES = ('pandas', 'ccxt', 'backend.exchange_client', 'backend.historical')
+
+# Runs in the child: one cold render, timings read back from the Performance panel
+CHILD = f"""
+import json, re, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({APP!r}, default_timeout=120).run()
+wall = time.perf_counter() - start
+table = next(m.value for m in at.markdown if 'Budget ms' in m.value)
+rows = re.findall(r'\\| ([^|]+) \\| ([\\d,.]+) \\| (\\d+) \\|', table)
+print(json.dumps({{
+    "render_ms": wall * 1e3,
+    "timings": {{name: float(ms.replace(',', '')) for name, ms, _ in rows}},
+    "budgets": {{name: float(budget) for name, _, budget in rows}},
+    "exceptions": [e.value for e in at.exception],
+    "heavy_loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+}}))
+"""
+
+
+def run_once(warmup: bool) -> dict:
+    env = dict(os.environ, OTC_WARMUP='1' if warmup else '0')
+    out = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", action="store_true", help="Keep the background warm-up enabled (hits the network)")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    reports = [run_once(args.warmup) for _ in range(args.runs)]
+    for report in reports:
+        if report["exceptions"]:
+            print(f"app raised: {report['exceptions']}")
+            return 1
+
+    over_budget = False
+    for name, budget in reports[0]["budgets"].items():
+        values = np.array([r["timings"][name] for r in reports])
+        median = float(np.median(values))
+        flag = "OVER BUDGET" if median > budget else "ok"
+        over_budget |= median > budget
+        print(f"{name:<30} median {median:8.1f} ms  max {values.max():8.1f} ms  budget {budget:6.0f} ms  {flag}")
+    print(f"{'Headless render (incl. streamlit)':<30} median {np.median([r['render_ms'] for r in reports]):8.1f} ms")
+    print(f"heavy modules loaded at first paint: {reports[0]['heavy_loaded'] or 'none'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": vars(args), "runs": reports}, f, indent=2)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from backend.batch import BatchPricer, ResultWriter, SnapshotDirectory, read_trades
+from backend.calculator import CostCalculator, load_fee_schedules
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Price a trade list (symbol, side, size_usd, otc_bps) against exchange order books, "
+                    "one book fetch per (venue, symbol), streaming results as JSONL or CSV."
+    )
+    parser.add_argument("trades", help="Input CSV or JSONL file ('-' for CSV on stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Output file ('-' for stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from output extension, else jsonl)")
+    parser.add_argument("--exchanges", default="binance,kraken,coinbase,kucoin", help="Comma-separated venues")
+    parser.add_argument("--fee-bps", type=float, default=10.0, help="Exchange taker fee in bps (venues without a schedule)")
+    parser.add_argument("--fee-schedules", help="JSON file of per-venue tiered fees: {venue: {thresholds, taker, maker}}")
+    parser.add_argument("--volume-usd", type=float, default=0.0, help="Trailing 30-day volume selecting the fee tier")
+    parser.add_argument("--depth", type=int, default=3000, help="Order book depth to fetch")
+    parser.add_argument("--snapshots", help="Price offline from recorded snapshots in this directory")
+    parser.add_argument("--record", help="Save every fetched book to this directory (for later --snapshots runs)")
+    parser.add_argument("--chunk-rows", type=int, default=10000, help="Rows read and priced per chunk")
+    parser.add_argument("--max-books", type=int, default=256, help="Compiled books kept in memory")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    return parser.parse_args(argv)
+
+
+def make_book_source(args):
+    """Returns (exchange, symbol) -> OrderBookSnapshot, from disk or live."""
+    if args.snapshots:
+        return SnapshotDirectory(args.snapshots).load
+
+    from backend.exchange_client import ExchangeClient
+    from backend.markets import MarketCache
+    market_cache = MarketCache()
+    clients = {}
+    recorder = SnapshotDirectory(args.record) if args.record else None
+
+    def fetch(exchange_id, symbol):
+        if exchange_id not in clients:
+            clients[exchange_id] = ExchangeClient(exchange_id, market_cache=market_cache)
+        snapshot = clients[exchange_id].fetch_order_book(symbol, limit=args.depth)
+        if recorder is not None:
+            recorder.save(snapshot)
+        return snapshot
+
+    return fetch
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    exchanges = [e.strip() for e in args.exchanges.split(",") if e.strip()]
+
+    calculator = CostCalculator(
+        exchange_fee_rate=args.fee_bps / 10000.0,
+        fee_schedules=load_fee_schedules(args.fee_schedules) if args.fee_schedules else None,
+        volume_usd=args.volume_usd
+    )
+    pricer = BatchPricer(exchanges, make_book_source(args), max_books=args.max_books, calculator=calculator)
+
+    def report(progress):
+        if not args.quiet:
+            print(f"rows={progress['rows']:,} books={progress['books_fetched']} "
+                  f"book_errors={progress['book_errors']} {progress['rows_per_sec']:,.0f} rows/s", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    writer = ResultWriter(out, fmt)
+    try:
+        final = pricer.run(read_trades(args.trades, chunk_rows=args.chunk_rows), writer, progress=report)
+        writer.close()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not args.quiet:
+        print(f"Done: {final['rows']:,} rows in {final['elapsed']:.2f}s ({final['rows_per_sec']:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
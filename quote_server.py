@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from backend.calculator import CostCalculator, load_fee_schedules
+from backend.markets import MarketCache
+from backend.metrics import metrics
+from backend.quote_server import DEFAULT_DEPTH, DEFAULT_REFRESH, IDLE_TTL, HotBooks, QuoteServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Local pricing service: keeps order books warm for subscribed venues/symbols and answers "
+                    "quote, curve, OTC-compare and liquidity requests over HTTP from memory."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--exchanges", default="binance,kraken,coinbase,kucoin", help="Venues subscribed at start")
+    parser.add_argument("--symbols", default="BTC/USDT,ETH/USDT", help="Symbols subscribed on every venue at start")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Order book depth to keep")
+    parser.add_argument("--refresh", type=float, default=DEFAULT_REFRESH, help="Seconds between polls of a venue")
+    parser.add_argument("--fee-bps", type=float, default=10.0, help="Exchange taker fee in bps (venues without a schedule)")
+    parser.add_argument("--fee-schedules", help="JSON file of per-venue tiered fees: {venue: {thresholds, taker, maker}}")
+    parser.add_argument("--volume-usd", type=float, default=0.0, help="Trailing 30-day volume selecting the fee tier")
+    parser.add_argument("--no-auto-subscribe", action="store_true", help="Reject venues/symbols not subscribed at start")
+    parser.add_argument("--idle-ttl", type=float, default=IDLE_TTL,
+                        help="Seconds a subscription made by a request is kept without further requests")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    books = HotBooks(depth=args.depth, refresh_interval=args.refresh, market_cache=MarketCache(), idle_ttl=args.idle_ttl)
+    for exchange_id in [e.strip() for e in args.exchanges.split(",") if e.strip()]:
+        for symbol in [s.strip() for s in args.symbols.split(",") if s.strip()]:
+            books.subscribe(exchange_id, symbol)
+    calculator = CostCalculator(
+        exchange_fee_rate=args.fee_bps / 10000.0,
+        fee_schedules=load_fee_schedules(args.fee_schedules) if args.fee_schedules else None,
+        volume_usd=args.volume_usd
+    )
+    server = QuoteServer(books, calculator=calculator, auto_subscribe=not args.no_auto_subscribe)
+    port = await server.start(args.host, args.port, unix_path=args.unix)
+    print(f"Quote server listening on {args.unix or f'http://{args.host}:{port}'}", file=sys.stderr, flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.enabled = True  # /metrics reports per-route latency
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
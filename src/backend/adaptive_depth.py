@@ -0,0 +1,232 @@
+import math
+import threading
+import numpy as np
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+from .simulation import BookSide, CompiledOrderBook
+from .sim_exchange import DEFAULT_CONFIG as SIM_CONFIG, is_simulated
+
+# Book depths each venue's public endpoint accepts: (allowed limit values or None for any, max levels or None)
+VENUE_DEPTHS = {
+    'binance': (None, 5000),
+    'kraken': (None, 500),
+    'coinbase': (None, None),
+    'kucoin': ((20, 100), 100),
+    'okx': (None, 400),
+    'bybit': (None, 200),
+}
+
+INITIAL_DEPTH = 100   # First request when nothing is known about a book
+MIN_DEPTH = 20
+HEADROOM = 1.25       # Plan for this multiple of the trade (books move between fetches)
+GROWTH = 4            # Each refetch asks for at least this many times the previous depth
+
+BookResult = Union[OrderBookSnapshot, Exception]
+
+
+def venue_depths(exchange_id: str, config: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Tuple[int, ...]], Optional[int]]:
+    """(allowed depth values or None, max depth or None) for a venue; simulated venues use their max_depth."""
+    if is_simulated(exchange_id):
+        return None, int({**SIM_CONFIG, **(config or {})}['max_depth'])
+    return VENUE_DEPTHS.get(exchange_id.lower(), (None, None))
+
+
+def snap_depth(exchange_id: str, levels: int, config: Optional[Dict[str, Any]] = None) -> int:
+    """Smallest depth the venue accepts that covers `levels` (its maximum if none does)."""
+    allowed, cap = venue_depths(exchange_id, config)
+    if allowed is not None:
+        return next((value for value in allowed if value >= levels), allowed[-1])
+    return min(levels, cap) if cap is not None else levels
+
+
+def _levels_for(cum_notional: np.ndarray, notional_usd: float) -> int:
+    """
+    Levels needed to fill `notional_usd` given a side's cumulative USD.
+
+    Beyond the known book, cumulative USD is extrapolated as a power of the
+    level count fitted through the half-way and last levels (books usually
+    thicken away from the top, so a straight line would overshoot).
+    """
+    n = len(cum_notional)
+    if n and notional_usd <= cum_notional[-1]:
+        return int(np.searchsorted(cum_notional, notional_usd)) + 1
+    if n < 2 or cum_notional[n // 2 - 1] <= 0:
+        return max(n, INITIAL_DEPTH) * GROWTH
+    half = n // 2
+    exponent = math.log(cum_notional[-1] / cum_notional[half - 1]) / math.log(n / half)
+    exponent = min(max(exponent, 0.5), 3.0)
+    return math.ceil(n * (notional_usd / cum_notional[-1]) ** (1.0 / exponent))
+
+
+def _levels_beyond(book_side: BookSide, reference_price: float, range_bps: float) -> int:
+    """
+    Levels needed to reach past `range_bps` from the reference price on a side.
+
+    Beyond the known book, levels are extrapolated in proportion to the
+    distance the known levels cover.
+    """
+    n = len(book_side)
+    if n == 0 or reference_price <= 0:
+        return INITIAL_DEPTH * GROWTH
+    distances = np.abs(book_side.prices / reference_price - 1.0)  # Ascending from the top of book
+    offset = range_bps / 10000.0
+    if distances[-1] > offset:
+        return int(np.searchsorted(distances, offset, side='right')) + 1
+    if distances[-1] <= 0:
+        return max(n, INITIAL_DEPTH) * GROWTH
+    return math.ceil(n * offset / distances[-1])
+
+
+def _sides(side: str) -> Tuple[str, ...]:
+    side = side.lower()
+    return ('buy', 'sell') if side == 'both' else (side,)
+
+
+class DepthPlanner:
+    """
+    Chooses how many levels to fetch for a trade and when to fetch deeper.
+
+    Remembers the last book seen per (venue, symbol), so the first request
+    for a trade asks for just enough levels to fill it (plus HEADROOM),
+    snapped to a depth the venue accepts. Views that read the book by price
+    rather than by trade size add their own needs: `range_bps` asks for
+    every level within that distance of mid (depth charts) and `budget_bps`
+    for the largest trade whose slippage stays within it (drag budgets). If the
+    book still runs out and the venue returned every level asked for,
+    next_depth() gives a deeper request; once the venue returns fewer
+    levels or its maximum is reached the result stands as unfilled.
+    """
+
+    def __init__(self, initial_depth: int = INITIAL_DEPTH, min_depth: int = MIN_DEPTH, headroom: float = HEADROOM,
+                 growth: float = GROWTH, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            initial_depth: Depth of the first request for a book never seen.
+            min_depth: Smallest depth ever requested.
+            headroom: Multiple of the trade the planned depth should cover.
+            growth: Minimum depth multiple between a request and its refetch.
+            config: Simulated exchange config (for its max_depth).
+        """
+        self.initial_depth = initial_depth
+        self.min_depth = min_depth
+        self.headroom = headroom
+        self.growth = growth
+        self.config = config
+        self._lock = threading.Lock()
+        self._books: Dict[Tuple[str, str], CompiledOrderBook] = {}
+
+    def observe(self, snapshot: OrderBookSnapshot) -> None:
+        """Remembers the book (the snapshot's exchange and symbol are the key)."""
+        compiled = snapshot.compile()
+        with self._lock:
+            self._books[(snapshot.exchange, snapshot.symbol)] = compiled
+
+    def _levels_needed(self, compiled: CompiledOrderBook, side: str, notional_usd: float, range_bps: float,
+                       budget_bps: float) -> int:
+        """Levels (with headroom) covering the trade, range and budget on each of `side`'s sides."""
+        levels = 0
+        mid = compiled.mid_price
+        for trade_side in _sides(side):
+            book_side = compiled.side_for(trade_side)
+            levels = max(levels, _levels_for(book_side.cum_notional, notional_usd * self.headroom))
+            if range_bps > 0:
+                levels = max(levels, math.ceil(_levels_beyond(book_side, mid, range_bps) * self.headroom))
+            if budget_bps > 0:
+                fit = compiled.max_size_within(trade_side, [budget_bps / 10000.0])
+                if fit['exhausted'][0]:
+                    # The whole side fits: a VWAP at the budget reaches about twice as far from mid
+                    levels = max(levels, math.ceil(_levels_beyond(book_side, mid, 2 * budget_bps) * self.headroom))
+                else:
+                    levels = max(levels, _levels_for(book_side.cum_notional, fit['notional_usd'][0] * self.headroom))
+        return levels
+
+    def plan(self, exchange_id: str, symbol: str, side: str, notional_usd: float, range_bps: float = 0.0,
+             budget_bps: float = 0.0) -> int:
+        """
+        Depth to request for a trade of `notional_usd`.
+
+        Args:
+            side: 'buy', 'sell' or 'both' (the trade size on either side).
+            range_bps: Also cover every level within this distance of mid on those sides.
+            budget_bps: Also cover the largest trade whose slippage vs mid stays within this.
+        """
+        compiled = self._books.get((exchange_id, symbol))
+        if compiled is None:
+            levels = self.initial_depth
+        else:
+            levels = self._levels_needed(compiled, side, notional_usd, range_bps, budget_bps)
+        return snap_depth(exchange_id, max(self.min_depth, levels), self.config)
+
+    def next_depth(self, exchange_id: str, snapshot: OrderBookSnapshot, side: str, notional_usd: float,
+                   depth: int, range_bps: float = 0.0, budget_bps: float = 0.0) -> Optional[int]:
+        """
+        Deeper depth to refetch when a book of `depth` levels does not cover the trade (range, budget).
+
+        Returns:
+            The new depth, or None if the book covers it, the venue returned
+            fewer levels than requested (nothing more to get) or it is at its maximum.
+        """
+        compiled = snapshot.compile()
+        short = False
+        for trade_side in _sides(side):
+            book_side = compiled.side_for(trade_side)
+            if len(book_side) < depth:
+                continue
+            if not compiled.simulate_trade(trade_side, notional_usd)['filled']:
+                short = True
+            elif range_bps > 0 and _levels_beyond(book_side, compiled.mid_price, range_bps) > len(book_side):
+                short = True
+            elif budget_bps > 0 and compiled.max_size_within(trade_side, [budget_bps / 10000.0])['exhausted'][0]:
+                short = True
+        if not short:
+            return None
+        needed = self._levels_needed(compiled, side, notional_usd, range_bps, budget_bps)
+        deeper = snap_depth(exchange_id, max(needed, int(depth * self.growth)), self.config)
+        return deeper if deeper > depth else None
+
+
+def fetch_adaptive(fetch_many: Callable[[Dict[str, int]], Mapping[str, BookResult]], exchange_ids: Sequence[str],
+                   symbol: str, side: str, notional_usd: float, planner: DepthPlanner, range_bps: float = 0.0,
+                   budget_bps: float = 0.0) -> Tuple[Dict[str, BookResult], Dict[str, int]]:
+    """
+    Fetches every venue's book just deep enough for the trade.
+
+    Venues are fetched together at their planned depths; venues whose book
+    ran out of liquidity (or short of the range or budget) are refetched
+    together at a deeper depth until every one is covered or cannot go deeper.
+
+    Args:
+        fetch_many: {exchange: depth} -> {exchange: snapshot or Exception}.
+        exchange_ids: Venues to fetch.
+        symbol: Market symbol.
+        side: 'buy', 'sell' or 'both' (the trade size on either side).
+        notional_usd: Trade size.
+        planner: Depth planner (updated with every book fetched).
+        range_bps: Also fetch every level within this distance of mid (0 = trade only).
+        budget_bps: Also fetch the largest trade whose slippage vs mid stays within this (0 = trade only).
+
+    Returns:
+        ({exchange: snapshot or Exception}, {exchange: depth requested last}).
+    """
+    side = side.lower()
+    depths = {exc: planner.plan(exc, symbol, side, notional_usd, range_bps, budget_bps) for exc in exchange_ids}
+    books = dict(fetch_many(depths))
+    pending = dict(depths)
+    while pending:
+        deeper = {}
+        for exc in pending:
+            book = books[exc]
+            if isinstance(book, Exception) or book.empty:
+                continue
+            planner.observe(book)
+            depth = planner.next_depth(exc, book, side, notional_usd, depths[exc], range_bps, budget_bps)
+            if depth is not None:
+                deeper[exc] = depth
+                metrics.incr('depth_refetches', exchange=exc)
+        if deeper:
+            depths.update(deeper)
+            books.update(fetch_many(deeper))
+        pending = deeper
+    return books, depths
@@ -0,0 +1,337 @@
+import concurrent.futures
+import functools
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .calculator import CostCalculator
+from .recorder import SnapshotReader
+
+SIDES = ('buy', 'sell')
+
+# Snapshots priced together in one segmented sweep
+BATCH_SNAPSHOTS = 512
+# Snapshots handed to one worker process
+CHUNK_SNAPSHOTS = 20000
+
+
+def _gather(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenates data[starts[i]:starts[i] + lengths[i]] for every i with one fancy index."""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.float64)
+    seg_offsets = np.cumsum(lengths) - lengths
+    idx = np.repeat(starts - seg_offsets, lengths) + np.arange(total)
+    return np.asarray(data[idx], dtype=np.float64)
+
+
+def _book_prefix_sums(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Running sum over concatenated books that restarts at every book.
+
+    Returns (sums, bases): the sum of a book's first k values (k >= 1) is
+    sums[start + k - 1] - bases[book]. Each book's offset stays near zero
+    instead of growing with every book before it, so no precision is lost
+    however many books are concatenated.
+    """
+    shifted = np.array(values, dtype=np.float64)
+    first = starts[lengths > 0]
+    if len(first) > 1:
+        shifted[first[1:]] -= np.add.reduceat(values, first)[:-1]
+    sums = np.cumsum(shifted)
+    if len(sums) == 0:
+        return sums, np.zeros(len(starts))
+    first_level = np.minimum(starts, len(sums) - 1)
+    return sums, sums[first_level] - values[first_level]
+
+
+def _sum_first(sums: np.ndarray, bases: np.ndarray, starts: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Sum of each book's first `levels` values (broadcast over (books, sizes))."""
+    if len(sums) == 0:
+        return np.zeros(levels.shape)
+    index = np.clip(starts[:, None] + levels - 1, 0, len(sums) - 1)
+    return np.where(levels > 0, sums[index] - bases[:, None], 0.0)
+
+
+def segmented_fill(prices: np.ndarray, sizes: np.ndarray, lengths: np.ndarray,
+                   amounts_usd: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    BookSide.fill for many books at once.
+
+    Args:
+        prices, sizes: Levels of several book sides concatenated (each best first).
+        lengths: Number of levels of each book side.
+        amounts_usd: Trade sizes, priced on every book side.
+
+    Returns:
+        Tuple of (quantity, USD spent, USD unfilled) arrays of shape (books, sizes).
+    """
+    amounts = np.maximum(np.asarray(amounts_usd, dtype=np.float64), 0.0)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    ends = starts + lengths
+    notional = prices * sizes
+    # One running sum over all books locates the level each size reaches with a single search
+    cum_notional = np.concatenate(([0.0], np.cumsum(notional)))
+    full = np.searchsorted(cum_notional, cum_notional[starts][:, None] + amounts[None, :], side='right') - 1
+    levels = np.clip(full, starts[:, None], ends[:, None]) - starts[:, None]
+
+    # Values come from sums that restart at every book: offsets into the running sum
+    # lose precision as it grows across books
+    book_notional = _book_prefix_sums(notional, starts, lengths)
+    book_qty = _book_prefix_sums(sizes, starts, lengths)
+    # Rounding in the running sum can put a level boundary on the wrong side; settle it on the book's own sums
+    levels -= _sum_first(*book_notional, starts, levels) > amounts[None, :]
+    levels += (levels < lengths[:, None]) & (_sum_first(*book_notional, starts, levels + 1) <= amounts[None, :])
+
+    notional_before = _sum_first(*book_notional, starts, levels)
+    qty_before = _sum_first(*book_qty, starts, levels)
+    in_book = levels < lengths[:, None]
+    next_price = prices[np.minimum(starts[:, None] + levels, len(prices) - 1)] if len(prices) else np.ones_like(notional_before)
+    remaining = amounts[None, :] - notional_before
+
+    qty = qty_before + np.where(in_book, remaining / next_price, 0.0)
+    spent = np.where(in_book, amounts[None, :], notional_before)
+    unfilled = np.where(in_book, 0.0, remaining)
+    return qty, spent, unfilled
+
+
+def _price_rows(reader: SnapshotReader, rows: np.ndarray, sizes: np.ndarray, sides: Sequence[str],
+                calculator: CostCalculator, otc_spread: float) -> Dict[str, np.ndarray]:
+    """
+    Prices every (snapshot, side, size) of `rows`.
+
+    Snapshots with an empty side are skipped. Returns flat columnar arrays
+    ordered by snapshot, then side, then size.
+    """
+    entries = reader.index[rows]
+    top = reader.top_of_book(rows)
+    usable = ~np.isnan(top["best_bid"]) & ~np.isnan(top["best_ask"])
+    entries = entries[usable]
+    mid = ((top["best_bid"] + top["best_ask"]) / 2)[usable]
+
+    start = entries['offset'] // 8
+    n_bids = entries['n_bids'].astype(np.int64)
+    n_asks = entries['n_asks'].astype(np.int64)
+    n_snap, n_sides, n_sizes = len(entries), len(sides), len(sizes)
+
+    shape = (n_snap, n_sides, n_sizes)
+    avg_price = np.zeros(shape)
+    qty = np.zeros(shape)
+    unfilled = np.zeros(shape)
+    for j, side in enumerate(sides):
+        if side == 'buy':
+            prices = _gather(reader._data, start + 2 * n_bids, n_asks)
+            levels = _gather(reader._data, start + 2 * n_bids + n_asks, n_asks)
+            lengths = n_asks
+        else:
+            prices = _gather(reader._data, start, n_bids)
+            levels = _gather(reader._data, start + n_bids, n_bids)
+            lengths = n_bids
+        q, spent, left = segmented_fill(prices, levels, lengths, sizes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price[:, j] = np.where(q > 0, spent / q, 0.0)
+        qty[:, j] = q
+        unfilled[:, j] = left
+
+    # Drag with each snapshot's venue fee schedule, broadcast over (snapshot, side, size)
+    has_fill = qty > 0
+    venues = np.array([exc for exc, _ in reader.keys])[entries['key']]
+    drag = calculator.calculate_total_drag_many(
+        np.where(has_fill, avg_price, np.nan), mid[:, None, None], np.array(sides)[None, :, None],
+        exchanges=venues[:, None, None]
+    )
+    total = drag["total_percent"]
+    filled = has_fill & (unfilled <= 1.0)
+    # An exchange that cannot fill the size never wins
+    otc = calculator.compare_otc_many(total, otc_spread, notionals_usd=sizes[None, None, :], filled=filled)
+
+    return {
+        "timestamp": np.repeat(entries['timestamp'], n_sides * n_sizes),
+        "key": np.repeat(entries['key'], n_sides * n_sizes),
+        "side": np.tile(np.repeat(np.arange(n_sides, dtype=np.int8), n_sizes), n_snap),
+        "size": np.tile(np.arange(n_sizes, dtype=np.int32), n_snap * n_sides),
+        "mid_price": np.repeat(mid, n_sides * n_sizes),
+        "avg_price": avg_price.ravel(),
+        "slippage_pct": drag["slippage_percent"].ravel(),
+        "total_drag_pct": total.ravel(),
+        "filled": filled.ravel(),
+        "exchange_better": otc["exchange_better"].ravel(),
+        "savings_pct": otc["savings_percent"].ravel(),
+        "net_advantage_usd": otc["net_advantage_usd"].ravel()
+    }
+
+
+def _run_chunk(root: str, rows: np.ndarray, sizes: np.ndarray, sides: Sequence[str], calculator: CostCalculator,
+               otc_spread: float, batch_snapshots: int) -> Dict[str, np.ndarray]:
+    """Worker entry point: maps the log itself so only row numbers cross the process boundary."""
+    reader = SnapshotReader(root)
+    parts = [
+        _price_rows(reader, rows[i:i + batch_snapshots], sizes, sides, calculator, otc_spread)
+        for i in range(0, len(rows), batch_snapshots)
+    ]
+    if not parts:
+        return {}
+    return {column: np.concatenate([p[column] for p in parts]) for column in parts[0]}
+
+
+class BacktestResult:
+    """
+    Priced (snapshot, side, size) rows of a backtest, with time-series and distribution views.
+
+    `frame` has one row per snapshot x side x size: timestamp, exchange,
+    symbol, side, size_usd, mid_price, avg_price, slippage_pct,
+    total_drag_pct, filled, recommendation, savings_pct and
+    net_advantage_usd (signed USD gain of the exchange over OTC).
+    """
+
+    def __init__(self, frame: pd.DataFrame, skipped: int = 0):
+        self.frame = frame
+        self.skipped = skipped
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def time_series(self, exchange: str, symbol: str, side: str, size_usd: float) -> pd.DataFrame:
+        """Drag and recommendation over time for one venue, symbol, side and size."""
+        df = self.frame
+        mask = (df['exchange'] == exchange) & (df['symbol'] == symbol) & (df['side'] == side) & (df['size_usd'] == size_usd)
+        return df.loc[mask].set_index('date').sort_index()
+
+    def _stats(self, keys: List[str], quantiles: Sequence[float]) -> pd.DataFrame:
+        df = self.frame
+        grouped = df.groupby(keys, observed=True, sort=True)
+        # Drag percentiles only over sizes the book could fill
+        drag = df['total_drag_pct'].where(df['filled']).groupby([df[k] for k in keys], observed=True, sort=True)
+        stats = pd.DataFrame({
+            f"p{int(round(q * 100))}": drag.quantile(q) for q in quantiles
+        })
+        stats['mean'] = drag.mean()
+        stats['fill_rate'] = grouped['filled'].mean()
+        stats['exchange_rate'] = (df['recommendation'] == 'EXCHANGE').groupby([df[k] for k in keys], observed=True, sort=True).mean()
+        stats['snapshots'] = grouped.size()
+        return stats
+
+    def drag_by_hour(self, quantiles: Sequence[float] = (0.5, 0.95)) -> pd.DataFrame:
+        """
+        Total drag distribution per UTC hour.
+
+        Returns:
+            DataFrame indexed by (exchange, symbol, side, size_usd, hour) with a
+            column per quantile (p50, p95, ...), mean, fill_rate, exchange_rate
+            (share of snapshots where the exchange beats OTC) and snapshots.
+        """
+        return self._stats(['exchange', 'symbol', 'side', 'size_usd', 'hour'], quantiles)
+
+    def distribution(self, quantiles: Sequence[float] = (0.05, 0.5, 0.95)) -> pd.DataFrame:
+        """Same statistics as drag_by_hour over the whole period."""
+        return self._stats(['exchange', 'symbol', 'side', 'size_usd'], quantiles)
+
+
+class BacktestEngine:
+    """
+    Historical slippage backtest over a SnapshotRecorder log.
+
+    Every recorded snapshot in the selection is priced for a grid of sizes
+    and sides: slippage vs the snapshot's mid, total drag with the
+    CostCalculator fee and the OTC-vs-exchange recommendation. Snapshots are
+    priced in vectorized batches (one segmented prefix-sum sweep per batch),
+    and chunks of rows are fanned out across a process pool that maps the
+    log independently.
+    """
+
+    def __init__(self, log_root: str, calculator: Optional[CostCalculator] = None, otc_spread_bps: float = 50.0,
+                 max_workers: Optional[int] = None, batch_snapshots: int = BATCH_SNAPSHOTS,
+                 chunk_snapshots: int = CHUNK_SNAPSHOTS):
+        """
+        Args:
+            log_root: SnapshotRecorder directory.
+            calculator: Fee model, with per-venue tiered schedules (default 0.1% taker).
+            otc_spread_bps: OTC desk spread the exchange is compared against.
+            max_workers: Process pool size; 1 prices in-process.
+            batch_snapshots: Snapshots per vectorized sweep.
+            chunk_snapshots: Snapshots per worker task.
+        """
+        self.log_root = log_root
+        self.calculator = calculator or CostCalculator()
+        self.otc_spread_bps = otc_spread_bps
+        self.max_workers = max_workers
+        self.batch_snapshots = batch_snapshots
+        self.chunk_snapshots = chunk_snapshots
+        self.reader = SnapshotReader(log_root)
+
+    def select(self, exchanges: Optional[Sequence[str]] = None, symbols: Optional[Sequence[str]] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Row numbers of the recorded snapshots to price ([start, end) in ms)."""
+        self.reader.refresh()
+        rows = self.reader.select(start=start, end=end)
+        keys = [i for i, (exc, sym) in enumerate(self.reader.keys)
+                if (exchanges is None or exc in exchanges) and (symbols is None or sym in symbols)]
+        return rows[np.isin(self.reader.index['key'][rows], keys)]
+
+    def run(self, sizes: Sequence[float], sides: Sequence[str] = SIDES, exchanges: Optional[Sequence[str]] = None,
+            symbols: Optional[Sequence[str]] = None, start: Optional[int] = None, end: Optional[int] = None) -> BacktestResult:
+        """
+        Prices every selected snapshot x side x size.
+
+        Args:
+            sizes: Trade sizes in USD.
+            sides: 'buy' and/or 'sell'.
+            exchanges, symbols: Filters (None = everything recorded).
+            start, end: Timestamp range in ms.
+        """
+        sides = [s.lower() for s in sides]
+        for side in sides:
+            if side not in SIDES:
+                raise ValueError(f"Unknown side '{side}'")
+        sizes = np.asarray(sizes, dtype=np.float64)
+        if len(sizes) == 0 or not sides:
+            raise ValueError("At least one size and one side are required")
+        rows = self.select(exchanges, symbols, start, end)
+        price_chunk = functools.partial(
+            _run_chunk, self.log_root, sizes=sizes, sides=sides, calculator=self.calculator,
+            otc_spread=self.otc_spread_bps / 10000.0, batch_snapshots=self.batch_snapshots
+        )
+
+        chunks = [rows[i:i + self.chunk_snapshots] for i in range(0, len(rows), self.chunk_snapshots)]
+        if len(chunks) > 1 and self.max_workers != 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                parts = list(executor.map(price_chunk, chunks))
+        else:
+            parts = [price_chunk(chunk) for chunk in chunks]
+
+        parts = [p for p in parts if p]
+        if not parts:
+            return BacktestResult(pd.DataFrame(columns=[
+                'timestamp', 'date', 'hour', 'exchange', 'symbol', 'side', 'size_usd', 'mid_price', 'avg_price',
+                'slippage_pct', 'total_drag_pct', 'filled', 'recommendation', 'savings_pct', 'net_advantage_usd'
+            ]), skipped=len(rows))
+        columns = {column: np.concatenate([p[column] for p in parts]) for column in parts[0]}
+        priced = len(columns["timestamp"]) // (len(sides) * len(sizes))
+        return BacktestResult(self._frame(columns, sizes, sides), skipped=len(rows) - priced)
+
+    def _frame(self, columns: Dict[str, np.ndarray], sizes: np.ndarray, sides: List[str]) -> pd.DataFrame:
+        key_codes = columns["key"]
+        exchange_names = pd.Index(sorted({exc for exc, _ in self.reader.keys}))
+        symbol_names = pd.Index(sorted({sym for _, sym in self.reader.keys}))
+        key_exchange = exchange_names.get_indexer([exc for exc, _ in self.reader.keys])
+        key_symbol = symbol_names.get_indexer([sym for _, sym in self.reader.keys])
+
+        date = pd.to_datetime(columns["timestamp"], unit='ms')
+        return pd.DataFrame({
+            'timestamp': columns["timestamp"],
+            'date': date,
+            'hour': date.hour.to_numpy(dtype=np.int8),
+            'exchange': pd.Categorical.from_codes(key_exchange[key_codes], categories=exchange_names),
+            'symbol': pd.Categorical.from_codes(key_symbol[key_codes], categories=symbol_names),
+            'side': pd.Categorical.from_codes(columns["side"], categories=sides),
+            'size_usd': sizes[columns["size"]],
+            'mid_price': columns["mid_price"],
+            'avg_price': columns["avg_price"],
+            'slippage_pct': columns["slippage_pct"],
+            'total_drag_pct': columns["total_drag_pct"],
+            'filled': columns["filled"],
+            'recommendation': pd.Categorical.from_codes(columns["exchange_better"].astype(np.int8), categories=['OTC', 'EXCHANGE']),
+            'savings_pct': columns["savings_pct"],
+            'net_advantage_usd': columns["net_advantage_usd"]
+        })
@@ -0,0 +1,274 @@
+import csv
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .calculator import CostCalculator
+from .orderbook import OrderBookSnapshot
+from .simulation import OrderBookWalker
+
+# Input columns of a trade list (extra columns are passed through, see ResultWriter)
+TRADE_FIELDS = ['symbol', 'side', 'size_usd', 'otc_bps']
+
+RESULT_FIELDS = TRADE_FIELDS + [
+    'best_exchange', 'avg_price', 'effective_price', 'mid_price', 'slippage_pct',
+    'total_drag_pct', 'filled', 'recommendation', 'savings_pct', 'savings_usd', 'net_advantage_usd', 'error'
+]
+
+
+def read_trades(path: str, chunk_rows: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Streams a CSV or JSONL trade list in chunks of at most `chunk_rows` rows.
+
+    The format is taken from the extension ('.jsonl'/'.json' or CSV otherwise);
+    '-' reads CSV from stdin.
+    """
+    is_jsonl = path.endswith(('.jsonl', '.json'))
+    f = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        rows = (json.loads(line) for line in f if line.strip()) if is_jsonl else csv.DictReader(f)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def trade_error(row: Dict[str, Any]) -> Optional[str]:
+    """Why a trade row cannot be priced (missing symbol, unknown side, bad size or OTC premium), or None if it can."""
+    symbol = row.get('symbol')
+    if not isinstance(symbol, str) or not symbol.strip():
+        return f"missing symbol {symbol!r}" if symbol not in (None, '') else "missing symbol"
+    side = str(row.get('side', '')).strip().lower()
+    if side not in ('buy', 'sell'):
+        return f"unknown side {row.get('side')!r} (expected buy or sell)"
+    try:
+        size = float(row.get('size_usd'))
+    except (TypeError, ValueError):
+        return f"invalid size_usd {row.get('size_usd')!r}"
+    if not np.isfinite(size) or size <= 0:
+        return f"invalid size_usd {row.get('size_usd')!r}"
+    try:
+        float(row.get('otc_bps') or 0.0)
+    except (TypeError, ValueError):
+        return f"invalid otc_bps {row.get('otc_bps')!r}"
+    return None
+
+
+class SnapshotDirectory:
+    """Recorded order books as JSON files: <root>/<exchange>/<symbol>.json (ccxt layout)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, exchange_id: str, symbol: str) -> str:
+        return os.path.join(self.root, exchange_id, re.sub(r'[^A-Za-z0-9_.-]', '-', symbol) + '.json')
+
+    def load(self, exchange_id: str, symbol: str) -> OrderBookSnapshot:
+        path = self.path(exchange_id, symbol)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No recorded snapshot for {exchange_id} {symbol} ({path})")
+        with open(path) as f:
+            return OrderBookSnapshot.from_ccxt(json.load(f), exchange=exchange_id, symbol=symbol)
+
+    def save(self, snapshot: OrderBookSnapshot) -> str:
+        path = self.path(snapshot.exchange, snapshot.symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(snapshot.to_ccxt(), f)
+        return path
+
+
+class BatchPricer:
+    """
+    Prices large trade lists against every venue, one book fetch per (venue, symbol).
+
+    Rows are grouped by symbol and side within each chunk and priced with the
+    vectorized walker; compiled books are kept in a bounded LRU so memory stays
+    flat however long the input is.
+    """
+
+    def __init__(self, exchanges: Sequence[str], book_source: Callable[[str, str], OrderBookSnapshot],
+                 exchange_fee_rate: float = 0.001, max_books: int = 256, calculator: Optional[CostCalculator] = None):
+        """
+        Args:
+            exchanges: Venues to price on (best venue per row is reported).
+            book_source: (exchange, symbol) -> OrderBookSnapshot, live or recorded.
+            exchange_fee_rate: Taker fee applied to every venue (ignored with `calculator`).
+            max_books: Compiled books kept in memory.
+            calculator: Fee model with per-venue tiered schedules.
+        """
+        self.exchanges = list(exchanges)
+        self.book_source = book_source
+        self.calculator = calculator or CostCalculator(exchange_fee_rate)
+        self.max_books = max_books
+        self._books: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self.stats = {"rows": 0, "books_fetched": 0, "book_errors": 0, "elapsed": 0.0}
+
+    def _book(self, exchange_id: str, symbol: str) -> Any:
+        """Compiled book or the Exception its fetch raised (cached either way, so each pair is fetched once)."""
+        key = (exchange_id, symbol)
+        if key in self._books:
+            self._books.move_to_end(key)
+            return self._books[key]
+        try:
+            book = OrderBookWalker.compile(self.book_source(exchange_id, symbol))
+            self.stats["books_fetched"] += 1
+        except Exception as e:
+            book = e
+            self.stats["book_errors"] += 1
+        self._books[key] = book
+        if len(self._books) > self.max_books:
+            self._books.popitem(last=False)
+        return book
+
+    def price_group(self, symbol: str, side: str, sizes: np.ndarray, otc_bps: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Prices one symbol/side group on every venue and keeps the best venue per row.
+
+        Returns:
+            Dict of per-row arrays (see RESULT_FIELDS).
+        """
+        if side not in ('buy', 'sell'):
+            raise ValueError(f"Unknown side '{side}'")
+        is_buy = side == 'buy'
+        n = len(sizes)
+        best = {
+            "best_exchange": np.full(n, None, dtype=object),
+            "effective_price": np.full(n, np.inf if is_buy else -np.inf),
+            "avg_price": np.zeros(n), "mid_price": np.zeros(n), "slippage_pct": np.zeros(n),
+            "total_drag_pct": np.full(n, np.nan), "filled": np.zeros(n, dtype=bool)
+        }
+        priced = np.zeros(n, dtype=bool)  # Some usable venue found for the row
+        errors = []
+
+        for exchange_id in self.exchanges:
+            book = self._book(exchange_id, symbol)
+            if isinstance(book, Exception):
+                errors.append(f"{exchange_id}: {book}")
+                continue
+            mid = (book.bids.top_price + book.asks.top_price) / 2 if len(book.bids) and len(book.asks) else 0.0
+            if mid <= 0:
+                errors.append(f"{exchange_id}: empty book")
+                continue
+
+            res = book.simulate_many(side, sizes)
+            avg = res["avg_price"]
+            drag = self.calculator.calculate_total_drag_many(avg, mid, is_buy, exchanges=exchange_id)
+            fee = drag["fee_percent"]
+            effective = avg * (1 + fee) if is_buy else avg * (1 - fee)
+
+            # Unfilled sizes can't win against a venue that fills them
+            score = np.where(res["filled"], effective, np.inf if is_buy else -np.inf)
+            current = np.where(best["filled"], best["effective_price"], np.inf if is_buy else -np.inf)
+            better = (score < current) if is_buy else (score > current)
+            better |= ~priced & (avg > 0)
+            priced |= better
+
+            best["best_exchange"][better] = exchange_id
+            best["effective_price"][better] = effective[better]
+            best["avg_price"][better] = avg[better]
+            best["mid_price"][better] = mid
+            best["slippage_pct"][better] = drag["slippage_percent"][better]
+            best["total_drag_pct"][better] = drag["total_percent"][better]
+            best["filled"][better] = res["filled"][better]
+
+        # A row no venue can fill goes OTC, however cheap the partial fill looks
+        otc = self.calculator.compare_otc_many(best["total_drag_pct"], otc_bps / 10000.0, notionals_usd=sizes,
+                                               filled=best["filled"])
+        best["recommendation"] = np.where(priced, otc["recommendation"].astype(object), None)
+        best["savings_pct"] = otc["savings_percent"]
+        best["savings_usd"] = otc["savings_usd"]
+        best["net_advantage_usd"] = otc["net_advantage_usd"]
+        best["error"] = np.where(priced, None, "; ".join(errors) or "no venue")
+        return best
+
+    def price_chunk(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prices a chunk of trade rows, returned in input order."""
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        out: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        for i, row in enumerate(rows):
+            error = trade_error(row)
+            if error is not None:
+                # Reported like a row no venue could price, instead of being priced on the wrong side
+                out[i] = {**dict(row), **{field: None for field in RESULT_FIELDS if field not in TRADE_FIELDS},
+                          "filled": False, "error": error}
+                continue
+            groups.setdefault((row['symbol'], str(row['side']).strip().lower()), []).append(i)
+
+        for (symbol, side), idx in groups.items():
+            sizes = np.array([float(rows[i]['size_usd']) for i in idx])
+            otc_bps = np.array([float(rows[i].get('otc_bps') or 0.0) for i in idx])
+            priced = self.price_group(symbol, side, sizes, otc_bps)
+            for j, i in enumerate(idx):
+                result = dict(rows[i])
+                for field, values in priced.items():
+                    value = values[j]
+                    if isinstance(value, np.generic):
+                        value = value.item()
+                    result[field] = None if isinstance(value, float) and not np.isfinite(value) else value
+                out[i] = result
+
+        self.stats["rows"] += len(rows)
+        return out
+
+    def run(self, chunks: Iterable[List[Dict[str, Any]]], write: Callable[[Dict[str, Any]], None],
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Prices every chunk and streams results to `write`; returns the final stats."""
+        start = time.perf_counter()
+        for chunk in chunks:
+            for result in self.price_chunk(chunk):
+                write(result)
+            self.stats["elapsed"] = time.perf_counter() - start
+            if progress is not None:
+                progress(self.progress())
+        self.stats["elapsed"] = time.perf_counter() - start
+        return self.progress()
+
+    def progress(self) -> Dict[str, Any]:
+        elapsed = self.stats["elapsed"]
+        return {**self.stats, "rows_per_sec": self.stats["rows"] / elapsed if elapsed else 0.0}
+
+
+class ResultWriter:
+    """
+    Streams result rows as JSONL or CSV.
+
+    The CSV header is RESULT_FIELDS followed by the first row's extra input
+    columns, so a CSV blotter's own columns come through; keys that only
+    later rows carry (possible with JSONL input) are left out.
+    """
+
+    def __init__(self, f: IO, fmt: str = 'jsonl'):
+        self.f = f
+        self.fmt = fmt
+        self._csv: Optional[csv.DictWriter] = None
+
+    def _start_csv(self, row: Dict[str, Any]) -> None:
+        fields = RESULT_FIELDS + [key for key in row if key not in RESULT_FIELDS]
+        self._csv = csv.DictWriter(self.f, fieldnames=fields, extrasaction='ignore')
+        self._csv.writeheader()
+
+    def __call__(self, row: Dict[str, Any]) -> None:
+        if self.fmt != 'csv':
+            self.f.write(json.dumps(row) + '\n')
+            return
+        if self._csv is None:
+            self._start_csv(row)
+        self._csv.writerow(row)
+
+    def close(self) -> None:
+        """Writes the CSV header if no row did (empty input)."""
+        if self.fmt == 'csv' and self._csv is None:
+            self._start_csv({})
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+
+BookKey = Tuple[str, str, int]  # (exchange, symbol, depth)
+
+# Rough per-entry overhead on top of the level arrays (object, dict slot, arrays' headers)
+ENTRY_OVERHEAD_BYTES = 1024
+
+
+class _Flight:
+    """An upstream fetch in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+
+
+class OrderBookCache:
+    """
+    Thread-safe TTL + LRU cache for order book snapshots.
+
+    - Entries older than `max_age` seconds are treated as misses.
+    - Total size is bounded by `max_bytes` (least recently used evicted first).
+    - Single-flight: concurrent requests for the same key share one upstream
+      call; callers that arrive while it is running wait for its result.
+
+    The upstream is a batch loader so misses for several venues can still be
+    fetched concurrently (e.g. through fetch_order_books on an event loop).
+    """
+
+    def __init__(self, fetch_many: Callable[[List[BookKey]], Dict[BookKey, Any]], max_age: float = 1.0,
+                 max_bytes: int = 256 * 1024 * 1024, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            fetch_many: Called with the missing keys; returns {key: snapshot or Exception}.
+            max_age: Default maximum snapshot age in seconds.
+            max_bytes: Memory budget for cached level arrays.
+            clock: Monotonic time source (injectable for tests).
+        """
+        self.fetch_many = fetch_many
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[BookKey, Tuple[float, OrderBookSnapshot, int]]" = OrderedDict()
+        self._inflight: Dict[BookKey, _Flight] = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "errors": 0}
+
+    def get(self, exchange: str, symbol: str, depth: int, max_age: Optional[float] = None) -> OrderBookSnapshot:
+        """Returns a fresh-enough snapshot for one key, raising the upstream error if the fetch failed."""
+        key = (exchange, symbol, depth)
+        result = self.get_many([key], max_age=max_age)[key]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get_many(self, keys: Sequence[BookKey], max_age: Optional[float] = None) -> Dict[BookKey, Any]:
+        """
+        Resolves several keys at once.
+
+        Returns:
+            Dict of key -> snapshot, or the Exception its upstream fetch raised
+            (errors are never cached).
+        """
+        max_age = self.max_age if max_age is None else max_age
+        results: Dict[BookKey, Any] = {}
+        leading: Dict[BookKey, _Flight] = {}
+        following: Dict[BookKey, _Flight] = {}
+
+        with self._lock:
+            now = self.clock()
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if now - entry[0] <= max_age:
+                        self._entries.move_to_end(key)
+                        self._stats["hits"] += 1
+                        metrics.incr('cache_hits', exchange=key[0])
+                        results[key] = entry[1]
+                        continue
+                    self._stats["expired"] += 1
+                    self._remove(key)
+
+                self._stats["misses"] += 1
+                metrics.incr('cache_misses', exchange=key[0])
+                flight = self._inflight.get(key)
+                if flight is not None:
+                    self._stats["coalesced"] += 1
+                    metrics.incr('cache_coalesced', exchange=key[0])
+                    following[key] = flight
+                else:
+                    flight = _Flight()
+                    self._inflight[key] = flight
+                    leading[key] = flight
+
+        if leading:
+            self._load(leading)
+            for key, flight in leading.items():
+                results[key] = flight.result
+
+        for key, flight in following.items():
+            flight.done.wait()
+            results[key] = flight.result
+
+        return results
+
+    def _load(self, flights: Dict[BookKey, _Flight]) -> None:
+        """Runs one upstream batch for the keys this caller leads and publishes the results."""
+        fetched: Dict[BookKey, Any] = {}
+        try:
+            fetched = self.fetch_many(list(flights))
+        except Exception as e:
+            fetched = {key: e for key in flights}
+        finally:
+            # Always release waiters, even if the loader was interrupted
+            self._publish(flights, fetched)
+
+    def _publish(self, flights: Dict[BookKey, _Flight], fetched: Dict[BookKey, Any]) -> None:
+        with self._lock:
+            now = self.clock()
+            for key, flight in flights.items():
+                result = fetched.get(key, KeyError(f"Loader returned no result for {key}"))
+                if isinstance(result, Exception):
+                    self._stats["errors"] += 1
+                else:
+                    self._store(key, result, now)
+                flight.result = result
+                del self._inflight[key]
+                flight.done.set()
+
+    def _store(self, key: BookKey, snapshot: OrderBookSnapshot, now: float) -> None:
+        self._remove(key)
+        size = snapshot.nbytes + ENTRY_OVERHEAD_BYTES
+        self._entries[key] = (now, snapshot, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: BookKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, key: Optional[BookKey] = None) -> None:
+        """Drops one key, or everything if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, memory use and entry ages (seconds)."""
+        with self._lock:
+            now = self.clock()
+            ages = [now - entry[0] for entry in self._entries.values()]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "inflight": len(self._inflight),
+                "max_age_seen": max(ages) if ages else 0.0,
+                "mean_age": sum(ages) / len(ages) if ages else 0.0
+            }
@@ -1,57 +1,269 @@
+import json
+import numpy as np
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+class FeeSchedule:
+    """
+    Volume-tiered maker/taker fee table of one venue.
+
+    Tier i applies from thresholds[i] (trailing 30-day volume in USD) up to
+    the next threshold; volumes below the first threshold get the first tier.
+    """
+
+    def __init__(self, thresholds: Sequence[float], taker: Sequence[float], maker: Optional[Sequence[float]] = None):
+        """
+        Args:
+            thresholds: Ascending tier start volumes in USD (usually starting at 0).
+            taker: Taker fee rate per tier (e.g. 0.001 for 0.1%).
+            maker: Maker fee rate per tier (default: same as taker).
+        """
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.taker = np.asarray(taker, dtype=np.float64)
+        self.maker = self.taker if maker is None else np.asarray(maker, dtype=np.float64)
+        if self.thresholds.ndim != 1 or len(self.thresholds) == 0:
+            raise ValueError("A fee schedule needs at least one tier")
+        if len(self.taker) != len(self.thresholds) or len(self.maker) != len(self.thresholds):
+            raise ValueError("Fee schedule thresholds, taker and maker rates must have the same length")
+        if np.any(np.diff(self.thresholds) <= 0):
+            raise ValueError("Fee schedule thresholds must be strictly ascending")
+
+    @classmethod
+    def flat(cls, taker: float, maker: Optional[float] = None) -> "FeeSchedule":
+        return cls([0.0], [taker], None if maker is None else [maker])
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "FeeSchedule":
+        """From {"thresholds": [...], "taker": [...], "maker": [...]} (maker optional)."""
+        return cls(data['thresholds'], data['taker'], data.get('maker'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"thresholds": self.thresholds.tolist(), "taker": self.taker.tolist(), "maker": self.maker.tolist()}
+
+    def tier(self, volume_usd: ArrayLike) -> np.ndarray:
+        """Tier index for each volume (binary search over the thresholds)."""
+        idx = np.searchsorted(self.thresholds, np.asarray(volume_usd, dtype=np.float64), side='right') - 1
+        return np.maximum(idx, 0)
+
+    def rates(self, volume_usd: ArrayLike, maker: Union[bool, np.ndarray] = False) -> np.ndarray:
+        """Fee rate for each volume; `maker` may be a bool or a per-row boolean array."""
+        idx = self.tier(volume_usd)
+        return np.where(maker, self.maker[idx], self.taker[idx])
+
+
+def load_fee_schedules(path: str) -> Dict[str, FeeSchedule]:
+    """Reads {exchange: {"thresholds": [...], "taker": [...], "maker": [...]}} from a JSON file."""
+    with open(path) as f:
+        data = json.load(f)
+    return {exchange_id: FeeSchedule.from_dict(schedule) for exchange_id, schedule in data.items()}
+
+
+def _is_buy(sides: Union[str, Sequence[str], np.ndarray]) -> np.ndarray:
+    """Boolean buy mask from 'buy'/'sell' strings (any case) or a boolean array."""
+    sides = np.asarray(sides)
+    if sides.dtype == bool:
+        return sides
+    sides = sides.astype(str)
+    is_buy = np.array(sides == 'buy')
+    other = ~is_buy & (sides != 'sell')
+    if other.any():
+        # Only rows not already lower case pay for the string conversion
+        lowered = np.char.lower(sides[other])
+        is_buy[other] = lowered == 'buy'
+        unknown = lowered[(lowered != 'buy') & (lowered != 'sell')]
+        if len(unknown):
+            raise ValueError(f"Unknown side(s): {np.unique(unknown).tolist()}")
+    return is_buy
+
+
 class CostCalculator:
-    def __init__(self, exchange_fee_rate: float = 0.001):
+    def __init__(self, exchange_fee_rate: float = 0.001, fee_schedules: Optional[Dict[str, FeeSchedule]] = None,
+                 volume_usd: float = 0.0, maker_fee_rate: Optional[float] = None):
         """
         Args:
-            exchange_fee_rate: Standard taker fee (e.g., 0.001 for 0.1%).
+            exchange_fee_rate: Standard taker fee (e.g., 0.001 for 0.1%), used for
+                venues without a schedule.
+            fee_schedules: Per-venue tiered maker/taker tables.
+            volume_usd: Trailing 30-day volume that selects the tier.
+            maker_fee_rate: Maker fee for venues without a schedule (default: the taker fee).
         """
         self.exchange_fee_rate = exchange_fee_rate
+        self.fee_schedules = dict(fee_schedules or {})
+        self.volume_usd = volume_usd
+        self.maker_fee_rate = exchange_fee_rate if maker_fee_rate is None else maker_fee_rate
+
+    def fee_rate(self, exchange: Optional[str] = None, maker: bool = False) -> float:
+        """Fee rate of one venue at the configured volume."""
+        schedule = self.fee_schedules.get(exchange) if exchange is not None else None
+        if schedule is None:
+            return self.maker_fee_rate if maker else self.exchange_fee_rate
+        return float(schedule.rates(self.volume_usd, maker))
+
+    def fee_rates(self, exchanges: Union[None, str, Sequence[str], np.ndarray] = None,
+                  volume_usd: Optional[ArrayLike] = None, maker: Union[bool, np.ndarray] = False) -> np.ndarray:
+        """
+        Fee rate per row, broadcasting exchanges, volumes and maker flags together.
+
+        Rows of each venue with a schedule are looked up with one searchsorted
+        over its tiers (one vectorized pass per scheduled venue); other rows
+        get the flat rates.
+        """
+        volume = np.asarray(self.volume_usd if volume_usd is None else volume_usd, dtype=np.float64)
+        maker = np.asarray(maker, dtype=bool)
+        flat = np.where(maker, self.maker_fee_rate, self.exchange_fee_rate)
+        if exchanges is None or not self.fee_schedules:
+            return np.broadcast_to(flat, np.broadcast_shapes(volume.shape, maker.shape)).astype(np.float64)
+
+        exchanges = np.asarray(exchanges, dtype=str)
+        shape = np.broadcast_shapes(exchanges.shape, volume.shape, maker.shape)
+        exchanges = np.broadcast_to(exchanges, shape)
+        volume = np.broadcast_to(volume, shape)
+        maker = np.broadcast_to(maker, shape)
+        rates = np.broadcast_to(flat, shape).astype(np.float64)
 
-    def calculate_total_drag(self, avg_execution_price: float, mid_price: float, side: str) -> dict:
+        for venue, schedule in self.fee_schedules.items():
+            mask = exchanges == venue
+            if mask.any():
+                rates[mask] = schedule.rates(volume[mask], maker[mask])
+        return rates
+
+    def calculate_total_drag(self, avg_execution_price: float, mid_price: Union[float, OrderBookSnapshot], side: str,
+                             exchange: Optional[str] = None) -> dict:
         """
         Calculates the total cost implications of the trade.
-        
+
         Args:
             avg_execution_price: The simulated average price.
-            mid_price: The reference mid-market price before trade.
+            mid_price: The reference mid-market price before trade (or the
+                OrderBookSnapshot it is taken from).
             side: 'buy' or 'sell'.
-            
+            exchange: Venue whose fee schedule applies (flat taker fee if None
+                or unknown; defaults to the snapshot's exchange).
+
         Returns:
             Dict with slippage_cost, fee_cost, total_cost_percent
         """
+        metrics.incr('drag_calculations')
+        if isinstance(mid_price, OrderBookSnapshot):
+            exchange = exchange or mid_price.exchange
+            mid_price = mid_price.mid_price
+        fee_rate = self.fee_rate(exchange)
+
         if mid_price == 0:
-             return {"slippage_percent": 0.0, "fee_percent": self.exchange_fee_rate, "total_percent": 0.0}
+             return {"slippage_percent": 0.0, "fee_percent": fee_rate, "total_percent": 0.0}
 
         # Calculate price impact (Slippage)
         if side.lower() == 'buy':
             slippage_percent = (avg_execution_price - mid_price) / mid_price
         else:
             slippage_percent = (mid_price - avg_execution_price) / mid_price
-            
+
         # Total cost is Slippage + Fees
         # Note: Fees are usually applied to the executed amount.
         # Ideally, we sum the percentages approximation.
-        total_percent = slippage_percent + self.exchange_fee_rate
-        
+        total_percent = slippage_percent + fee_rate
+
         return {
             "slippage_percent": slippage_percent,
-            "fee_percent": self.exchange_fee_rate,
+            "fee_percent": fee_rate,
             "total_percent": total_percent
         }
 
+    def calculate_total_drag_many(self, avg_execution_prices: ArrayLike, mid_prices: ArrayLike,
+                                  sides: Union[str, Sequence[str], np.ndarray],
+                                  exchanges: Union[None, str, Sequence[str], np.ndarray] = None,
+                                  notionals_usd: Optional[ArrayLike] = None, volume_usd: Optional[ArrayLike] = None,
+                                  maker: Union[bool, np.ndarray] = False) -> Dict[str, np.ndarray]:
+        """
+        calculate_total_drag over arrays (all arguments broadcast together).
+
+        Args:
+            avg_execution_prices, mid_prices: Prices per row (mid 0 gives zero drag,
+                as in the scalar version; NaN prices propagate).
+            sides: 'buy'/'sell' per row (or one for all), or a boolean buy mask.
+            exchanges: Venue per row for the fee schedule lookup.
+            notionals_usd: Trade sizes; adds fee_usd, slippage_usd and cost_usd.
+            volume_usd: 30-day volume per row (default: the calculator's).
+            maker: Maker instead of taker fees (bool or per row).
+
+        Returns:
+            Dict of arrays: slippage_percent, fee_percent, total_percent
+            (+ slippage_usd, fee_usd, cost_usd with notionals).
+        """
+        avg = np.asarray(avg_execution_prices, dtype=np.float64)
+        mid = np.asarray(mid_prices, dtype=np.float64)
+        is_buy = _is_buy(sides)
+        fee = self.fee_rates(exchanges, volume_usd, maker)
+        metrics.incr('drag_calculations', int(np.broadcast(avg, mid, is_buy, fee).size))
+
+        valid = mid != 0
+        safe_mid = np.where(valid, mid, 1.0)
+        slippage = np.where(valid, np.where(is_buy, avg - mid, mid - avg) / safe_mid, 0.0)
+        total = np.where(valid, slippage + fee, 0.0)
+        result = {
+            "slippage_percent": slippage,
+            "fee_percent": np.broadcast_to(fee, total.shape).copy(),
+            "total_percent": total
+        }
+        if notionals_usd is not None:
+            notional = np.asarray(notionals_usd, dtype=np.float64)
+            result["slippage_usd"] = slippage * notional
+            result["fee_usd"] = result["fee_percent"] * notional
+            result["cost_usd"] = total * notional
+        return result
+
     def compare_otc(self, exchange_total_percent: float, otc_spread_percent: float) -> dict:
         """
         Compares Exchange execution vs OTC Desk execution.
-        
+
         Args:
             exchange_total_percent: Total drag (slippage + fees).
             otc_spread_percent: OTC premium/fee (e.g. 0.005 for 50bps).
-            
+
         Returns:
             Dict with recommendation and savings.
         """
         savings_percent = otc_spread_percent - exchange_total_percent
-        
+
         return {
             "recommendation": "EXCHANGE" if savings_percent > 0 else "OTC",
             "savings_percent": abs(savings_percent)
         }
+
+    def compare_otc_many(self, exchange_total_percent: ArrayLike, otc_spread_percent: ArrayLike,
+                         notionals_usd: Optional[ArrayLike] = None,
+                         filled: Optional[Union[bool, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        compare_otc over arrays.
+
+        Args:
+            exchange_total_percent: Total drag per row (NaN = no exchange price, OTC wins).
+            otc_spread_percent: OTC premium per row (or one for all).
+            notionals_usd: Trade sizes; adds savings_usd and net_advantage_usd.
+            filled: Rows the exchange can fill completely (others recommend OTC).
+
+        Returns:
+            Dict of arrays: recommendation ('EXCHANGE'/'OTC'), exchange_better,
+            savings_percent, and with notionals savings_usd plus
+            net_advantage_usd (signed: positive when the exchange is cheaper).
+        """
+        total = np.asarray(exchange_total_percent, dtype=np.float64)
+        savings = np.asarray(otc_spread_percent, dtype=np.float64) - total
+        exchange_better = savings > 0
+        if filled is not None:
+            exchange_better &= np.asarray(filled, dtype=bool)
+        result = {
+            "recommendation": np.where(exchange_better, "EXCHANGE", "OTC"),
+            "exchange_better": exchange_better,
+            "savings_percent": np.abs(savings)
+        }
+        if notionals_usd is not None:
+            notional = np.asarray(notionals_usd, dtype=np.float64)
+            result["savings_usd"] = np.abs(savings) * notional
+            result["net_advantage_usd"] = savings * notional
+        return result
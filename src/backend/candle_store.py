@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import time
+import numpy as np
+import ccxt
+from typing import Any, List, Optional, Tuple
+
+# Column layout of every stored array (ccxt OHLCV order)
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+DEFAULT_CANDLE_DIR = os.path.join(
+    os.environ.get('OTC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'otc_slippage')),
+    'candles'
+)
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """Length of a ccxt timeframe string ('1m', '1h', '1d', ...) in milliseconds."""
+    return int(ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+
+
+class CandleStore:
+    """
+    Local columnar OHLCV store.
+
+    One float64 .npy array of shape (n, 6) per (exchange, symbol, timeframe),
+    sorted by timestamp and memory-mapped on read. `sync` pages the exchange to
+    cover the requested window and only downloads candles that are not on disk.
+    A small JSON file next to each array remembers the earliest candle the
+    venue has (a market listed after the window start, or a venue that
+    ignores `since`), so the missing head is not requested again.
+    """
+
+    def __init__(self, root: str = DEFAULT_CANDLE_DIR, page_limit: int = 1000, refresh_interval: float = 60.0):
+        """
+        Args:
+            root: Directory holding the store.
+            page_limit: Candles requested per fetch_ohlcv call.
+            refresh_interval: Seconds after a write during which the newest
+                candles are considered current (no network on repeat queries).
+        """
+        self.root = root
+        self.page_limit = page_limit
+        self.refresh_interval = refresh_interval
+
+    def path(self, exchange_id: str, symbol: str, timeframe: str) -> str:
+        safe_symbol = re.sub(r'[^A-Za-z0-9_.-]', '-', symbol)
+        return os.path.join(self.root, exchange_id, safe_symbol, f"{timeframe}.npy")
+
+    def meta_path(self, exchange_id: str, symbol: str, timeframe: str) -> str:
+        return self.path(exchange_id, symbol, timeframe)[:-len('.npy')] + '.meta.json'
+
+    def earliest(self, exchange_id: str, symbol: str, timeframe: str) -> Optional[int]:
+        """Timestamp of the venue's first candle if a head fetch found it, else None."""
+        try:
+            with open(self.meta_path(exchange_id, symbol, timeframe)) as f:
+                return int(json.load(f)['earliest'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_earliest(self, exchange_id: str, symbol: str, timeframe: str, earliest: int) -> None:
+        path = self.meta_path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'earliest': int(earliest)}, f)
+        os.replace(tmp_path, path)
+
+    def load(self, exchange_id: str, symbol: str, timeframe: str) -> np.ndarray:
+        """Returns the stored candles as a read-only memory map (empty (0, 6) array if none)."""
+        path = self.path(exchange_id, symbol, timeframe)
+        if not os.path.exists(path):
+            return np.empty((0, len(COLUMNS)), dtype=np.float64)
+        return np.load(path, mmap_mode='r')
+
+    def save(self, exchange_id: str, symbol: str, timeframe: str, candles: np.ndarray) -> None:
+        """Atomically replaces the stored array."""
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(candles, dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def merge(existing: np.ndarray, new_rows: np.ndarray) -> np.ndarray:
+        """Union of two candle arrays by timestamp; rows in `new_rows` win (they may complete a partial candle)."""
+        if len(new_rows) == 0:
+            return np.asarray(existing)
+        combined = np.concatenate((new_rows, existing))
+        _, first = np.unique(combined[:, 0], return_index=True)  # Sorted timestamps, first occurrence wins
+        return combined[first]
+
+    def _fetch_range(self, exchange: Any, symbol: str, timeframe: str, start: int, end: int) -> np.ndarray:
+        """Pages fetch_ohlcv forward from `start` until `end` (ms) or the exchange runs dry."""
+        step = timeframe_ms(timeframe)
+        pages: List[list] = []
+        cursor = start
+        while cursor < end:
+            batch = exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=self.page_limit)
+            if not batch:
+                break
+            pages.append(batch)
+            last = batch[-1][0]
+            if last < cursor:
+                break
+            cursor = last + step
+
+        rows = [row[:len(COLUMNS)] for page in pages for row in page]
+        if not rows:
+            return np.empty((0, len(COLUMNS)), dtype=np.float64)
+        arr = np.asarray(rows, dtype=np.float64)
+        return arr[arr[:, 0] < end]
+
+    def sync(self, exchange: Any, exchange_id: str, symbol: str, timeframe: str, since: int, until: Optional[int] = None) -> np.ndarray:
+        """
+        Makes sure [since, until) is on disk and returns that window.
+
+        Downloads only the missing head (older than the first stored candle,
+        unless that is the venue's earliest) and the tail from the last stored
+        candle onwards (re-fetched since it may have been partial), skipping
+        the tail if the file was written within `refresh_interval`.
+
+        Args:
+            exchange: ccxt exchange object (sync API).
+            exchange_id: Venue id used in the store key.
+            symbol: Market symbol.
+            timeframe: ccxt timeframe.
+            since: Window start, ms since epoch.
+            until: Window end, ms since epoch (defaults to now).
+
+        Returns:
+            (n, 6) float64 array of candles in the window.
+        """
+        until = until if until is not None else exchange.milliseconds()
+        stored = self.load(exchange_id, symbol, timeframe)
+        step = timeframe_ms(timeframe)
+        fetched: List[np.ndarray] = []
+        first_candle = -(-since // step) * step  # First candle the window asks for
+
+        if len(stored) == 0:
+            rows = self._fetch_range(exchange, symbol, timeframe, since, until)
+            if len(rows) and rows[0, 0] > first_candle:
+                self._save_earliest(exchange_id, symbol, timeframe, rows[0, 0])
+            fetched.append(rows)
+        else:
+            first_ts, last_ts = int(stored[0, 0]), int(stored[-1, 0])
+            earliest = self.earliest(exchange_id, symbol, timeframe)
+            if since < first_ts and (earliest is None or earliest < first_ts):
+                head = self._fetch_range(exchange, symbol, timeframe, since, first_ts)
+                if len(head) == 0 or head[0, 0] > first_candle:
+                    # Nothing older on the venue (not listed yet, or `since` ignored)
+                    self._save_earliest(exchange_id, symbol, timeframe, head[0, 0] if len(head) else first_ts)
+                fetched.append(head)
+            if last_ts + step < until and not self._recently_written(exchange_id, symbol, timeframe):
+                fetched.append(self._fetch_range(exchange, symbol, timeframe, last_ts, until))
+
+        new_rows = [rows for rows in fetched if len(rows)]
+        if new_rows:
+            stored = self.merge(stored, np.concatenate(new_rows))
+            self.save(exchange_id, symbol, timeframe, stored)
+            stored = self.load(exchange_id, symbol, timeframe)
+
+        lo, hi = np.searchsorted(stored[:, 0], [since, until], side='left')
+        return stored[lo:hi]
+
+    def _recently_written(self, exchange_id: str, symbol: str, timeframe: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.path(exchange_id, symbol, timeframe)) < self.refresh_interval
+        except OSError:
+            return False
+
+    def keys(self) -> List[Tuple[str, str, str]]:
+        """Lists stored (exchange, symbol, timeframe) keys (symbols in their on-disk form)."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for exchange_id in sorted(os.listdir(self.root)):
+            for symbol in sorted(os.listdir(os.path.join(self.root, exchange_id))):
+                for name in sorted(os.listdir(os.path.join(self.root, exchange_id, symbol))):
+                    if name.endswith('.npy'):
+                        found.append((exchange_id, symbol, name[:-4]))
+        return found
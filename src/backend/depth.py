@@ -0,0 +1,160 @@
+import numpy as np
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+from .calculator import CostCalculator
+from .orderbook import OrderBookSnapshot
+from .simulation import CompiledOrderBook, OrderBookWalker
+
+# Default chart resolution: 5 bps buckets out to +/-5% of mid
+DEFAULT_BUCKET_BPS = 5.0
+DEFAULT_RANGE_BPS = 500.0
+
+
+class DepthProfile:
+    """
+    Bucketed cumulative depth of several venues around their own mids.
+
+    Row i of `bids` / `asks` holds venue i's cumulative USD within each
+    distance in `offsets_bps` of its mid, so every venue has the same small
+    number of points however deep its book is.
+    """
+
+    def __init__(self, exchanges: List[str], offsets_bps: np.ndarray, mids: np.ndarray,
+                 bids: np.ndarray, asks: np.ndarray):
+        self.exchanges = exchanges
+        self.offsets_bps = offsets_bps
+        self.mids = mids
+        self.bids = bids
+        self.asks = asks
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    def bid_prices(self, i: int) -> np.ndarray:
+        """Price of each bucket edge below venue i's mid."""
+        return self.mids[i] * (1 - self.offsets_bps / 10000.0)
+
+    def ask_prices(self, i: int) -> np.ndarray:
+        """Price of each bucket edge above venue i's mid."""
+        return self.mids[i] * (1 + self.offsets_bps / 10000.0)
+
+    def bucket_notional(self, side: str) -> np.ndarray:
+        """USD resting in each bucket (not cumulative); side is 'bids' or 'asks'."""
+        cumulative = self.bids if side == 'bids' else self.asks
+        return np.diff(cumulative, axis=1, prepend=0.0)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets_bps.nbytes + self.mids.nbytes + self.bids.nbytes + self.asks.nbytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly export."""
+        return {
+            "exchanges": list(self.exchanges),
+            "offsets_bps": self.offsets_bps.tolist(),
+            "mids": self.mids.tolist(),
+            "bids": self.bids.tolist(),
+            "asks": self.asks.tolist()
+        }
+
+
+def depth_profiles(books: Mapping[str, Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook]],
+                   bucket_bps: float = DEFAULT_BUCKET_BPS, range_bps: float = DEFAULT_RANGE_BPS) -> DepthProfile:
+    """
+    Depth profiles of several venues in one structure.
+
+    Each book is binned with one vectorized search per side
+    (CompiledOrderBook.depth_profile). The result is cached on the compiled
+    book, and snapshots cache their compiled form, so rerenders of the same
+    snapshots cost no book work.
+
+    Args:
+        books: {exchange: raw ccxt book, OrderBookSnapshot or CompiledOrderBook}.
+        bucket_bps: Bucket width in basis points.
+        range_bps: Distance from mid covered on each side.
+
+    Returns:
+        DepthProfile with one row per venue (in `books` order).
+    """
+    exchanges = list(books)
+    offsets = np.arange(int(round(range_bps / bucket_bps)) + 1) * float(bucket_bps)
+    mids = np.zeros(len(exchanges))
+    bids = np.zeros((len(exchanges), len(offsets)))
+    asks = np.zeros((len(exchanges), len(offsets)))
+    for i, exchange_id in enumerate(exchanges):
+        compiled = OrderBookWalker.compile(books[exchange_id])
+        mids[i] = compiled.mid_price
+        bids[i], asks[i] = compiled.depth_profile(bucket_bps, range_bps)
+    return DepthProfile(exchanges, offsets, mids, bids, asks)
+
+
+class LiquidityTable:
+    """
+    Maximum size fillable on each venue within each drag budget (venues x budgets arrays).
+
+    `notional_usd`, `quantity` and `avg_price` hold the largest trade whose
+    slippage vs mid plus the venue fee stays within the budget; `exhausted`
+    marks venues whose whole book side fits (the true limit may be higher).
+    """
+
+    def __init__(self, exchanges: List[str], side: str, budgets: np.ndarray, notional_usd: np.ndarray,
+                 quantity: np.ndarray, avg_price: np.ndarray, exhausted: np.ndarray):
+        self.exchanges = exchanges
+        self.side = side
+        self.budgets = budgets
+        self.notional_usd = notional_usd
+        self.quantity = quantity
+        self.avg_price = avg_price
+        self.exhausted = exhausted
+
+    def __len__(self) -> int:
+        return len(self.exchanges)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly export."""
+        return {
+            "exchanges": list(self.exchanges),
+            "side": self.side,
+            "budgets": self.budgets.tolist(),
+            "notional_usd": self.notional_usd.tolist(),
+            "quantity": self.quantity.tolist(),
+            "avg_price": self.avg_price.tolist(),
+            "exhausted": self.exhausted.tolist()
+        }
+
+
+def liquidity_at_budget(books: Mapping[str, Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook]], side: str,
+                        budgets: Sequence[float], calculator: Optional[CostCalculator] = None,
+                        include_fees: bool = True) -> LiquidityTable:
+    """
+    How much can be traded on each venue before drag exceeds each budget.
+
+    Every (venue, budget) cell is one binary search over the venue's per-level
+    VWAPs (CompiledOrderBook.max_size_within), so a full table costs
+    O(venues x budgets x log levels) once the books are compiled.
+
+    Args:
+        books: {exchange: raw ccxt book, OrderBookSnapshot or CompiledOrderBook}.
+        side: 'buy' or 'sell'.
+        budgets: Drag limits as fractions (e.g. 0.001 for 10 bps).
+        calculator: Fee model for each venue's fee (default 0.1% taker).
+        include_fees: False treats the budgets as pure slippage limits.
+
+    Returns:
+        LiquidityTable with one row per venue (in `books` order).
+    """
+    if side.lower() not in ('buy', 'sell'):
+        raise ValueError(f"Unknown side '{side}'")
+    calculator = calculator or CostCalculator()
+    exchanges = list(books)
+    budgets = np.asarray(budgets, dtype=np.float64)
+    shape = (len(exchanges), len(budgets))
+    columns = {name: np.zeros(shape) for name in ("notional_usd", "quantity", "avg_price")}
+    exhausted = np.zeros(shape, dtype=bool)
+    for i, exchange_id in enumerate(exchanges):
+        fee_rate = calculator.fee_rate(exchange_id) if include_fees else 0.0
+        res = OrderBookWalker.compile(books[exchange_id]).max_size_within(side, budgets, fee_rate=fee_rate)
+        for name, values in columns.items():
+            values[i] = res[name]
+        exhausted[i] = res["exhausted"]
+    return LiquidityTable(exchanges, side.lower(), budgets, exhausted=exhausted, **columns)
@@ -1,33 +1,159 @@
+import asyncio
+import threading
 import ccxt
+import ccxt.async_support as ccxt_async
 import pandas as pd
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 from datetime import datetime, timedelta
 
+from .adaptive_depth import snap_depth
+from .candle_store import COLUMNS as OHLCV_COLUMNS, CandleStore
+from .markets import MarketCache
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+from .scheduler import DEFAULT_DEADLINES, HISTORY, LIVE, MARKETS, RateLimitScheduler, meter_exchange, scheduler_for
+from .sim_exchange import AsyncSimulatedExchange, SimulatedExchange, is_simulated
+
+def _check_exchange_id(exchange_id: str) -> None:
+    if not is_simulated(exchange_id) and not hasattr(ccxt, exchange_id):
+        raise ValueError(f"Exchange {exchange_id} not found in ccxt")
+
+
+def _volatility_frame(ohlcv: Any) -> pd.DataFrame:
+    """Builds the OHLCV frame with date/hour/volatility_pct columns."""
+    df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
+    df['timestamp'] = df['timestamp'].astype('int64')
+    df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df['hour'] = df['date'].dt.hour
+    
+    # Volatility Calculation: (High - Low) / Open
+    df['volatility_pct'] = (df['high'] - df['low']) / df['open']
+    
+    return df
+
+
+class _ScheduledHistory:
+    """Exchange proxy whose fetch_ohlcv goes through the scheduler at HISTORY priority (for CandleStore.sync)."""
+
+    def __init__(self, exchange: Any, scheduler: RateLimitScheduler):
+        self._exchange = exchange
+        self._scheduler = scheduler
+
+    def fetch_ohlcv(self, *args: Any, **kwargs: Any) -> List[list]:
+        return self._scheduler.call(self._exchange.fetch_ohlcv, *args, priority=HISTORY,
+                                    deadline=DEFAULT_DEADLINES[HISTORY], cost_key=('fetch_ohlcv',), **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._exchange, name)
+
+
 class ExchangeClient:
-    def __init__(self, exchange_id: str = 'binance'):
+    def __init__(self, exchange_id: str = 'binance', candle_store: Optional[CandleStore] = None,
+                 config: Optional[Dict[str, Any]] = None, market_cache: Optional[MarketCache] = None,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        """
+        Args:
+            exchange_id: ccxt exchange id, or 'sim' / 'sim-<name>' for the local
+                simulated exchange.
+            candle_store: Optional on-disk OHLCV store; when set, historical
+                queries are paginated and served from disk incrementally.
+            config: Options passed to the exchange constructor (see
+                sim_exchange.DEFAULT_CONFIG for the simulated one).
+            market_cache: Optional on-disk market metadata cache; when set,
+                markets are restored from disk instead of downloaded by
+                load_markets, and refreshed in the background once stale.
+            scheduler: Rate-limit scheduler every API call goes through
+                (defaults to the venue's process-wide one, see scheduler_for).
+        """
+        _check_exchange_id(exchange_id)
         self.exchange_id = exchange_id
-        try:
-            exchange_class = getattr(ccxt, exchange_id)
-            self.exchange = exchange_class()
-        except AttributeError:
-            raise ValueError(f"Exchange {exchange_id} not found in ccxt")
+        self.candle_store = candle_store
+        self.config = config
+        self.market_cache = market_cache
+        self.scheduler = scheduler or scheduler_for(exchange_id, config)
+        self._exchange = None
+        self._markets_cached = False
+        self._init_lock = threading.Lock()
 
-    def fetch_order_book(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
+    def _new_exchange(self) -> Any:
+        if is_simulated(self.exchange_id):
+            return SimulatedExchange(self.config, exchange_id=self.exchange_id)
+        # The scheduler throttles (by priority and endpoint cost); ccxt's own FIFO throttle would undo that
+        return meter_exchange(getattr(ccxt, self.exchange_id)({**(self.config or {}), 'enableRateLimit': False}))
+
+    def _download_markets(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        # A separate instance, so the live one keeps serving while markets download
+        exchange = self._new_exchange()
+        with metrics.span('load_markets', exchange=self.exchange_id):
+            self.scheduler.call(exchange.load_markets, priority=MARKETS, deadline=DEFAULT_DEADLINES[MARKETS],
+                                cost_key=('load_markets',))
+        return exchange.markets, exchange.currencies
+
+    def _apply_markets(self, entry: Dict[str, Any]) -> None:
+        self._exchange.set_markets(entry['markets'], entry.get('currencies'))
+
+    @property
+    def exchange(self) -> Any:
+        """The ccxt exchange, created on first use (with markets restored from the cache if any)."""
+        if self._exchange is None:
+            with self._init_lock:
+                if self._exchange is None:
+                    exchange = self._new_exchange()
+                    entry = self.market_cache.load(self.exchange_id) if self.market_cache is not None else None
+                    if entry is not None:
+                        exchange.set_markets(entry['markets'], entry.get('currencies'))
+                        self._markets_cached = True
+                        if not self.market_cache.is_fresh(entry):
+                            self.market_cache.refresh_async(self.exchange_id, self._download_markets, self._apply_markets)
+                    self._exchange = exchange
+        return self._exchange
+
+    @exchange.setter
+    def exchange(self, exchange: Any) -> None:
+        self._exchange = exchange
+
+    def _remember_markets(self) -> None:
+        """Stores markets ccxt loaded by itself (e.g. inside fetch_order_book) so other processes reuse them."""
+        if self.market_cache is not None and not self._markets_cached and self._exchange.markets:
+            self._markets_cached = True
+            self.market_cache.save(self.exchange_id, self._exchange.markets, getattr(self._exchange, 'currencies', None))
+
+    def fetch_order_book(self, symbol: str, limit: int = 100) -> OrderBookSnapshot:
         """
         Fetches the order book for a given symbol.
-        Returns a dictionary with 'bids' and 'asks' lists.
+        Returns an OrderBookSnapshot (float64 price/size arrays per side),
+        converted once here so downstream code never touches the nested lists.
         """
-        if self.exchange_id.lower() == 'kucoin' and limit > 100:
-             limit = 100
+        limit = snap_depth(self.exchange_id, limit, self.config)
 
         # Let exceptions bubble up to be handled by the caller/UI
-        return self.exchange.fetch_order_book(symbol, limit=limit)
+        with metrics.span('fetch', exchange=self.exchange_id):
+            raw = self.scheduler.call(self.exchange.fetch_order_book, symbol, limit=limit,
+                                      priority=LIVE, deadline=DEFAULT_DEADLINES[LIVE],
+                                      cost_key=('fetch_order_book', limit))
+        self._remember_markets()
+        with metrics.span('parse', exchange=self.exchange_id):
+            return OrderBookSnapshot.from_ccxt(raw, exchange=self.exchange_id, symbol=symbol)
 
-    def get_available_symbols(self) -> List[str]:
-        """Fetches available markets/symbols from the exchange."""
+    def get_available_symbols(self, quote: Optional[str] = None) -> List[str]:
+        """
+        Available markets/symbols (from the market cache when one is set, otherwise downloaded once).
+
+        Args:
+            quote: Only active spot markets quoted in this currency (e.g. 'USDT'); all markets if None.
+        """
         try:
-            self.exchange.load_markets()
-            return list(self.exchange.markets.keys())
+            if not self.exchange.markets:
+                with metrics.span('load_markets', exchange=self.exchange_id):
+                    self.scheduler.call(self.exchange.load_markets, priority=MARKETS,
+                                        deadline=DEFAULT_DEADLINES[MARKETS], cost_key=('load_markets',))
+                self._remember_markets()
+            if quote is None:
+                return list(self.exchange.markets.keys())
+            return [
+                symbol for symbol, market in self.exchange.markets.items()
+                if market.get('quote') == quote and market.get('spot', True) and market.get('active') is not False
+            ]
         except Exception as e:
             print(f"Error fetching markets: {e}")
             return []
@@ -40,26 +166,181 @@ class ExchangeClient:
             DataFrame with columns: ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'date', 'hour', 'volatility_pct']
         """
         try:
-            # Helper to fetch OHLCV (Limited by exchange API usually 500-1000 candles)
-            # For 30 days of 1h data: 30 * 24 = 720 candles.
             if not self.exchange.has['fetchOHLCV']:
                 return pd.DataFrame()
             
             since = self.exchange.milliseconds() - (days * 24 * 60 * 60 * 1000)
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=1000)
+
+            with metrics.span('ohlcv', exchange=self.exchange_id):
+                if self.candle_store is not None:
+                    # Paginated and incremental: only candles missing on disk are downloaded
+                    ohlcv = self.candle_store.sync(_ScheduledHistory(self.exchange, self.scheduler), self.exchange_id,
+                                                   symbol, timeframe, since)
+                else:
+                    # Single call (limited by exchange API, usually 500-1000 candles)
+                    ohlcv = self.scheduler.call(self.exchange.fetch_ohlcv, symbol, timeframe, since=since, limit=1000,
+                                                priority=HISTORY, deadline=DEFAULT_DEADLINES[HISTORY],
+                                                cost_key=('fetch_ohlcv',))
             
-            if not ohlcv:
+            if len(ohlcv) == 0:
                 return pd.DataFrame()
 
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df['hour'] = df['date'].dt.hour
-            
-            # Volatility Calculation: (High - Low) / Open
-            df['volatility_pct'] = (df['high'] - df['low']) / df['open']
-            
-            return df
+            with metrics.span('dataframe', exchange=self.exchange_id):
+                return _volatility_frame(ohlcv)
 
         except Exception as e:
             print(f"Error fetching historical data for {symbol}: {e}")
             return pd.DataFrame()
+
+
+class AsyncExchangeClient:
+    """
+    asyncio counterpart of ExchangeClient, backed by ccxt.async_support.
+
+    The ccxt exchange (and with it one aiohttp session) is created on first
+    use and reused for every request; all calls must come from the same event
+    loop. Call close() (or use `async with`) when done.
+    """
+
+    def __init__(self, exchange_id: str = 'binance', exchange: Any = None, timeout: float = 10.0,
+                 config: Optional[Dict[str, Any]] = None, market_cache: Optional[MarketCache] = None,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        """
+        Args:
+            exchange_id: ccxt exchange id, or 'sim' / 'sim-<name>' for the local
+                simulated exchange.
+            exchange: Pre-built async exchange object (e.g. a local fake for tests).
+            timeout: Default per-request timeout in seconds.
+            config: Options passed to the exchange constructor.
+            market_cache: Optional on-disk market metadata cache (see ExchangeClient).
+            scheduler: Rate-limit scheduler shared with the venue's other clients
+                (defaults to scheduler_for(exchange_id)).
+        """
+        if exchange is None:
+            _check_exchange_id(exchange_id)
+        self.exchange_id = exchange_id
+        self.timeout = timeout
+        self.config = config
+        self.market_cache = market_cache
+        self.scheduler = scheduler or scheduler_for(exchange_id, config)
+        self._exchange = exchange
+        # Only consult the cache once; afterwards ccxt keeps markets in memory
+        self._markets_checked = market_cache is None
+        self._save_markets_after_fetch = False
+
+    @property
+    def exchange(self) -> Any:
+        if self._exchange is None:
+            if is_simulated(self.exchange_id):
+                self._exchange = AsyncSimulatedExchange(self.config, exchange_id=self.exchange_id)
+            else:
+                exchange_class = getattr(ccxt_async, self.exchange_id)
+                self._exchange = meter_exchange(exchange_class({**(self.config or {}), 'enableRateLimit': False}))
+        return self._exchange
+
+    @exchange.setter
+    def exchange(self, exchange: Any) -> None:
+        self._exchange = exchange
+
+    async def _restore_markets(self) -> None:
+        """Restores cached markets before the first request (disk I/O off the event loop)."""
+        self._markets_checked = True
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self.market_cache.load, self.exchange_id)
+        if entry is None:
+            # ccxt downloads them inside the first request; keep that copy
+            self._save_markets_after_fetch = True
+            return
+        self.exchange.set_markets(entry['markets'], entry.get('currencies'))
+        if not self.market_cache.is_fresh(entry):
+            downloader = ExchangeClient(self.exchange_id, config=self.config)
+            self.market_cache.refresh_async(
+                self.exchange_id, downloader._download_markets,
+                lambda fresh: loop.call_soon_threadsafe(self.exchange.set_markets, fresh['markets'], fresh.get('currencies'))
+            )
+
+    async def _save_markets(self) -> None:
+        self._save_markets_after_fetch = False
+        if self.exchange.markets:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.market_cache.save, self.exchange_id,
+                                       self.exchange.markets, getattr(self.exchange, 'currencies', None))
+
+    async def fetch_order_book(self, symbol: str, limit: int = 100, timeout: Optional[float] = None,
+                               priority: int = LIVE) -> OrderBookSnapshot:
+        """
+        Fetches the order book for a given symbol.
+
+        Raises asyncio.TimeoutError if the request (including time queued behind
+        the venue's rate limit and retries) exceeds `timeout` seconds. Bulk work
+        (e.g. market scans) passes a lower `priority` so live quotes go first.
+        """
+        limit = snap_depth(self.exchange_id, limit, self.config)
+        timeout = timeout if timeout is not None else self.timeout
+        if not self._markets_checked:
+            await self._restore_markets()
+        with metrics.span('fetch', exchange=self.exchange_id):
+            raw = await asyncio.wait_for(
+                self.scheduler.acall(self.exchange.fetch_order_book, symbol, limit=limit,
+                                     priority=priority, deadline=timeout, cost_key=('fetch_order_book', limit)),
+                timeout
+            )
+        if self._save_markets_after_fetch:
+            await self._save_markets()
+        with metrics.span('parse', exchange=self.exchange_id):
+            return OrderBookSnapshot.from_ccxt(raw, exchange=self.exchange_id, symbol=symbol)
+
+    async def close(self) -> None:
+        """Closes the underlying HTTP session."""
+        await self.exchange.close()
+
+    async def __aenter__(self) -> "AsyncExchangeClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+async def fetch_order_books(clients: Sequence[AsyncExchangeClient], symbols: Sequence[str], limit: int = 100,
+                            timeout: Optional[float] = None,
+                            deadline: Optional[float] = None) -> Dict[Tuple[str, str], Union[OrderBookSnapshot, Exception]]:
+    """
+    Fetches every (venue, symbol) book concurrently on the current event loop.
+
+    Args:
+        clients: Async clients, one per venue.
+        symbols: Symbols to fetch on every venue.
+        limit: Requested depth.
+        timeout: Per-request timeout in seconds (defaults to each client's).
+        deadline: Overall latency budget in seconds; requests still running when it
+            passes are cancelled and reported as asyncio.TimeoutError.
+
+    Returns:
+        Dict keyed by (exchange_id, symbol) holding either the snapshot or the
+        exception that request failed with. Never raises for a single venue.
+    """
+    tasks = {
+        asyncio.ensure_future(client.fetch_order_book(symbol, limit=limit, timeout=timeout)): (client.exchange_id, symbol)
+        for client in clients
+        for symbol in symbols
+    }
+    if not tasks:
+        return {}
+
+    done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+
+    # Cancel stragglers so they do not hold connections past the deadline
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for task, key in tasks.items():
+        if task in pending:
+            results[key] = asyncio.TimeoutError(f"{key[0]} {key[1]}: deadline of {deadline}s exceeded")
+        elif task.exception() is not None:
+            results[key] = task.exception()
+        else:
+            results[key] = task.result()
+    return results
@@ -0,0 +1,305 @@
+import concurrent.futures
+import functools
+import math
+import time
+import numpy as np
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+from .calculator import CostCalculator
+from .candle_store import timeframe_ms
+from .orderbook import OrderBookSnapshot
+from .simulation import BookSide, CompiledOrderBook, OrderBookWalker
+
+# Paths simulated together (one (paths x slices) block per task, each with its own seed)
+CHUNK_PATHS = 8192
+
+# E[ln(high / low)^2] = 4 ln 2 sigma^2 for a Brownian candle (Parkinson)
+PARKINSON = 4.0 * math.log(2.0)
+
+HOUR_MS = 3600 * 1000
+
+
+def hourly_volatility(ohlcv: Any, timeframe: str = '1h') -> np.ndarray:
+    """
+    Volatility per UTC hour of day from a fetch_historical_volatility frame.
+
+    Each candle's range ((high - low) / open) gives a Parkinson variance
+    estimate, which is averaged per hour of day and scaled to one hour.
+    Hours without candles take the overall estimate.
+
+    Args:
+        ohlcv: DataFrame with 'hour' and 'volatility_pct' columns.
+        timeframe: Candle length of the frame.
+
+    Returns:
+        (24,) array of one-hour log-return standard deviations (fractions).
+    """
+    ranges = np.log1p(np.asarray(ohlcv['volatility_pct'], dtype=np.float64))
+    hours = np.asarray(ohlcv['hour'], dtype=np.int64)
+    if len(ranges) == 0:
+        raise ValueError("No candles to estimate volatility from")
+    per_hour = HOUR_MS / timeframe_ms(timeframe)
+    variance = ranges ** 2 / PARKINSON * per_hour
+    counts = np.bincount(hours, minlength=24)
+    sums = np.bincount(hours, weights=variance, minlength=24)
+    by_hour = np.where(counts > 0, sums / np.maximum(counts, 1), variance.mean())
+    return np.sqrt(by_hour)
+
+
+class SliceSchedule:
+    """Child orders of a sliced parent order: each slice's share of the notional and start time (hours from now)."""
+
+    def __init__(self, fractions: Sequence[float], times_hours: Sequence[float]):
+        fractions = np.asarray(fractions, dtype=np.float64)
+        times = np.asarray(times_hours, dtype=np.float64)
+        if len(fractions) == 0 or fractions.shape != times.shape:
+            raise ValueError("fractions and times_hours must be non-empty and of equal length")
+        if np.any(fractions <= 0) or np.any(times < 0) or np.any(np.diff(times) < 0):
+            raise ValueError("fractions must be positive and times non-negative and ascending")
+        self.fractions = fractions / fractions.sum()
+        self.times_hours = times
+
+    @classmethod
+    def twap(cls, slices: int, horizon_hours: float) -> "SliceSchedule":
+        """Equal slices, the first now and one every horizon / slices hours."""
+        if slices < 1 or horizon_hours < 0:
+            raise ValueError("slices must be >= 1 and horizon_hours >= 0")
+        return cls(np.full(slices, 1.0 / slices), np.arange(slices) * (horizon_hours / slices))
+
+    def __len__(self) -> int:
+        return len(self.fractions)
+
+
+def _simulate_chunk(prices: np.ndarray, sizes: np.ndarray, notionals: np.ndarray, log_sigma: np.ndarray,
+                    log_drift: np.ndarray, decay: np.ndarray, recovery_dispersion: float, liquidity_noise: float,
+                    paths: int, seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulates `paths` executions of the schedule against one book side.
+
+    Args:
+        prices, sizes: Book side relative to the current mid (prices / mid,
+            sizes * mid), so USD amounts are unchanged.
+        notionals: USD per slice.
+        log_sigma, log_drift: Log-return std dev and drift of the mid per slice interval.
+        decay: Share of consumed liquidity still missing after each interval at the median half-life.
+        recovery_dispersion, liquidity_noise: Log-normal dispersions (see ExecutionRiskSimulator).
+        paths: Paths to simulate.
+        seed: Seed of this chunk.
+
+    Returns:
+        (USD executed, base quantity * current mid) per path.
+    """
+    rng = np.random.default_rng(seed)
+    book = BookSide(prices, sizes)
+    paths_shape = (paths, len(notionals))
+
+    # Mid relative to now at each slice (log-normal random walk)
+    mid = np.exp(np.cumsum(log_drift + log_sigma * rng.standard_normal(paths_shape), axis=1))
+    # Per-path recovery speed and per-slice book depth (both with mean one)
+    speed = rng.lognormal(-recovery_dispersion ** 2 / 2, recovery_dispersion, (paths, 1))
+    recovery = decay[None, :] ** speed
+    depth = rng.lognormal(-liquidity_noise ** 2 / 2, liquidity_noise, paths_shape)
+
+    executed = np.zeros(paths)
+    quantity = np.zeros(paths)
+    depleted = np.zeros(paths)  # USD taken from the book and not yet refilled
+    for i, notional in enumerate(notionals):
+        depleted *= recovery[:, i]
+        # A book `depth` times as thick fills `a` USD like this one fills a / depth (with depth times the quantity)
+        start_qty, start_usd, _ = book.fill(depleted / depth[:, i])
+        end_qty, end_usd, _ = book.fill((depleted + notional) / depth[:, i])
+        usd = (end_usd - start_usd) * depth[:, i]
+        # Levels move with the mid at constant USD depth, so the quantity scales inversely
+        executed += usd
+        quantity += (end_qty - start_qty) * depth[:, i] / mid[:, i]
+        depleted += usd
+    return executed, quantity
+
+
+class ExecutionRiskResult:
+    """
+    Simulated outcomes of one sliced order (one entry per price path).
+
+    `total_percent` is each path's drag vs the current mid (slippage plus
+    fees), `net_advantage_usd` its signed USD gain over the OTC quote
+    (positive when the exchange is cheaper) and `filled` whether the books
+    could absorb every slice.
+    """
+
+    def __init__(self, side: str, notional_usd: float, otc_spread: float, avg_price: np.ndarray,
+                 total_percent: np.ndarray, net_advantage_usd: np.ndarray, exchange_better: np.ndarray,
+                 filled: np.ndarray, instant_percent: float, seconds: float):
+        self.side = side
+        self.notional_usd = notional_usd
+        self.otc_spread = otc_spread
+        self.avg_price = avg_price
+        self.total_percent = total_percent
+        self.net_advantage_usd = net_advantage_usd
+        self.exchange_better = exchange_better
+        self.filled = filled
+        self.instant_percent = instant_percent
+        self.seconds = seconds
+
+    def __len__(self) -> int:
+        return len(self.total_percent)
+
+    def summary(self, quantiles: Sequence[float] = (0.05, 0.5, 0.95, 0.99)) -> Dict[str, float]:
+        """
+        Distribution summary.
+
+        Returns:
+            Dict with paths, fill_rate, mean/std drag, a drag percentile per
+            quantile (p5, p50, ...), the 95% expected shortfall of the cost vs
+            OTC in USD (mean loss over the worst 5% of paths), the probability
+            the sliced order beats the OTC quote, the instant (single sweep)
+            drag and the OTC spread.
+        """
+        drag = np.where(self.filled, self.total_percent, np.nan)
+        losses = np.sort(-self.net_advantage_usd[np.isfinite(self.net_advantage_usd)])[::-1]
+        shortfall = losses[:max(1, len(losses) // 20)] if len(losses) else np.array([math.nan])
+        summary = {
+            "paths": len(self),
+            "fill_rate": float(self.filled.mean()),
+            "mean_percent": float(np.nanmean(drag)) if self.filled.any() else math.nan,
+            "std_percent": float(np.nanstd(drag)) if self.filled.any() else math.nan,
+        }
+        for q in quantiles:
+            summary[f"p{q * 100:g}_percent"] = float(np.nanquantile(drag, q)) if self.filled.any() else math.nan
+        summary.update({
+            "expected_shortfall_95_usd": float(shortfall.mean()),
+            "prob_exchange_better": float(self.exchange_better.mean()),
+            "instant_percent": self.instant_percent,
+            "otc_percent": self.otc_spread,
+            "seconds": self.seconds
+        })
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly export (summary plus per-path drag and advantage)."""
+        return {
+            "side": self.side,
+            "notional_usd": self.notional_usd,
+            "summary": self.summary(),
+            "total_percent": self.total_percent.tolist(),
+            "net_advantage_usd": self.net_advantage_usd.tolist(),
+            "filled": self.filled.tolist()
+        }
+
+
+class ExecutionRiskSimulator:
+    """
+    Monte Carlo cost of executing an order in slices (TWAP) instead of at once.
+
+    Every path draws a log-normal mid path over the schedule's slice times
+    (volatility per UTC hour, e.g. from hourly_volatility), and each slice
+    walks the current book shape re-centred on that mid. Liquidity a slice
+    takes refills exponentially (transient impact) with a per-path recovery
+    half-life, and each slice sees a random depth multiple of the book, so
+    paths differ in impact as well as drift. Paths are simulated as
+    (paths x slices) NumPy blocks, chunked with independent seeds from one
+    SeedSequence (results do not depend on max_workers), optionally across a
+    process pool.
+    """
+
+    def __init__(self, calculator: Optional[CostCalculator] = None, otc_spread_bps: float = 50.0, paths: int = 20000,
+                 seed: Optional[int] = 0, recovery_half_life_minutes: float = 15.0, recovery_dispersion: float = 0.5,
+                 liquidity_noise: float = 0.25, drift_bps_per_hour: float = 0.0, max_workers: Optional[int] = 1,
+                 chunk_paths: int = CHUNK_PATHS):
+        """
+        Args:
+            calculator: Fee model (default 0.1% taker).
+            otc_spread_bps: Fixed OTC premium the sliced order is compared against.
+            paths: Monte Carlo paths.
+            seed: Seed of the path generator (None = fresh entropy).
+            recovery_half_life_minutes: Median time for consumed liquidity to half refill.
+            recovery_dispersion: Log-normal dispersion of the half-life across paths.
+            liquidity_noise: Log-normal dispersion of the book's depth per slice.
+            drift_bps_per_hour: Expected mid drift (positive = price rising).
+            max_workers: Process pool size; 1 simulates in-process.
+            chunk_paths: Paths per block / task.
+        """
+        if paths < 1 or chunk_paths < 1:
+            raise ValueError("paths and chunk_paths must be positive")
+        if recovery_half_life_minutes <= 0:
+            raise ValueError("recovery_half_life_minutes must be positive")
+        self.calculator = calculator or CostCalculator()
+        self.otc_spread_bps = otc_spread_bps
+        self.paths = paths
+        self.seed = seed
+        self.recovery_half_life_minutes = recovery_half_life_minutes
+        self.recovery_dispersion = recovery_dispersion
+        self.liquidity_noise = liquidity_noise
+        self.drift_bps_per_hour = drift_bps_per_hour
+        self.max_workers = max_workers
+        self.chunk_paths = chunk_paths
+
+    def run(self, order_book: Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook], side: str,
+            notional_usd: float, schedule: SliceSchedule, volatility: Union[float, Sequence[float]],
+            start_hour: Optional[int] = None, exchange: Optional[str] = None) -> ExecutionRiskResult:
+        """
+        Simulates the sliced order.
+
+        Args:
+            order_book: Current book (raw ccxt, snapshot or compiled).
+            side: 'buy' or 'sell'.
+            notional_usd: Parent order size in USD.
+            schedule: Slice fractions and times.
+            volatility: One-hour log-return std dev, or 24 values by UTC hour.
+            start_hour: UTC hour the schedule starts (default: now).
+            exchange: Venue for the fee schedule (default: the snapshot's).
+
+        Returns:
+            ExecutionRiskResult over all paths.
+        """
+        start = time.perf_counter()
+        side = side.lower()
+        if side not in ('buy', 'sell'):
+            raise ValueError(f"Unknown side '{side}'")
+        compiled = OrderBookWalker.compile(order_book)
+        mid0 = compiled.mid_price
+        if mid0 <= 0:
+            raise ValueError("The order book needs both sides to price a sliced order")
+        book = compiled.side_for(side)
+        exchange = exchange or getattr(order_book, 'exchange', None)
+
+        # Per-interval log-return parameters (the first interval runs from now to the first slice)
+        times = schedule.times_hours
+        intervals = np.diff(times, prepend=0.0)
+        hourly = np.broadcast_to(np.asarray(volatility, dtype=np.float64), (24,)) if np.ndim(volatility) == 0 \
+            else np.asarray(volatility, dtype=np.float64)
+        if hourly.shape != (24,):
+            raise ValueError("volatility must be a scalar or 24 values (one per UTC hour)")
+        start_hour = time.gmtime().tm_hour if start_hour is None else start_hour
+        sigma = hourly[(start_hour + np.floor(times - intervals).astype(np.int64)) % 24]
+        log_sigma = sigma * np.sqrt(intervals)
+        log_drift = self.drift_bps_per_hour / 10000.0 * intervals - log_sigma ** 2 / 2
+        decay = 0.5 ** (intervals * 60.0 / self.recovery_half_life_minutes)
+
+        seeds = np.random.SeedSequence(self.seed).spawn(-(-self.paths // self.chunk_paths))
+        counts = [min(self.chunk_paths, self.paths - i * self.chunk_paths) for i in range(len(seeds))]
+        simulate = functools.partial(
+            _simulate_chunk, book.prices / mid0, book.sizes * mid0, schedule.fractions * notional_usd,
+            log_sigma, log_drift, decay, self.recovery_dispersion, self.liquidity_noise
+        )
+        if len(seeds) > 1 and self.max_workers != 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                parts = list(executor.map(simulate, counts, seeds))
+        else:
+            parts = [simulate(n, s) for n, s in zip(counts, seeds)]
+        executed, quantity = (np.concatenate(column) for column in zip(*parts))
+        unfilled = notional_usd - executed
+
+        # Prices were simulated relative to the current mid
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = np.where(quantity > 0, executed / quantity * mid0, np.nan)
+        filled = unfilled <= 1.0
+        drag = self.calculator.calculate_total_drag_many(avg_price, mid0, side, exchanges=exchange)
+        otc_spread = self.otc_spread_bps / 10000.0
+        otc = self.calculator.compare_otc_many(drag["total_percent"], otc_spread, notionals_usd=notional_usd, filled=filled)
+
+        instant = compiled.simulate_trade(side, notional_usd)
+        instant_percent = (self.calculator.calculate_total_drag(instant['avg_price'], mid0, side, exchange=exchange)['total_percent']
+                           if instant['filled'] else math.nan)
+        return ExecutionRiskResult(side, notional_usd, otc_spread, avg_price, drag["total_percent"],
+                                   otc["net_advantage_usd"], otc["exchange_better"], filled, instant_percent,
+                                   time.perf_counter() - start)
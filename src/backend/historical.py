@@ -0,0 +1,123 @@
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+SeriesKey = Tuple[str, str, str]  # (exchange, symbol, timeframe)
+
+KEY_COLUMNS = ['exchange', 'symbol', 'timeframe']
+MATRIX_INDEX = KEY_COLUMNS + ['day_of_week', 'hour']
+
+# Below this many series the process pool costs more (pickling, start-up) than it saves
+PROCESS_POOL_THRESHOLD = 200
+
+
+def prepare_series(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces one fetch_historical_volatility frame to the columns the matrix needs.
+
+    Returns:
+        DataFrame with day_of_week, hour, volatility_pct and volume_usd.
+    """
+    date = pd.to_datetime(df['timestamp'], unit='ms')
+    return pd.DataFrame({
+        'day_of_week': date.dt.dayofweek.to_numpy(dtype=np.int8),
+        'hour': date.dt.hour.to_numpy(dtype=np.int8),
+        'volatility_pct': df['volatility_pct'].to_numpy(dtype=np.float64),
+        'volume_usd': (df['volume'] * df['close']).to_numpy(dtype=np.float64)
+    })
+
+
+def stack_series(series: Dict[SeriesKey, pd.DataFrame], max_workers: Optional[int] = None,
+                 process_threshold: int = PROCESS_POOL_THRESHOLD) -> pd.DataFrame:
+    """
+    Stacks many per-series frames into one columnar frame keyed by exchange/symbol/timeframe.
+
+    Per-series preparation is fanned out across a process pool once there are
+    at least `process_threshold` series.
+    """
+    keys = [key for key, df in series.items() if df is not None and not df.empty]
+    if not keys:
+        return pd.DataFrame(columns=KEY_COLUMNS + ['day_of_week', 'hour', 'volatility_pct', 'volume_usd'])
+
+    frames = [series[key] for key in keys]
+    if len(keys) >= process_threshold:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            prepared = list(executor.map(prepare_series, frames, chunksize=max(1, len(frames) // 64)))
+    else:
+        prepared = [prepare_series(df) for df in frames]
+
+    lengths = np.fromiter((len(p) for p in prepared), dtype=np.int64, count=len(prepared))
+    stacked = pd.concat(prepared, ignore_index=True)
+
+    # Keys are stored once per series and expanded as categorical codes
+    for position, column in enumerate(KEY_COLUMNS):
+        categories = pd.Index(sorted({key[position] for key in keys}))
+        codes = np.repeat(categories.get_indexer([key[position] for key in keys]), lengths)
+        stacked[column] = pd.Categorical.from_codes(codes, categories=categories)
+    return stacked[KEY_COLUMNS + ['day_of_week', 'hour', 'volatility_pct', 'volume_usd']]
+
+
+def time_of_day_matrix(stacked: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates a stacked frame in one groupby pass.
+
+    Returns:
+        DataFrame indexed by (exchange, symbol, timeframe, day_of_week, hour) with
+        mean volatility_pct, mean volume_usd per candle and the candle count.
+    """
+    grouped = stacked.groupby(MATRIX_INDEX, observed=True, sort=True)
+    matrix = grouped.agg(
+        volatility_pct=('volatility_pct', 'mean'),
+        volume_usd=('volume_usd', 'mean'),
+        candles=('volatility_pct', 'size')
+    )
+    return matrix
+
+
+def heatmap(matrix: pd.DataFrame, exchange: str, symbol: str, timeframe: str, value: str = 'volatility_pct') -> pd.DataFrame:
+    """Day-of-week (rows, 0=Monday) x hour (columns) view of one series."""
+    grid = matrix.loc[(exchange, symbol, timeframe), value].unstack('hour')
+    return grid.reindex(index=range(7), columns=range(24))
+
+
+def best_hours(matrix: pd.DataFrame) -> pd.DataFrame:
+    """Lowest-volatility UTC hour per series (averaged over days of the week)."""
+    by_hour = matrix.groupby(KEY_COLUMNS + ['hour'], observed=True)['volatility_pct'].mean()
+    best = by_hour.loc[by_hour.groupby(KEY_COLUMNS, observed=True).idxmin()]
+    return best.reset_index()
+
+
+def fetch_series(clients: Dict[str, Any], symbols: Sequence[str], timeframes: Sequence[str], days: int = 30,
+                 fetch_workers: int = 8) -> Dict[SeriesKey, pd.DataFrame]:
+    """
+    Fetches fetch_historical_volatility output for every venue x symbol x timeframe.
+
+    Args:
+        clients: {exchange_id: ExchangeClient}.
+        symbols: Symbols to analyse.
+        timeframes: ccxt timeframes.
+        days: Lookback window.
+        fetch_workers: Concurrent requests (I/O bound, so threads).
+    """
+    keys = [(exc, sym, tf) for exc in clients for sym in symbols for tf in timeframes]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, len(keys)))) as executor:
+        futures = {
+            key: executor.submit(clients[key[0]].fetch_historical_volatility, key[1], timeframe=key[2], days=days)
+            for key in keys
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def analyze_time_of_day(clients: Dict[str, Any], symbols: Sequence[str], timeframes: Sequence[str] = ('1h',),
+                        days: int = 30, fetch_workers: int = 8, max_workers: Optional[int] = None,
+                        process_threshold: int = PROCESS_POOL_THRESHOLD) -> pd.DataFrame:
+    """
+    Hour-of-day x day-of-week volatility/volume matrix across venues, symbols and timeframes.
+
+    Returns:
+        See time_of_day_matrix. Series that could not be fetched are absent.
+    """
+    series = fetch_series(clients, symbols, timeframes, days=days, fetch_workers=fetch_workers)
+    stacked = stack_series(series, max_workers=max_workers, process_threshold=process_threshold)
+    return time_of_day_matrix(stacked)
@@ -0,0 +1,508 @@
+import bisect
+import json
+import numpy as np
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .orderbook import OrderBookSnapshot, levels_to_arrays
+from .simulation import BookSide, CompiledOrderBook, _slippage
+
+Level = Tuple[float, float]  # (price, size); size 0 removes the level
+
+
+class SequenceGapError(ValueError):
+    """Raised when a delta does not directly follow the last applied sequence number."""
+
+
+class BookEvent:
+    """One L2 feed message: a full snapshot or a batch of level deltas."""
+
+    SNAPSHOT = 'snapshot'
+    DELTA = 'delta'
+
+    __slots__ = ('kind', 'sequence', 'bids', 'asks', 'timestamp')
+
+    def __init__(self, kind: str, sequence: int, bids: Sequence[Level], asks: Sequence[Level], timestamp: Optional[int] = None):
+        self.kind = kind
+        self.sequence = sequence
+        self.bids = bids
+        self.asks = asks
+        self.timestamp = timestamp
+
+    @classmethod
+    def snapshot(cls, sequence: int, bids: Sequence[Level], asks: Sequence[Level], timestamp: Optional[int] = None) -> "BookEvent":
+        return cls(cls.SNAPSHOT, sequence, bids, asks, timestamp)
+
+    @classmethod
+    def delta(cls, sequence: int, bids: Sequence[Level], asks: Sequence[Level], timestamp: Optional[int] = None) -> "BookEvent":
+        return cls(cls.DELTA, sequence, bids, asks, timestamp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "sequence": self.sequence,
+            "timestamp": self.timestamp,
+            "bids": [list(level[:2]) for level in self.bids],
+            "asks": [list(level[:2]) for level in self.asks]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BookEvent":
+        return cls(data["kind"], data["sequence"], data.get("bids", []), data.get("asks", []), data.get("timestamp"))
+
+
+class _SideLevels:
+    """
+    One side of a local book, as sorted blocks of levels with a Fenwick tree over block totals.
+
+    Levels are kept in blocks of at most 2 * BLOCK_SIZE sorted keys (bids are
+    keyed by -price so the best level is always first). An update is a binary
+    search over block maxima, an insert into one small block and an O(log n)
+    Fenwick update of that block's USD and quantity; a block that grows too
+    large is split, and only then is the Fenwick tree rebuilt (O(n / BLOCK_SIZE)).
+    A quote (fill) descends the Fenwick tree to the block where the trade
+    ends and walks at most one block, so it is O(log n + BLOCK_SIZE) and
+    never re-walks the book. compiled() still materializes the full arrays
+    (O(n), cached until the next update) for whole-book views.
+    """
+
+    BLOCK_SIZE = 64
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self._keys: List[List[float]] = []
+        self._sizes: List[List[float]] = []
+        self._maxes: List[float] = []
+        self._tree_notional: List[float] = [0.0]  # 1-indexed Fenwick trees over block totals
+        self._tree_qty: List[float] = [0.0]
+        self._count = 0
+        self._compiled: Optional[BookSide] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def _price(self, key: float) -> float:
+        return -key if self.descending else key
+
+    @property
+    def top_price(self) -> float:
+        return self._price(self._keys[0][0]) if self._count else 0.0
+
+    def _rebuild_tree(self) -> None:
+        """Fenwick trees over the current blocks' USD and quantity totals."""
+        n = len(self._keys)
+        notional = [0.0] * (n + 1)
+        qty = [0.0] * (n + 1)
+        for i, (keys, sizes) in enumerate(zip(self._keys, self._sizes), start=1):
+            notional[i] = sum(self._price(k) * q for k, q in zip(keys, sizes))
+            qty[i] = sum(sizes)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                notional[parent] += notional[i]
+                qty[parent] += qty[i]
+        self._tree_notional, self._tree_qty = notional, qty
+
+    def _add(self, block: int, notional: float, qty: float) -> None:
+        i = block + 1
+        n = len(self._keys)
+        while i <= n:
+            self._tree_notional[i] += notional
+            self._tree_qty[i] += qty
+            i += i & -i
+
+    def load(self, levels: Sequence[Level]) -> None:
+        """Replaces every level (snapshot)."""
+        prices, sizes = levels_to_arrays(levels)
+        keep = sizes > 0
+        prices, sizes = prices[keep], sizes[keep]
+        keys = -prices if self.descending else prices
+        order = np.argsort(keys, kind='stable')
+        keys, sizes = keys[order].tolist(), sizes[order].tolist()
+
+        step = self.BLOCK_SIZE
+        self._keys = [keys[i:i + step] for i in range(0, len(keys), step)]
+        self._sizes = [sizes[i:i + step] for i in range(0, len(sizes), step)]
+        self._maxes = [block[-1] for block in self._keys]
+        self._count = len(keys)
+        self._rebuild_tree()
+        self._compiled = None
+
+    def update(self, price: float, size: float) -> None:
+        """Sets a level's size; a size of 0 removes it."""
+        key = self._key(price)
+        block = bisect.bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            if size <= 0:
+                return
+            if self._keys:
+                block -= 1  # Past the last level: append to the last block
+            else:
+                self._keys, self._sizes, self._maxes = [[]], [[]], [key]
+                self._rebuild_tree()
+        keys, sizes = self._keys[block], self._sizes[block]
+        position = bisect.bisect_left(keys, key)
+        exists = position < len(keys) and keys[position] == key
+
+        if exists:
+            old = sizes[position]
+            if size > 0:
+                sizes[position] = size
+            else:
+                del keys[position], sizes[position]
+                self._count -= 1
+        elif size > 0:
+            old = 0.0
+            keys.insert(position, key)
+            sizes.insert(position, size)
+            self._count += 1
+        else:
+            return
+        self._compiled = None
+
+        if not keys:
+            del self._keys[block], self._sizes[block], self._maxes[block]
+            self._rebuild_tree()
+        elif len(keys) > 2 * self.BLOCK_SIZE:
+            half = len(keys) // 2
+            self._keys[block:block + 1] = [keys[:half], keys[half:]]
+            self._sizes[block:block + 1] = [sizes[:half], sizes[half:]]
+            self._maxes[block:block + 1] = [keys[half - 1], keys[-1]]
+            self._rebuild_tree()
+        else:
+            self._maxes[block] = keys[-1]
+            new = size if size > 0 else 0.0
+            self._add(block, price * (new - old), new - old)
+
+    def fill(self, amount_usd: float) -> Tuple[float, float, float]:
+        """
+        Fills one USD amount against this side (BookSide.fill for a single size).
+
+        Returns:
+            Tuple of (quantity acquired, USD spent, USD left unfilled).
+        """
+        amount = max(float(amount_usd), 0.0)
+        # Fenwick descent: the most leading blocks whose total USD fits in the amount
+        n = len(self._keys)
+        block, notional, qty = 0, 0.0, 0.0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = block + step
+            if nxt <= n and notional + self._tree_notional[nxt] <= amount:
+                block = nxt
+                notional += self._tree_notional[nxt]
+                qty += self._tree_qty[nxt]
+            step >>= 1
+        # Then level by level within the block where the amount runs out
+        if block < n:
+            for key, size in zip(self._keys[block], self._sizes[block]):
+                price = self._price(key)
+                level = price * size
+                if notional + level > amount:
+                    return qty + (amount - notional) / price, amount, 0.0
+                notional += level
+                qty += size
+        return qty, notional, amount - notional
+
+    def compiled(self) -> BookSide:
+        """Returns the array form with prefix sums (rebuilt once after each batch of updates)."""
+        if self._compiled is None:
+            keys = np.fromiter((k for block in self._keys for k in block), dtype=np.float64, count=self._count)
+            sizes = np.fromiter((q for block in self._sizes for q in block), dtype=np.float64, count=self._count)
+            self._compiled = BookSide(-keys if self.descending else keys, sizes)
+        return self._compiled
+
+
+class LocalOrderBook:
+    """
+    Order book maintained locally from a snapshot plus sequenced L2 deltas.
+
+    Deltas must arrive with consecutive sequence numbers; older ones are
+    ignored as duplicates and a jump raises SequenceGapError (the book is then
+    out of sync until the next snapshot).
+    """
+
+    def __init__(self, exchange: str = None, symbol: str = None):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.bids = _SideLevels(descending=True)
+        self.asks = _SideLevels(descending=False)
+        self.sequence: Optional[int] = None
+        self.timestamp: Optional[int] = None
+
+    @property
+    def synced(self) -> bool:
+        return self.sequence is not None
+
+    def invalidate(self) -> None:
+        """Marks the book out of sync; deltas are rejected until the next snapshot."""
+        self.sequence = None
+
+    def apply_snapshot(self, bids: Sequence[Level], asks: Sequence[Level], sequence: int, timestamp: Optional[int] = None) -> None:
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.sequence = sequence
+        self.timestamp = timestamp
+
+    def apply_delta(self, sequence: int, bids: Sequence[Level], asks: Sequence[Level], timestamp: Optional[int] = None) -> bool:
+        """
+        Applies one batch of level updates.
+
+        Returns:
+            True if applied, False if it was a stale duplicate.
+
+        Raises:
+            SequenceGapError: If the book is out of sync or `sequence` skips ahead.
+        """
+        if self.sequence is None:
+            raise SequenceGapError(f"{self.exchange} {self.symbol}: delta {sequence} before any snapshot")
+        if sequence <= self.sequence:
+            return False
+        if sequence != self.sequence + 1:
+            expected = self.sequence + 1
+            self.invalidate()
+            raise SequenceGapError(f"{self.exchange} {self.symbol}: expected sequence {expected}, got {sequence}")
+
+        for price, size in (level[:2] for level in bids):
+            self.bids.update(float(price), float(size))
+        for price, size in (level[:2] for level in asks):
+            self.asks.update(float(price), float(size))
+        self.sequence = sequence
+        self.timestamp = timestamp
+        return True
+
+    def apply(self, event: BookEvent) -> bool:
+        if event.kind == BookEvent.SNAPSHOT:
+            self.apply_snapshot(event.bids, event.asks, event.sequence, event.timestamp)
+            return True
+        return self.apply_delta(event.sequence, event.bids, event.asks, event.timestamp)
+
+    def compile(self) -> CompiledOrderBook:
+        """Walker-ready form with up-to-date cumulative depth (see OrderBookWalker.compile)."""
+        return CompiledOrderBook(self.bids.compiled(), self.asks.compiled())
+
+    def to_snapshot(self) -> OrderBookSnapshot:
+        bids = self.bids.compiled()
+        asks = self.asks.compiled()
+        return OrderBookSnapshot(
+            bids.prices, bids.sizes, asks.prices, asks.sizes,
+            exchange=self.exchange, symbol=self.symbol, timestamp=self.timestamp, nonce=self.sequence
+        )
+
+    def quote(self, side: str, amount_usd: float) -> Dict[str, float]:
+        """
+        Prices a trade against the current book (same output as OrderBookWalker.simulate_trade).
+
+        O(log n + BLOCK_SIZE) however many deltas arrived since the last
+        quote; no prefix sums are rebuilt (see _SideLevels).
+        """
+        is_buy = side.lower() == 'buy'
+        levels = self.asks if is_buy else self.bids
+        if not len(levels):
+            return {"total_asset_acquired": 0.0, "avg_price": 0.0, "filled": False}
+        qty, spent, unfilled = levels.fill(amount_usd)
+        has_fill = qty > 0
+        avg_price = spent / qty if has_fill else 0.0
+        return {
+            "total_asset_acquired": qty,
+            "avg_price": avg_price,
+            "slippage_percent": float(_slippage(np.float64(avg_price), has_fill, levels.top_price, side)),
+            "filled": has_fill and unfilled <= 1.0  # Same tolerance as the level walk
+        }
+
+    @property
+    def best_bid(self) -> float:
+        return self.bids.top_price
+
+    @property
+    def best_ask(self) -> float:
+        return self.asks.top_price
+
+    @property
+    def mid_price(self) -> float:
+        if not len(self.bids) or not len(self.asks):
+            return 0.0
+        return (self.best_bid + self.best_ask) / 2
+
+
+# --- Feeds ---
+# A feed is iterable (or async iterable) over BookEvents and has resync(),
+# which returns a fresh snapshot event, or None if the consumer must wait for
+# the next snapshot in the stream.
+
+class FakeDeltaFeed:
+    """
+    Seeded in-process L2 generator for tests and benchmarks.
+
+    Keeps its own authoritative book (`truth_snapshot()`) so a consumer can be
+    checked against it. `drop_rate` silently skips messages to exercise gap
+    detection and resync.
+    """
+
+    def __init__(self, seed: int = 0, levels: int = 500, mid: float = 100.0, tick: float = 0.01,
+                 updates: int = 1000, batch: int = 5, drop_rate: float = 0.0):
+        self.rng = np.random.default_rng(seed)
+        self.tick = tick
+        self.updates = updates
+        self.batch = batch
+        self.drop_rate = drop_rate
+        self.sequence = 0
+
+        mid_tick = int(round(mid / tick))
+        self._mid_tick = mid_tick
+        self._span = levels * 2
+        sizes = self.rng.uniform(0.1, 5.0, size=(2, levels))
+        self._bids = {mid_tick - 1 - i: float(sizes[0, i]) for i in range(levels)}
+        self._asks = {mid_tick + 1 + i: float(sizes[1, i]) for i in range(levels)}
+
+    def _levels(self, side: Dict[int, float], descending: bool) -> List[Level]:
+        return [(round(t * self.tick, 10), side[t]) for t in sorted(side, reverse=descending)]
+
+    def truth_snapshot(self) -> BookEvent:
+        return BookEvent.snapshot(self.sequence, self._levels(self._bids, True), self._levels(self._asks, False))
+
+    def resync(self) -> BookEvent:
+        return self.truth_snapshot()
+
+    def _random_delta(self) -> BookEvent:
+        bids, asks = [], []
+        for _ in range(self.batch):
+            is_bid = self.rng.random() < 0.5
+            offset = 1 + int(self.rng.geometric(0.02)) % self._span  # Activity concentrates near the top
+            tick = self._mid_tick - offset if is_bid else self._mid_tick + offset
+            size = 0.0 if self.rng.random() < 0.25 else float(self.rng.uniform(0.1, 5.0))
+            side = self._bids if is_bid else self._asks
+            if size > 0:
+                side[tick] = size
+            else:
+                side.pop(tick, None)
+            (bids if is_bid else asks).append((round(tick * self.tick, 10), size))
+        self.sequence += 1
+        return BookEvent.delta(self.sequence, bids, asks)
+
+    def __iter__(self) -> Iterator[BookEvent]:
+        yield self.truth_snapshot()
+        for _ in range(self.updates):
+            event = self._random_delta()
+            if self.drop_rate and self.rng.random() < self.drop_rate:
+                continue
+            yield event
+
+
+class ReplayFeed:
+    """Replays a recorded JSONL file of BookEvents (see write_events)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __iter__(self) -> Iterator[BookEvent]:
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield BookEvent.from_dict(json.loads(line))
+
+    def resync(self) -> None:
+        # A recording cannot be re-queried; wait for its next snapshot
+        return None
+
+
+def write_events(path: str, events: Iterable[BookEvent]) -> int:
+    """Records events as JSONL for ReplayFeed. Returns the number written."""
+    count = 0
+    with open(path, 'w') as f:
+        for event in events:
+            f.write(json.dumps(event.to_dict()) + '\n')
+            count += 1
+    return count
+
+
+class CcxtProFeed:
+    """
+    Live feed through ccxt.pro websockets.
+
+    ccxt.pro applies the venue's raw deltas itself and hands back the
+    maintained book, so each update is surfaced as a snapshot event (sequence
+    is the book nonce when the venue provides one, else a local counter).
+    """
+
+    def __init__(self, exchange_id: str, symbol: str, limit: Optional[int] = None, exchange: Any = None):
+        self.symbol = symbol
+        self.limit = limit
+        if exchange is None:
+            try:
+                import ccxt.pro as ccxtpro
+                exchange = getattr(ccxtpro, exchange_id)()
+            except (ImportError, AttributeError):
+                raise ValueError(f"Exchange {exchange_id} has no ccxt.pro websocket support")
+        self.exchange = exchange
+        self._counter = 0
+
+    async def __aiter__(self) -> AsyncIterator[BookEvent]:
+        while True:
+            book = await self.exchange.watch_order_book(self.symbol, self.limit)
+            self._counter += 1
+            yield BookEvent.snapshot(book.get('nonce') or self._counter, book['bids'], book['asks'], book.get('timestamp'))
+
+    def resync(self) -> None:
+        # Every event is already a full snapshot
+        return None
+
+    async def close(self) -> None:
+        await self.exchange.close()
+
+
+class LocalBookEngine:
+    """Drives a LocalOrderBook from a feed, handling gaps and resyncs."""
+
+    def __init__(self, feed: Any, exchange: str = None, symbol: str = None):
+        self.feed = feed
+        self.book = LocalOrderBook(exchange, symbol)
+        self.stats = {"snapshots": 0, "deltas": 0, "stale": 0, "gaps": 0, "resyncs": 0, "dropped": 0}
+
+    def on_event(self, event: BookEvent) -> None:
+        if event.kind == BookEvent.SNAPSHOT:
+            self.book.apply(event)
+            self.stats["snapshots"] += 1
+            return
+        if not self.book.synced:
+            # Waiting for a snapshot after a gap
+            self.stats["dropped"] += 1
+            return
+        try:
+            if self.book.apply(event):
+                self.stats["deltas"] += 1
+            else:
+                self.stats["stale"] += 1
+        except SequenceGapError:
+            self.stats["gaps"] += 1
+            self._resync()
+
+    def _resync(self) -> None:
+        event = self.feed.resync()
+        if event is not None:
+            self.book.apply(event)
+            self.stats["resyncs"] += 1
+
+    def run(self, max_events: Optional[int] = None) -> LocalOrderBook:
+        """Consumes a synchronous feed."""
+        for count, event in enumerate(self.feed, start=1):
+            self.on_event(event)
+            if max_events is not None and count >= max_events:
+                break
+        return self.book
+
+    async def run_async(self, max_events: Optional[int] = None) -> LocalOrderBook:
+        """Consumes an async feed (e.g. CcxtProFeed)."""
+        count = 0
+        async for event in self.feed:
+            self.on_event(event)
+            count += 1
+            if max_events is not None and count >= max_events:
+                break
+        return self.book
+
+    def quote(self, side: str, amount_usd: float) -> Dict[str, float]:
+        """Prices a trade against the current local book (same output as OrderBookWalker.simulate_trade)."""
+        return self.book.quote(side, amount_usd)
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MARKET_DIR = os.path.join(
+    os.environ.get('OTC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'otc_slippage')),
+    'markets'
+)
+
+# (markets, currencies) as returned by a ccxt exchange after load_markets()
+MarketLoader = Callable[[], Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]
+
+
+def market_summary(markets: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Compact per-symbol metadata from ccxt markets.
+
+    Returns:
+        {symbol: {base, quote, active, price_precision, amount_precision,
+        min_amount, min_cost, max_depth}}; max_depth is None unless the venue
+        reports it.
+    """
+    summary = {}
+    for symbol, market in markets.items():
+        precision = market.get('precision') or {}
+        limits = market.get('limits') or {}
+        info = market.get('info') or {}
+        summary[symbol] = {
+            'base': market.get('base'),
+            'quote': market.get('quote'),
+            'active': market.get('active'),
+            'price_precision': precision.get('price'),
+            'amount_precision': precision.get('amount'),
+            'min_amount': (limits.get('amount') or {}).get('min'),
+            'min_cost': (limits.get('cost') or {}).get('min'),
+            'max_depth': info.get('maxOrderBookDepth') if isinstance(info, dict) else None
+        }
+    return summary
+
+
+class MarketCache:
+    """
+    On-disk cache of ccxt market metadata, shared by every process on the machine.
+
+    One JSON file per exchange holds the markets and currencies ccxt needs
+    (restored with exchange.set_markets, so ccxt never calls load_markets
+    itself). Entries older than `ttl` are still served while a single
+    background refresh runs; a lock file keeps concurrent processes from
+    downloading the same venue at once.
+    """
+
+    def __init__(self, root: str = DEFAULT_MARKET_DIR, ttl: float = 24 * 3600, lock_timeout: float = 120.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            root: Directory holding the cache files.
+            ttl: Seconds after which an entry is refreshed (it is still served meanwhile).
+            lock_timeout: Age after which another process's refresh lock is considered abandoned.
+            clock: Wall-clock source (entries are compared across processes).
+        """
+        self.root = root
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._refreshing: Dict[str, threading.Thread] = {}
+
+    def path(self, exchange_id: str) -> str:
+        return os.path.join(self.root, f"{exchange_id}.json")
+
+    def load(self, exchange_id: str) -> Optional[Dict[str, Any]]:
+        """Cached entry ({fetched_at, markets, currencies}) or None if missing or unreadable."""
+        try:
+            with open(self.path(exchange_id)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not entry.get('markets'):
+            return None
+        return entry
+
+    def save(self, exchange_id: str, markets: Dict[str, Any], currencies: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Atomically replaces the entry (readers see the old or the new file, never a partial one)."""
+        entry = {'exchange': exchange_id, 'fetched_at': self.clock(), 'markets': markets, 'currencies': currencies}
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(exchange_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, path)
+        return entry
+
+    def is_fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and self.clock() - entry.get('fetched_at', 0) <= self.ttl
+
+    def _acquire(self, exchange_id: str) -> bool:
+        os.makedirs(self.root, exist_ok=True)
+        lock_path = self.path(exchange_id) + '.lock'
+        for _ in range(2):
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) <= self.lock_timeout:
+                        return False
+                    os.remove(lock_path)  # Abandoned by a crashed process
+                except OSError:
+                    pass
+        return False
+
+    def _release(self, exchange_id: str) -> None:
+        try:
+            os.remove(self.path(exchange_id) + '.lock')
+        except OSError:
+            pass
+
+    def refresh(self, exchange_id: str, loader: MarketLoader) -> Optional[Dict[str, Any]]:
+        """
+        Downloads and stores fresh markets unless another process is already doing so.
+
+        Returns:
+            The new entry, or None if the refresh was left to another process.
+        """
+        if not self._acquire(exchange_id):
+            return None
+        try:
+            markets, currencies = loader()
+            return self.save(exchange_id, markets, currencies)
+        finally:
+            self._release(exchange_id)
+
+    def refresh_async(self, exchange_id: str, loader: MarketLoader,
+                      on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[threading.Thread]:
+        """Starts a background refresh (at most one per exchange per process); `on_done` gets the new entry."""
+        def run():
+            try:
+                entry = self.refresh(exchange_id, loader)
+                if entry is not None and on_done is not None:
+                    on_done(entry)
+            except Exception as e:
+                print(f"Background market refresh failed for {exchange_id}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.pop(exchange_id, None)
+
+        with self._lock:
+            if exchange_id in self._refreshing:
+                return None
+            thread = threading.Thread(target=run, name=f"markets-{exchange_id}", daemon=True)
+            self._refreshing[exchange_id] = thread
+        thread.start()
+        return thread
+
+    def get(self, exchange_id: str, loader: MarketLoader,
+            on_refresh: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Cached entry, downloading it only if there is none.
+
+        A stale entry is returned immediately and refreshed in the background
+        (`on_refresh` receives the new entry).
+        """
+        entry = self.load(exchange_id)
+        if entry is not None:
+            if not self.is_fresh(entry):
+                self.refresh_async(exchange_id, loader, on_refresh)
+            return entry
+
+        entry = self.refresh(exchange_id, loader)
+        if entry is not None:
+            return entry
+        # Another process is downloading: wait for its file rather than download again
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline and os.path.exists(self.path(exchange_id) + '.lock'):
+            time.sleep(0.05)
+        entry = self.load(exchange_id)
+        if entry is not None:
+            return entry
+        markets, currencies = loader()
+        return self.save(exchange_id, markets, currencies)
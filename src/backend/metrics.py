@@ -0,0 +1,297 @@
+import http.server
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Log-linear buckets: SUB_BUCKETS per power of two (~4% relative error),
+# covering roughly 1 ns to 4 hours in seconds.
+SUB_BUCKETS = 16
+MIN_EXPONENT = -30
+MAX_EXPONENT = 14
+
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram (seconds).
+
+    Values fall into fixed log-linear buckets, so recording is O(1), memory is
+    bounded and percentiles keep a constant relative precision whatever the
+    range of values recorded.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * ((MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(value: float) -> int:
+        if value <= 0:
+            return 0
+        mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent, 0.5 <= mantissa < 1
+        if exponent < MIN_EXPONENT:
+            return 0
+        if exponent > MAX_EXPONENT:
+            return (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS - 1
+        return (exponent - MIN_EXPONENT) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+    @staticmethod
+    def bucket_upper(index: int) -> float:
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent + MIN_EXPONENT)
+
+    def record(self, value: float) -> None:
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 <= q <= 1), clamped to the observed max."""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, n in enumerate(other.counts):
+            if n:
+                self.counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class _Span:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.registry._observe(self.name, self.labels, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry._incr('errors', self.labels + (('stage', self.name),), 1)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    """
+    Per-stage latency histograms and counters for the pricing pipeline.
+
+    Usage:
+        with metrics.span('fetch', exchange='binance'):
+            ...
+        metrics.incr('cache_hits')
+
+    When disabled, span() returns a shared no-op context manager and incr()
+    returns immediately, so instrumented code pays one attribute check.
+    Export with to_prometheus(), write_prometheus(path) or serve(port).
+    """
+
+    def __init__(self, enabled: bool = False, namespace: str = 'otc'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], LatencyHistogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._server: Optional[http.server.ThreadingHTTPServer] = None
+
+    def span(self, name: str, **labels: str):
+        """Times the enclosed block into the `name` histogram (errors raised inside are counted)."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, tuple(sorted(labels.items())))
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Records an externally measured duration."""
+        if self.enabled:
+            self._observe(name, tuple(sorted(labels.items())), seconds)
+
+    def incr(self, name: str, value: float = 1, **labels: str) -> None:
+        if self.enabled:
+            self._incr(name, tuple(sorted(labels.items())), value)
+
+    def gauge(self, name: str, value: float, **labels: str) -> None:
+        """Sets a point-in-time value (e.g. a queue depth)."""
+        if self.enabled:
+            with self._lock:
+                self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def _observe(self, name: str, labels: Labels, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def _incr(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def histogram(self, name: str, **labels: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauge_value(self, name: str, **labels: str) -> Optional[float]:
+        return self._gauges.get((name, tuple(sorted(labels.items()))))
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Current values for display.
+
+        Returns:
+            {"stages": [{stage, labels..., count, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}],
+             "counters": [{counter, labels..., value}]}
+        """
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        stages = [
+            {
+                "stage": name, **dict(labels), "count": h.count, "mean_ms": h.mean * 1e3,
+                "p50_ms": h.percentile(0.5) * 1e3, "p90_ms": h.percentile(0.9) * 1e3,
+                "p99_ms": h.percentile(0.99) * 1e3, "max_ms": h.max * 1e3
+            }
+            for (name, labels), h in sorted(histograms, key=lambda item: item[0])
+        ]
+        counter_rows = [{"counter": name, **dict(labels), "value": value} for (name, labels), value in sorted(counters)]
+        return {"stages": stages, "counters": counter_rows}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition: a summary per stage, a counter per counter name and a gauge per gauge name."""
+        def fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+            items = labels + extra
+            if not items:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        stage_metric = f"{self.namespace}_stage_seconds"
+        if histograms:
+            lines.append(f"# HELP {stage_metric} Pipeline stage latency.")
+            lines.append(f"# TYPE {stage_metric} summary")
+        for (name, labels), h in histograms:
+            labels = (('stage', name),) + labels
+            for q in SUMMARY_QUANTILES:
+                lines.append(f"{stage_metric}{fmt_labels(labels, (('quantile', str(q)),))} {h.percentile(q):.9g}")
+            lines.append(f"{stage_metric}_sum{fmt_labels(labels)} {h.total:.9g}")
+            lines.append(f"{stage_metric}_count{fmt_labels(labels)} {h.count}")
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{self.namespace}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{fmt_labels(labels)} {value:.9g}")
+
+        for (name, labels), value in gauges:
+            metric = f"{self.namespace}_{name}"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{fmt_labels(labels)} {value:.9g}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> str:
+        """Writes the exposition atomically (e.g. for the node_exporter textfile collector)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def serve(self, port: int = 9108, host: str = '127.0.0.1') -> int:
+        """Serves GET /metrics on a daemon thread; returns the bound port (0 picks a free one)."""
+        if self._server is not None:
+            return self._server.server_address[1]
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Process-wide registry used by the instrumented modules; enable with OTC_METRICS=1
+# or by setting metrics.enabled at runtime.
+metrics = MetricsRegistry(enabled=os.environ.get('OTC_METRICS', '') not in ('', '0'))
@@ -0,0 +1,122 @@
+import numpy as np
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+def levels_to_arrays(levels: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts ccxt [price, amount, ...] levels into contiguous float64 price and size arrays.
+
+    Args:
+        levels: List of ccxt levels (extra fields such as counts or ids are ignored).
+
+    Returns:
+        Tuple of (prices, sizes).
+    """
+    if levels is None or len(levels) == 0:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    try:
+        arr = np.asarray(levels, dtype=np.float64)
+    except ValueError:
+        # Ragged rows (some venues append ids/timestamps to a few levels only)
+        arr = np.asarray([level[:2] for level in levels], dtype=np.float64)
+    return np.ascontiguousarray(arr[:, 0]), np.ascontiguousarray(arr[:, 1])
+
+
+class OrderBookSnapshot:
+    """
+    Compact, array-backed L2 order book snapshot.
+
+    Built once at fetch time from the ccxt dict-of-lists; every consumer
+    (walker, calculator, charts) reads the float64 arrays directly.
+    Bids are best-first (descending), asks are best-first (ascending).
+    """
+
+    __slots__ = (
+        'exchange', 'symbol', 'timestamp', 'nonce',
+        'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes',
+        '_compiled'
+    )
+
+    def __init__(self, bid_prices: np.ndarray, bid_sizes: np.ndarray, ask_prices: np.ndarray, ask_sizes: np.ndarray,
+                 exchange: str = None, symbol: str = None, timestamp: Optional[int] = None, nonce: Optional[int] = None):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.nonce = nonce
+        # No-ops for arrays that are already contiguous float64
+        self.bid_prices = np.ascontiguousarray(bid_prices, dtype=np.float64)
+        self.bid_sizes = np.ascontiguousarray(bid_sizes, dtype=np.float64)
+        self.ask_prices = np.ascontiguousarray(ask_prices, dtype=np.float64)
+        self.ask_sizes = np.ascontiguousarray(ask_sizes, dtype=np.float64)
+        self._compiled = None
+
+    @classmethod
+    def from_ccxt(cls, order_book: Dict[str, Any], exchange: str = None, symbol: str = None) -> "OrderBookSnapshot":
+        """Converts a raw ccxt order book (one pass per side)."""
+        bid_prices, bid_sizes = levels_to_arrays(order_book.get('bids'))
+        ask_prices, ask_sizes = levels_to_arrays(order_book.get('asks'))
+        return cls(
+            bid_prices, bid_sizes, ask_prices, ask_sizes,
+            exchange=exchange,
+            symbol=symbol or order_book.get('symbol'),
+            timestamp=order_book.get('timestamp'),
+            nonce=order_book.get('nonce')
+        )
+
+    def to_ccxt(self) -> Dict[str, Any]:
+        """Converts back to the ccxt dict-of-lists layout (for export/legacy callers)."""
+        return {
+            'symbol': self.symbol,
+            'timestamp': self.timestamp,
+            'nonce': self.nonce,
+            'bids': np.column_stack((self.bid_prices, self.bid_sizes)).tolist(),
+            'asks': np.column_stack((self.ask_prices, self.ask_sizes)).tolist()
+        }
+
+    def side(self, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (prices, sizes) of the side consumed by a trade (asks for a buy, bids for a sell)."""
+        if side.lower() == 'buy':
+            return self.ask_prices, self.ask_sizes
+        return self.bid_prices, self.bid_sizes
+
+    def compile(self):
+        """Returns the precompiled (prefix-sum) form, built once and cached on the snapshot."""
+        if self._compiled is None:
+            from .simulation import CompiledOrderBook
+            self._compiled = CompiledOrderBook.from_snapshot(self)
+        return self._compiled
+
+    @property
+    def empty(self) -> bool:
+        """True if either side has no levels."""
+        return len(self.bid_prices) == 0 or len(self.ask_prices) == 0
+
+    @property
+    def best_bid(self) -> float:
+        return float(self.bid_prices[0]) if len(self.bid_prices) else 0.0
+
+    @property
+    def best_ask(self) -> float:
+        return float(self.ask_prices[0]) if len(self.ask_prices) else 0.0
+
+    @property
+    def mid_price(self) -> float:
+        """Mid of the top of book, or 0.0 if either side is empty."""
+        if self.empty:
+            return 0.0
+        return (self.best_bid + self.best_ask) / 2
+
+    @property
+    def spread(self) -> float:
+        """Quoted spread as a fraction of mid."""
+        mid = self.mid_price
+        return (self.best_ask - self.best_bid) / mid if mid else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the level arrays."""
+        return self.bid_prices.nbytes + self.bid_sizes.nbytes + self.ask_prices.nbytes + self.ask_sizes.nbytes
+
+    def __repr__(self) -> str:
+        return (f"OrderBookSnapshot({self.exchange}, {self.symbol}, bids={len(self.bid_prices)}, "
+                f"asks={len(self.ask_prices)}, timestamp={self.timestamp})")
@@ -0,0 +1,519 @@
+import asyncio
+import ccxt
+import json
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .calculator import CostCalculator
+from .depth import liquidity_at_budget
+from .exchange_client import AsyncExchangeClient, fetch_order_books
+from .markets import MarketCache
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+from .simulation import size_grid, slippage_curve
+
+BookKey = Tuple[str, str]
+
+DEFAULT_DEPTH = 1000
+DEFAULT_REFRESH = 1.0
+IDLE_TTL = 300.0        # On-demand subscriptions without requests for this long stop being polled
+REJECT_TTL = 300.0      # Symbols a venue rejected are refused this long without polling again
+MAX_CURVE_POINTS = 5000
+MAX_REQUEST_BYTES = 16384
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class QuoteError(Exception):
+    """Request error reported to the client with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class HotBooks:
+    """
+    Latest order book per subscribed (venue, symbol), kept warm in memory.
+
+    One polling task per venue fetches all of its subscribed symbols every
+    `refresh_interval` seconds (concurrently, through fetch_order_books) and
+    swaps in the new compiled snapshots. Readers on the same event loop never
+    wait on the network: they get the most recent book and its age. A failed
+    poll keeps the previous book (its age keeps growing).
+
+    Subscriptions made on demand (by requests) are dropped once nothing has
+    read them for `idle_ttl` seconds, and at once if the venue rejects the
+    symbol (ccxt.BadSymbol); the rejection is remembered for REJECT_TTL so
+    repeated typos are answered without polling. Subscriptions made up front
+    are kept for good.
+    """
+
+    def __init__(self, depth: int = DEFAULT_DEPTH, refresh_interval: float = DEFAULT_REFRESH, timeout: float = 5.0,
+                 config: Optional[Dict[str, Any]] = None, market_cache: Optional[MarketCache] = None,
+                 clock: Callable[[], float] = time.monotonic, idle_ttl: Optional[float] = IDLE_TTL):
+        """
+        Args:
+            depth: Levels fetched per book.
+            refresh_interval: Seconds between polls of a venue.
+            timeout: Per-request timeout in seconds.
+            config: Exchange constructor options (e.g. the simulated exchange's).
+            market_cache: On-disk market metadata cache shared with other processes.
+            clock: Monotonic time source for book ages.
+            idle_ttl: Seconds an on-demand subscription survives without reads (None = forever).
+        """
+        self.depth = depth
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.config = config
+        self.market_cache = market_cache
+        self.clock = clock
+        self.idle_ttl = idle_ttl
+        self._clients: Dict[str, AsyncExchangeClient] = {}
+        self._symbols: Dict[str, List[str]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._books: Dict[BookKey, Tuple[OrderBookSnapshot, float]] = {}
+        self._errors: Dict[BookKey, str] = {}
+        self._first: Dict[BookKey, asyncio.Event] = {}
+        self._last_read: Dict[BookKey, float] = {}  # On-demand subscriptions only
+        self._rejected: Dict[BookKey, Tuple[str, float]] = {}
+        self.stats = {"polls": 0, "poll_errors": 0, "expired": 0, "rejected": 0}
+
+    def subscribe(self, exchange_id: str, symbol: str, on_demand: bool = False) -> None:
+        """
+        Adds a (venue, symbol) to the venue's poll; starts the venue's task if needed. Must run on the loop.
+
+        Args:
+            exchange_id: Venue.
+            symbol: Market symbol.
+            on_demand: Expire the subscription after idle_ttl seconds without reads.
+        """
+        key = (exchange_id, symbol)
+        if key in self._first:
+            if not on_demand:
+                self._last_read.pop(key, None)
+            return
+        if on_demand:
+            self._last_read[key] = self.clock()
+        if exchange_id not in self._clients:
+            # Raises ValueError for unknown exchange ids
+            self._clients[exchange_id] = AsyncExchangeClient(exchange_id, timeout=self.timeout, config=self.config,
+                                                             market_cache=self.market_cache)
+            self._symbols[exchange_id] = []
+        self._symbols[exchange_id].append(symbol)
+        self._first[key] = asyncio.Event()
+        if exchange_id not in self._tasks:
+            self._tasks[exchange_id] = asyncio.ensure_future(self._poll(exchange_id))
+
+    def unsubscribe(self, exchange_id: str, symbol: str) -> None:
+        """Stops polling a (venue, symbol) and forgets its book; waiters for its first poll are released."""
+        key = (exchange_id, symbol)
+        event = self._first.pop(key, None)
+        if event is None:
+            return
+        event.set()
+        self._symbols[exchange_id].remove(symbol)
+        self._books.pop(key, None)
+        self._errors.pop(key, None)
+        self._last_read.pop(key, None)
+
+    def rejected(self, exchange_id: str, symbol: str) -> Optional[str]:
+        """Why the venue rejected the symbol, if it did within REJECT_TTL."""
+        entry = self._rejected.get((exchange_id, symbol))
+        if entry is None:
+            return None
+        if self.clock() - entry[1] > REJECT_TTL:
+            del self._rejected[(exchange_id, symbol)]
+            return None
+        return entry[0]
+
+    def _expire_idle(self, exchange_id: str) -> None:
+        if self.idle_ttl is None:
+            return
+        now = self.clock()
+        for symbol in list(self._symbols[exchange_id]):
+            last = self._last_read.get((exchange_id, symbol))
+            if last is not None and now - last > self.idle_ttl:
+                self.unsubscribe(exchange_id, symbol)
+                self.stats["expired"] += 1
+
+    async def _poll(self, exchange_id: str) -> None:
+        client = self._clients[exchange_id]
+        while True:
+            start = self.clock()
+            self._expire_idle(exchange_id)
+            symbols = list(self._symbols[exchange_id])
+            if not symbols:
+                # Nothing left to poll; subscribe() starts a new task
+                del self._tasks[exchange_id]
+                return
+            try:
+                results = await fetch_order_books([client], symbols, limit=self.depth, deadline=self.timeout)
+            except Exception as e:
+                results = {(exchange_id, symbol): e for symbol in symbols}
+            now = self.clock()
+            self.stats["polls"] += 1
+            for (exc, symbol), result in results.items():
+                key = (exc, symbol)
+                if key not in self._first:
+                    continue  # Unsubscribed while the poll was in flight
+                if isinstance(result, ccxt.BadSymbol):
+                    # The venue has no such market: polling it again would only burn rate-limit tokens
+                    self.stats["poll_errors"] += 1
+                    self.stats["rejected"] += 1
+                    self._rejected[key] = (f"{type(result).__name__}: {result}", now)
+                    self.unsubscribe(exc, symbol)
+                    continue
+                if isinstance(result, Exception):
+                    self.stats["poll_errors"] += 1
+                    self._errors[key] = f"{type(result).__name__}: {result}"
+                else:
+                    result.compile()  # Requests only read precompiled books
+                    self._books[key] = (result, now)
+                    self._errors.pop(key, None)
+                self._first[key].set()
+            await asyncio.sleep(max(0.0, self.refresh_interval - (self.clock() - start)))
+
+    async def wait_ready(self, keys: Sequence[BookKey], timeout: float) -> None:
+        """Waits until every subscribed key has had its first poll (successful or not)."""
+        events = [self._first[key].wait() for key in keys if key in self._first and not self._first[key].is_set()]
+        if events:
+            await asyncio.wait_for(asyncio.gather(*events), timeout)
+
+    def get(self, exchange_id: str, symbol: str) -> Optional[Tuple[OrderBookSnapshot, float]]:
+        """(snapshot, age in seconds) or None if no poll has succeeded yet. Counts as a read of the subscription."""
+        key = (exchange_id, symbol)
+        if key in self._last_read:
+            self._last_read[key] = self.clock()
+        entry = self._books.get(key)
+        if entry is None:
+            return None
+        return entry[0], self.clock() - entry[1]
+
+    def error(self, exchange_id: str, symbol: str) -> Optional[str]:
+        return self._errors.get((exchange_id, symbol)) or self.rejected(exchange_id, symbol)
+
+    def subscribed(self, symbol: Optional[str] = None) -> List[BookKey]:
+        return [key for key in self._first if symbol is None or key[1] == symbol]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Per-book status: exchange, symbol, age_ms, bid/ask levels and the last poll error."""
+        rows = []
+        now = self.clock()
+        for exchange_id, symbol in self._first:
+            book = self._books.get((exchange_id, symbol))
+            entry = (book[0], now - book[1]) if book else None  # Not a read: listing keeps nothing alive
+            rows.append({
+                "exchange": exchange_id, "symbol": symbol,
+                "age_ms": entry[1] * 1e3 if entry else None,
+                "bids": len(entry[0].bid_prices) if entry else 0,
+                "asks": len(entry[0].ask_prices) if entry else 0,
+                "error": self.error(exchange_id, symbol)
+            })
+        return rows
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await asyncio.gather(*(client.close() for client in self._clients.values()), return_exceptions=True)
+        self._tasks.clear()
+
+
+def _one(params: Dict[str, List[str]], name: str, cast: Callable[[str], Any] = str, default: Any = None) -> Any:
+    values = params.get(name)
+    if not values or values[0] == '':
+        if default is None:
+            raise QuoteError(400, f"Missing parameter '{name}'")
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise QuoteError(400, f"Invalid value for '{name}': {values[0]!r}")
+
+
+def _side(params: Dict[str, List[str]]) -> str:
+    side = _one(params, 'side').lower()
+    if side not in ('buy', 'sell'):
+        raise QuoteError(400, f"Unknown side '{side}' (expected 'buy' or 'sell')")
+    return side
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+class QuoteServer:
+    """
+    Local HTTP pricing service answering from HotBooks.
+
+    Concurrency model: one asyncio event loop multiplexes client connections
+    (HTTP/1.1 keep-alive) and the upstream polls. Handlers are synchronous
+    numpy queries against books compiled when they arrive, so they never
+    block on the network or take locks; a book swap is a single reference
+    assignment on the loop. A request only awaits when it names a (venue,
+    symbol) that is not subscribed yet: it subscribes and waits for the first
+    poll, up to `first_book_timeout`.
+
+    Routes (GET, query parameters, JSON responses):
+        /quote      symbol, side, size[, exchanges]        every venue's fill and drag, best venue first
+        /curve      exchange, symbol, side, max_size[, points, scale]
+        /otc        symbol, side, size, otc_bps[, exchanges]   best venue vs the OTC desk, net USD advantage
+        /liquidity  symbol, side[, budgets_bps, exchanges]  max size within each drag budget
+        /books, /health, /metrics (Prometheus text)
+    """
+
+    def __init__(self, books: HotBooks, calculator: Optional[CostCalculator] = None, stale_after: float = 10.0,
+                 first_book_timeout: float = 10.0, auto_subscribe: bool = True):
+        """
+        Args:
+            books: Hot book store (subscriptions may be added up front or on demand).
+            calculator: Fee model (per-venue schedules; default 0.1% taker).
+            stale_after: Books older than this many seconds are flagged stale.
+            first_book_timeout: Seconds a request waits for a newly subscribed book.
+            auto_subscribe: Subscribe to (venue, symbol) pairs named by requests.
+        """
+        self.books = books
+        self.calculator = calculator or CostCalculator()
+        self.stale_after = stale_after
+        self.first_book_timeout = first_book_timeout
+        self.auto_subscribe = auto_subscribe
+        self.routes = {
+            '/quote': self.quote, '/curve': self.curve, '/otc': self.otc, '/liquidity': self.liquidity,
+            '/books': self.list_books, '/health': self.health
+        }
+        self.stats = {"requests": 0, "errors": 0, "connections": 0}
+        self._servers: List[asyncio.AbstractServer] = []
+
+    # --- Book access ---
+
+    async def _books_for(self, params: Dict[str, List[str]], symbol: str, exchanges: Optional[List[str]] = None) -> List[Tuple[str, OrderBookSnapshot, float]]:
+        """(exchange, snapshot, age) for the requested venues (default: every venue subscribed for the symbol)."""
+        if exchanges is None:
+            requested = params.get('exchanges') or params.get('exchange')
+            exchanges = [e for e in requested[0].split(',') if e] if requested else None
+        if exchanges is None:
+            keys = self.books.subscribed(symbol)
+            if not keys:
+                raise QuoteError(404, f"No venue subscribed for {symbol}")
+        else:
+            keys = [(exc, symbol) for exc in exchanges]
+            missing = [key for key in keys if key not in self.books.subscribed(symbol)]
+            if missing and not self.auto_subscribe:
+                raise QuoteError(404, f"Not subscribed: {', '.join(f'{e} {s}' for e, s in missing)}")
+            rejected = [f"{exc}: {self.books.rejected(exc, sym)}" for exc, sym in missing if self.books.rejected(exc, sym)]
+            if rejected and len(rejected) == len(keys):
+                raise QuoteError(404, f"Unknown market {symbol} ({'; '.join(rejected)})")
+            for exc, sym in missing:
+                if self.books.rejected(exc, sym):
+                    continue
+                try:
+                    self.books.subscribe(exc, sym, on_demand=True)
+                except ValueError as e:
+                    raise QuoteError(400, str(e))
+        try:
+            await self.books.wait_ready(keys, self.first_book_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        found = []
+        for exc, sym in keys:
+            entry = self.books.get(exc, sym)
+            if entry is not None:
+                found.append((exc, entry[0], entry[1]))
+        if not found:
+            errors = '; '.join(f"{exc}: {self.books.error(exc, sym) or 'no book yet'}" for exc, sym in keys)
+            if all(self.books.rejected(exc, sym) for exc, sym in keys):
+                raise QuoteError(404, f"Unknown market {symbol} ({errors})")
+            raise QuoteError(503, f"No order book available for {symbol} ({errors})")
+        return found
+
+    # --- Handlers ---
+
+    async def quote(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        symbol, side, size = _one(params, 'symbol'), _side(params), _one(params, 'size', float)
+        books = await self._books_for(params, symbol)
+        venues = [exc for exc, _, _ in books]
+        avg = np.zeros(len(books))
+        filled = np.zeros(len(books), dtype=bool)
+        mids = np.array([book.compile().mid_price for _, book, _ in books])
+        for i, (_, book, _) in enumerate(books):
+            res = book.compile().simulate_many(side, [size])
+            avg[i], filled[i] = res['avg_price'][0], res['filled'][0]
+        drag = self.calculator.calculate_total_drag_many(np.where(filled, avg, np.nan), mids, side, exchanges=venues)
+        fee = drag['fee_percent']
+        effective = avg * (1 + fee) if side == 'buy' else avg * (1 - fee)
+
+        quotes = [
+            {
+                "exchange": exc, "avg_price": float(avg[i]), "effective_price": float(effective[i]),
+                "mid_price": float(mids[i]), "slippage_pct": _finite(drag['slippage_percent'][i]),
+                "fee_pct": float(fee[i]), "total_drag_pct": _finite(drag['total_percent'][i]),
+                "filled": bool(filled[i]), "age_ms": age * 1e3, "stale": age > self.stale_after
+            }
+            for i, (exc, _, age) in enumerate(books)
+        ]
+        # Filled venues by drag, then the rest
+        quotes.sort(key=lambda q: (not q['filled'], q['total_drag_pct'] if q['total_drag_pct'] is not None else np.inf))
+        return {"symbol": symbol, "side": side, "size_usd": size,
+                "best": quotes[0]['exchange'] if quotes[0]['filled'] else None, "quotes": quotes}
+
+    async def curve(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        exchange_id, symbol, side = _one(params, 'exchange'), _one(params, 'symbol'), _side(params)
+        max_size = _one(params, 'max_size', float)
+        points = _one(params, 'points', int, 100)
+        if not 1 <= points <= MAX_CURVE_POINTS:
+            raise QuoteError(400, f"points must be between 1 and {MAX_CURVE_POINTS}")
+        scale = _one(params, 'scale', str, 'log')
+        try:
+            sizes = size_grid(max_size, points=points, scale=scale)
+        except ValueError as e:
+            raise QuoteError(400, str(e))
+        (_, book, age), = await self._books_for(params, symbol, [exchange_id])
+        compiled = book.compile()
+        curve = slippage_curve(compiled, side, sizes, reference_price=compiled.mid_price, exchange=exchange_id)
+        return {"symbol": symbol, "age_ms": age * 1e3, "stale": age > self.stale_after, **curve.to_dict()}
+
+    async def otc(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        otc_bps = _one(params, 'otc_bps', float)
+        quoted = await self.quote(params)
+        best = quoted['quotes'][0]
+        # An exchange that cannot fill the size never wins
+        compared = self.calculator.compare_otc_many(
+            np.nan if best['total_drag_pct'] is None else best['total_drag_pct'], otc_bps / 10000.0,
+            notionals_usd=quoted['size_usd'], filled=best['filled']
+        )
+        return {
+            "symbol": quoted['symbol'], "side": quoted['side'], "size_usd": quoted['size_usd'],
+            "recommendation": str(compared['recommendation']), "best_exchange": quoted['best'],
+            "exchange_drag_pct": best['total_drag_pct'], "otc_spread_pct": otc_bps / 10000.0,
+            "savings_pct": _finite(compared['savings_percent']), "savings_usd": _finite(compared['savings_usd']),
+            "net_advantage_usd": _finite(compared['net_advantage_usd']), "quotes": quoted['quotes']
+        }
+
+    async def liquidity(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        symbol, side = _one(params, 'symbol'), _side(params)
+        budgets_bps = _one(params, 'budgets_bps', _float_list, [10.0, 25.0, 50.0, 100.0])
+        books = await self._books_for(params, symbol)
+        table = liquidity_at_budget({exc: book for exc, book, _ in books}, side,
+                                    np.asarray(budgets_bps) / 10000.0, calculator=self.calculator)
+        return {"symbol": symbol, "budgets_bps": budgets_bps, **table.to_dict()}
+
+    async def list_books(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        return {"books": self.books.describe()}
+
+    async def health(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        rows = self.books.describe()
+        return {"status": "ok", "books": len(rows), "ready": sum(1 for r in rows if r['age_ms'] is not None),
+                **self.stats, **self.books.stats}
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, str, bytes]:
+        """Routes one request; returns (status, content type, body). Never raises."""
+        url = urlsplit(target)
+        self.stats["requests"] += 1
+        try:
+            if method != 'GET':
+                raise QuoteError(405, f"Method {method} not allowed")
+            if url.path == '/metrics':
+                return 200, 'text/plain; version=0.0.4', metrics.to_prometheus().encode()
+            handler = self.routes.get(url.path)
+            if handler is None:
+                raise QuoteError(404, f"Unknown path {url.path}")
+            with metrics.span('quote_request', route=url.path):
+                payload = await handler(parse_qs(url.query))
+            status = 200
+        except QuoteError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        if status != 200:
+            self.stats["errors"] += 1
+        return status, 'application/json', json.dumps(payload).encode()
+
+    # --- HTTP/1.1 transport ---
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    return  # Client closed the connection
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, 'application/json', b'{"error": "Request too large"}', False)
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split(' ')
+                if len(parts) != 3:
+                    await self._respond(writer, 400, 'application/json', b'{"error": "Malformed request line"}', False)
+                    return
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', '0') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, 'application/json', b'{"error": "Invalid Content-Length"}', False)
+                    return
+                if length > MAX_REQUEST_BYTES:
+                    await self._respond(writer, 413, 'application/json', b'{"error": "Request too large"}', False)
+                    return
+                if length:
+                    await reader.readexactly(length)  # Bodies are not used
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                status, content_type, body = await self.dispatch(method, target)
+                await self._respond(writer, status, content_type, body, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes, keep_alive: bool) -> None:
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765, unix_path: Optional[str] = None) -> int:
+        """Starts listening (TCP, or a Unix socket if `unix_path` is given); returns the bound TCP port."""
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self._serve_connection, path=unix_path, limit=MAX_REQUEST_BYTES)
+            self._servers.append(server)
+            return 0
+        server = await asyncio.start_server(self._serve_connection, host, port, limit=MAX_REQUEST_BYTES)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self) -> None:
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        await self.books.close()
+
+
+def _finite(value: Any) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
@@ -0,0 +1,220 @@
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .orderbook import OrderBookSnapshot
+
+FORMAT_VERSION = 1
+
+DATA_FILE = 'books.f64'
+INDEX_FILE = 'index.bin'
+KEYS_FILE = 'keys.jsonl'
+META_FILE = 'meta.json'
+
+# One fixed-width row per snapshot. Level data for the row lives in the data
+# file at `offset` (bytes) as four float64 blocks:
+# bid_prices[n_bids], bid_sizes[n_bids], ask_prices[n_asks], ask_sizes[n_asks]
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('offset', '<i8'),
+    ('nonce', '<i8'),
+    ('key', '<i4'),
+    ('n_bids', '<i4'),
+    ('n_asks', '<i4'),
+])
+
+
+def _check_meta(root: str) -> None:
+    path = os.path.join(root, META_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No snapshot log at {root}")
+    with open(path) as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot log version {meta.get('version')} (expected {FORMAT_VERSION})")
+
+
+def _read_keys(root: str) -> List[Tuple[str, str]]:
+    path = os.path.join(root, KEYS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(json.loads(line)) for line in f if line.strip()]
+
+
+class SnapshotRecorder:
+    """
+    Appends order book snapshots for many venues/symbols to an append-only binary log.
+
+    A log is a directory holding the float64 level data, a fixed-width index
+    of (timestamp, offset, nonce, key, n_bids, n_asks) rows and the
+    (exchange, symbol) table the keys refer to. Data is written before its
+    index row, so a crash can only leave unindexed bytes behind, which
+    readers never see.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, META_FILE)
+        if os.path.exists(meta_path):
+            _check_meta(root)
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({'version': FORMAT_VERSION, 'index_dtype': INDEX_DTYPE.descr}, f)
+
+        self._keys = {key: i for i, key in enumerate(_read_keys(root))}
+        self._data = open(os.path.join(root, DATA_FILE), 'ab')
+        self._index = open(os.path.join(root, INDEX_FILE), 'ab')
+        self._keys_file = open(os.path.join(root, KEYS_FILE), 'a')
+
+        # Drop any torn trailing index row left by an interrupted write
+        index_size = os.path.getsize(os.path.join(root, INDEX_FILE))
+        if index_size % INDEX_DTYPE.itemsize:
+            self._index.truncate(index_size - index_size % INDEX_DTYPE.itemsize)
+        self.rows = index_size // INDEX_DTYPE.itemsize
+
+    def _key(self, exchange: str, symbol: str) -> int:
+        key = (exchange or '', symbol or '')
+        if key not in self._keys:
+            self._keys[key] = len(self._keys)
+            self._keys_file.write(json.dumps(list(key)) + '\n')
+            self._keys_file.flush()
+        return self._keys[key]
+
+    def append(self, snapshot: OrderBookSnapshot) -> int:
+        """Appends one snapshot; returns its row number in the index."""
+        offset = self._data.seek(0, os.SEEK_END)
+        for block in (snapshot.bid_prices, snapshot.bid_sizes, snapshot.ask_prices, snapshot.ask_sizes):
+            self._data.write(np.ascontiguousarray(block, dtype='<f8').tobytes())
+        self._data.flush()
+
+        row = np.zeros(1, dtype=INDEX_DTYPE)
+        row['timestamp'] = snapshot.timestamp if snapshot.timestamp is not None else int(time.time() * 1000)
+        row['offset'] = offset
+        row['nonce'] = snapshot.nonce if snapshot.nonce is not None else -1
+        row['key'] = self._key(snapshot.exchange, snapshot.symbol)
+        row['n_bids'] = len(snapshot.bid_prices)
+        row['n_asks'] = len(snapshot.ask_prices)
+        self._index.write(row.tobytes())
+        self._index.flush()
+
+        self.rows += 1
+        return self.rows - 1
+
+    def append_many(self, snapshots: Sequence[OrderBookSnapshot]) -> None:
+        for snapshot in snapshots:
+            self.append(snapshot)
+
+    def close(self) -> None:
+        for f in (self._data, self._index, self._keys_file):
+            f.close()
+
+    def __enter__(self) -> "SnapshotRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SnapshotReader:
+    """
+    Memory-mapped reader of a SnapshotRecorder log.
+
+    Neither file is loaded into RAM: the index is a structured memmap that can
+    be filtered with vectorized numpy, and snapshots are zero-copy views into
+    the mapped level data (read-only), ready to be compiled and priced.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        _check_meta(root)
+        self.index: np.ndarray = np.empty(0, dtype=INDEX_DTYPE)
+        self._data: np.ndarray = np.empty(0, dtype='<f8')
+        self.keys: List[Tuple[str, str]] = []
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Re-maps the files to pick up rows appended since opening; returns the row count."""
+        self.keys = _read_keys(self.root)
+        index_path = os.path.join(self.root, INDEX_FILE)
+        rows = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+        if rows == 0:
+            return 0
+        self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', shape=(rows,))
+        data_path = os.path.join(self.root, DATA_FILE)
+        data_len = os.path.getsize(data_path) // 8
+        self._data = np.memmap(data_path, dtype='<f8', mode='r', shape=(data_len,)) if data_len else np.empty(0, dtype='<f8')
+        return rows
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def key_id(self, exchange: str, symbol: str) -> int:
+        """Key of an (exchange, symbol) pair, or -1 if it was never recorded."""
+        try:
+            return self.keys.index((exchange, symbol))
+        except ValueError:
+            return -1
+
+    def select(self, exchange: Optional[str] = None, symbol: Optional[str] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """
+        Row numbers matching the filters, in recording order.
+
+        Args:
+            exchange, symbol: Exact match (None matches all).
+            start, end: Timestamp range in ms, [start, end).
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if exchange is not None or symbol is not None:
+            wanted = [i for i, (exc, sym) in enumerate(self.keys)
+                      if (exchange is None or exc == exchange) and (symbol is None or sym == symbol)]
+            mask &= np.isin(self.index['key'], wanted)
+        if start is not None:
+            mask &= self.index['timestamp'] >= start
+        if end is not None:
+            mask &= self.index['timestamp'] < end
+        return np.flatnonzero(mask)
+
+    def snapshot(self, row: int) -> OrderBookSnapshot:
+        """Zero-copy snapshot of one index row."""
+        entry = self.index[row]
+        start = int(entry['offset']) // 8
+        n_bids, n_asks = int(entry['n_bids']), int(entry['n_asks'])
+        bounds = np.cumsum([start, n_bids, n_bids, n_asks, n_asks])
+        bid_prices, bid_sizes, ask_prices, ask_sizes = (self._data[a:b] for a, b in zip(bounds[:-1], bounds[1:]))
+        exchange, symbol = self.keys[int(entry['key'])]
+        nonce = int(entry['nonce'])
+        return OrderBookSnapshot(
+            bid_prices, bid_sizes, ask_prices, ask_sizes,
+            exchange=exchange, symbol=symbol, timestamp=int(entry['timestamp']),
+            nonce=None if nonce < 0 else nonce
+        )
+
+    def __getitem__(self, row: int) -> OrderBookSnapshot:
+        return self.snapshot(row)
+
+    def iter_snapshots(self, rows: Optional[Sequence[int]] = None) -> Iterator[OrderBookSnapshot]:
+        """Yields snapshots for `rows` (all rows by default) one at a time."""
+        for row in (range(len(self)) if rows is None else rows):
+            yield self.snapshot(int(row))
+
+    def top_of_book(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Best bid/ask for many rows at once, read straight from the mapped data.
+
+        Returns:
+            Dict of per-row arrays: timestamp, best_bid, best_ask (NaN for an empty side).
+        """
+        entries = self.index if rows is None else self.index[np.asarray(rows)]
+        start = entries['offset'] // 8
+        n_bids, n_asks = entries['n_bids'], entries['n_asks']
+        best_bid = np.full(len(entries), np.nan)
+        best_ask = np.full(len(entries), np.nan)
+        has_bid, has_ask = n_bids > 0, n_asks > 0
+        best_bid[has_bid] = self._data[start[has_bid]]
+        best_ask[has_ask] = self._data[(start + 2 * n_bids)[has_ask]]
+        return {"timestamp": np.asarray(entries['timestamp']), "best_bid": best_bid, "best_ask": best_ask}
@@ -0,0 +1,217 @@
+import heapq
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .calculator import CostCalculator
+from .simulation import BookSide, OrderBookWalker
+
+
+class MergedSide:
+    """
+    Several venues' book sides merged into one fee-adjusted consumption order.
+
+    `book` holds the merged levels at their raw prices (so it can be filled
+    like any single-venue side) and `venue` the index of the venue each level
+    came from.
+    """
+
+    def __init__(self, venues: List[str], fee_rates: np.ndarray, venue: np.ndarray, book: BookSide):
+        self.venues = venues
+        self.fee_rates = fee_rates
+        self.venue = venue
+        self.book = book
+
+
+class SmartOrderRouter:
+    """
+    Splits an order across venues by consuming the cheapest fee-adjusted liquidity first.
+
+    Each venue's levels are re-priced with its taker fee from CostCalculator
+    (price * (1 + fee) for a buy, price * (1 - fee) for a sell) and the venues
+    are k-way merged with a heap. A heap pop takes a whole run of levels from
+    one venue (up to the next venue's best price), so the sweep costs
+    O(levels consumed + venue switches * log venues).
+    """
+
+    def __init__(self, calculators: Optional[Dict[str, CostCalculator]] = None, default_calculator: Optional[CostCalculator] = None):
+        """
+        Args:
+            calculators: Per-venue CostCalculator (fee schedule).
+            default_calculator: Used for venues without an entry (default 0.1% taker).
+        """
+        self.calculators = calculators or {}
+        self.default_calculator = default_calculator or CostCalculator()
+
+    def fee_rate(self, venue: str) -> float:
+        return self.calculators.get(venue, self.default_calculator).fee_rate(venue)
+
+    def merge(self, books: Dict[str, Any], side: str, limit_usd: float = np.inf) -> MergedSide:
+        """
+        Merges the venues' sides of the book in fee-adjusted price order.
+
+        Args:
+            books: {venue: ccxt dict, OrderBookSnapshot or CompiledOrderBook}.
+            side: 'buy' or 'sell'.
+            limit_usd: Stop once this much notional has been merged.
+        """
+        is_buy = side.lower() == 'buy'
+        venues = list(books)
+        fee_rates = np.array([self.fee_rate(v) for v in venues], dtype=np.float64)
+        sides = [OrderBookWalker.compile(books[v]).side_for(side) for v in venues]
+        # Ascending key = better execution for either side
+        keys = [s.prices * (1 + f) if is_buy else -(s.prices * (1 - f)) for s, f in zip(sides, fee_rates)]
+
+        heap = [(float(k[0]), i, 0) for i, k in enumerate(keys) if len(k)]
+        heapq.heapify(heap)
+        runs: List[Tuple[int, int, int]] = []
+        merged_notional = 0.0
+
+        while heap and merged_notional < limit_usd:
+            _, i, start = heapq.heappop(heap)
+            venue_side, venue_keys = sides[i], keys[i]
+
+            # Take every level of this venue that beats (or ties) the next venue's best
+            end = len(venue_keys)
+            if heap:
+                end = max(start + 1, int(np.searchsorted(venue_keys, heap[0][0], side='right')))
+
+            before = venue_side.cum_notional[start - 1] if start > 0 else 0.0
+            needed = int(np.searchsorted(venue_side.cum_notional, limit_usd - merged_notional + before, side='left')) + 1
+            end = min(end, needed, len(venue_keys))
+
+            runs.append((i, start, end))
+            merged_notional += venue_side.cum_notional[end - 1] - before
+            if end < len(venue_keys):
+                heapq.heappush(heap, (float(venue_keys[end]), i, end))
+
+        if not runs:
+            return MergedSide(venues, fee_rates, np.empty(0, dtype=np.int64), BookSide(np.empty(0), np.empty(0)))
+
+        venue_idx = np.concatenate([np.full(end - start, i, dtype=np.int64) for i, start, end in runs])
+        prices = np.concatenate([sides[i].prices[start:end] for i, start, end in runs])
+        sizes = np.concatenate([sides[i].sizes[start:end] for i, start, end in runs])
+        return MergedSide(venues, fee_rates, venue_idx, BookSide(prices, sizes))
+
+    def route_many(self, books: Dict[str, Any], side: str, sizes: Sequence[float], reference_price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Optimal split for a whole grid of sizes from one merged sweep.
+
+        Args:
+            books: {venue: book}.
+            side: 'buy' or 'sell'.
+            sizes: Trade sizes in USD notional (fees are charged on top).
+            reference_price: Price drag is measured against (defaults to the consolidated mid).
+
+        Returns:
+            Dictionary with `venues`, per-venue `allocation_usd` / `allocation_qty` /
+            `fee_usd` arrays of shape (venues, sizes), and per-size arrays
+            total_asset_acquired, avg_price (blended VWAP before fees),
+            effective_price (after fees), slippage_percent, fee_percent,
+            total_percent and filled.
+        """
+        is_buy = side.lower() == 'buy'
+        sizes = np.maximum(np.asarray(sizes, dtype=np.float64), 0.0)
+        merged = self.merge(books, side, limit_usd=float(sizes.max()) if len(sizes) else 0.0)
+        book = merged.book
+        n_venues, n_levels = len(merged.venues), len(book)
+
+        qty, spent, unfilled = book.fill(sizes)
+
+        # Per-venue allocation: whole levels before the fill point plus the partial level
+        full = np.searchsorted(book.cum_notional, sizes, side='right')
+        in_book = full < n_levels
+        partial_level = np.minimum(full, max(n_levels - 1, 0))
+        notional_before = np.concatenate(([0.0], book.cum_notional))[full]
+        partial_usd = np.where(in_book, sizes - notional_before, 0.0)
+
+        allocation_usd = np.zeros((n_venues, len(sizes)))
+        allocation_qty = np.zeros((n_venues, len(sizes)))
+        if n_levels:
+            level_notional = book.prices * book.sizes
+            for v in range(n_venues):
+                mask = merged.venue == v
+                cum_usd = np.concatenate(([0.0], np.cumsum(np.where(mask, level_notional, 0.0))))
+                cum_qty = np.concatenate(([0.0], np.cumsum(np.where(mask, book.sizes, 0.0))))
+                on_venue = in_book & (merged.venue[partial_level] == v)
+                allocation_usd[v] = cum_usd[full] + np.where(on_venue, partial_usd, 0.0)
+                allocation_qty[v] = cum_qty[full] + np.where(on_venue, partial_usd / book.prices[partial_level], 0.0)
+
+        fee_usd = allocation_usd * merged.fee_rates[:, None]
+        total_fee = fee_usd.sum(axis=0)
+
+        if reference_price is None:
+            reference_price = consolidated_mid(books)
+
+        has_fill = qty > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = np.where(has_fill, spent / qty, 0.0)
+            effective_price = np.where(has_fill, (spent + total_fee if is_buy else spent - total_fee) / qty, 0.0)
+            fee_percent = np.where(spent > 0, total_fee / spent, 0.0)
+        if reference_price > 0:
+            slippage = (avg_price - reference_price) / reference_price if is_buy else (reference_price - avg_price) / reference_price
+            slippage = np.where(has_fill, slippage, 0.0)
+        else:
+            slippage = np.zeros_like(avg_price)
+
+        return {
+            "venues": merged.venues,
+            "sizes": sizes,
+            "allocation_usd": allocation_usd,
+            "allocation_qty": allocation_qty,
+            "fee_usd": fee_usd,
+            "total_asset_acquired": qty,
+            "avg_price": avg_price,
+            "effective_price": effective_price,
+            "reference_price": reference_price,
+            "slippage_percent": slippage,
+            "fee_percent": fee_percent,
+            "total_percent": slippage + fee_percent,
+            "filled": has_fill & (unfilled <= 1.0)
+        }
+
+    def route(self, books: Dict[str, Any], side: str, amount_usd: float, reference_price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Optimal split of a single order.
+
+        Returns:
+            Dict with per-venue `allocations` ({venue: notional_usd, quantity,
+            avg_price, fee_usd, share}) plus the blended totals of route_many.
+        """
+        res = self.route_many(books, side, [amount_usd], reference_price=reference_price)
+        total = float(res["allocation_usd"][:, 0].sum())
+
+        allocations = {}
+        for v, venue in enumerate(res["venues"]):
+            notional = float(res["allocation_usd"][v, 0])
+            quantity = float(res["allocation_qty"][v, 0])
+            if notional <= 0:
+                continue
+            allocations[venue] = {
+                "notional_usd": notional,
+                "quantity": quantity,
+                "avg_price": notional / quantity,
+                "fee_usd": float(res["fee_usd"][v, 0]),
+                "share": notional / total
+            }
+
+        return {
+            "allocations": allocations,
+            "total_asset_acquired": float(res["total_asset_acquired"][0]),
+            "avg_price": float(res["avg_price"][0]),
+            "effective_price": float(res["effective_price"][0]),
+            "reference_price": float(res["reference_price"]),
+            "slippage_percent": float(res["slippage_percent"][0]),
+            "fee_percent": float(res["fee_percent"][0]),
+            "total_percent": float(res["total_percent"][0]),
+            "filled": bool(res["filled"][0])
+        }
+
+
+def consolidated_mid(books: Dict[str, Any]) -> float:
+    """Mid of the best bid and best ask across all venues (0.0 if a side is empty everywhere)."""
+    compiled = [OrderBookWalker.compile(book) for book in books.values()]
+    best_bid = max((c.bids.top_price for c in compiled if len(c.bids)), default=0.0)
+    best_ask = min((c.asks.top_price for c in compiled if len(c.asks)), default=0.0)
+    if not best_bid or not best_ask:
+        return 0.0
+    return (best_bid + best_ask) / 2
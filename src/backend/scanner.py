@@ -0,0 +1,210 @@
+import asyncio
+import math
+import queue
+import threading
+import numpy as np
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from .calculator import CostCalculator
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot
+from .scheduler import HISTORY
+
+# What the desk ranks every market by
+SCAN_SIZES_USD = (100000.0, 1000000.0, 5000000.0)
+SCAN_BANDS_BPS = (50.0, 100.0)
+SCAN_DEPTH = 500        # Levels per book (snapped to what each venue accepts)
+CONCURRENCY = 8         # Books in flight per venue
+SCAN_TIMEOUT = 60.0     # Per book, including time queued behind the venue's rate limit
+
+
+def size_label(size_usd: float) -> str:
+    """Column suffix for a trade size: 100000 -> '100k', 5000000 -> '5m'."""
+    for divisor, suffix in ((1e9, 'b'), (1e6, 'm'), (1e3, 'k')):
+        if size_usd >= divisor:
+            return f"{size_usd / divisor:g}{suffix}"
+    return f"{size_usd:g}"
+
+
+def summarize_book(snapshot: OrderBookSnapshot, sizes_usd: Sequence[float] = SCAN_SIZES_USD,
+                   bands_bps: Sequence[float] = SCAN_BANDS_BPS,
+                   calculator: Optional[CostCalculator] = None) -> Dict[str, Any]:
+    """
+    Reduces a book to the scanner's summary metrics.
+
+    Args:
+        snapshot: Order book.
+        sizes_usd: Trade sizes to cost.
+        bands_bps: Distances from mid to measure resting depth within.
+        calculator: Fee model (default 0.1% taker).
+
+    Returns:
+        Row dict: exchange, symbol, mid_price, spread_bps, levels,
+        depth_<band>bps_usd (bids plus asks within the band), and
+        cost_<size>_bps (mean of buy and sell total drag vs mid; NaN when
+        either side cannot fill the size) for every band and size.
+    """
+    calculator = calculator or CostCalculator()
+    compiled = snapshot.compile()
+    mid = compiled.mid_price
+    row = {
+        "exchange": snapshot.exchange,
+        "symbol": snapshot.symbol,
+        "mid_price": mid,
+        "spread_bps": snapshot.spread * 10000.0 if mid > 0 else math.nan,
+        "levels": min(len(compiled.bids), len(compiled.asks))
+    }
+    bids, asks = compiled.depth_within(bands_bps)
+    for band, depth in zip(bands_bps, bids + asks):
+        row[f"depth_{band:g}bps_usd"] = float(depth)
+
+    sizes = np.asarray(sizes_usd, dtype=np.float64)
+    costs = np.zeros(len(sizes))
+    for side in ('buy', 'sell'):
+        fills = compiled.simulate_many(side, sizes)
+        drag = calculator.calculate_total_drag_many(fills["avg_price"], mid, side, exchanges=snapshot.exchange)
+        costs += np.where(fills["filled"] & (mid > 0), drag["total_percent"], np.nan) / 2
+    for size, cost in zip(sizes, costs):
+        row[f"cost_{size_label(size)}_bps"] = float(cost * 10000.0)
+    return row
+
+
+class LiquidityScanner:
+    """
+    Scans many markets on many venues and reduces each book to a summary row.
+
+    Each venue is worked by `concurrency` fetchers that go through the
+    venue's rate-limit scheduler at HISTORY priority, so a scan never holds
+    up live quotes and its queue stays short enough for the per-book timeout.
+    Every book is summarized as soon as it arrives and then dropped, so
+    memory is bounded by the books in flight (venues x concurrency) however
+    many markets are scanned; rows are yielded in completion order.
+    """
+
+    def __init__(self, clients: Sequence[Any], sizes_usd: Sequence[float] = SCAN_SIZES_USD,
+                 bands_bps: Sequence[float] = SCAN_BANDS_BPS, depth: int = SCAN_DEPTH,
+                 concurrency: int = CONCURRENCY, timeout: float = SCAN_TIMEOUT,
+                 calculator: Optional[CostCalculator] = None):
+        """
+        Args:
+            clients: Async exchange clients (see AsyncExchangeClient), one per venue.
+            sizes_usd: Trade sizes to cost.
+            bands_bps: Depth bands around mid.
+            depth: Levels requested per book.
+            concurrency: Books in flight per venue.
+            timeout: Per-book timeout in seconds (queueing included).
+            calculator: Fee model.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.clients = {client.exchange_id: client for client in clients}
+        self.sizes_usd = tuple(sizes_usd)
+        self.bands_bps = tuple(bands_bps)
+        self.depth = depth
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.calculator = calculator or CostCalculator()
+
+    async def _fetch_one(self, client: Any, symbol: str) -> Dict[str, Any]:
+        try:
+            book = await client.fetch_order_book(symbol, limit=self.depth, timeout=self.timeout, priority=HISTORY)
+            if book.empty:
+                raise ValueError("Empty order book")
+            with metrics.span('scan', exchange=client.exchange_id):
+                return {**summarize_book(book, self.sizes_usd, self.bands_bps, self.calculator), "error": None}
+        except Exception as e:
+            metrics.incr('scan_errors', exchange=client.exchange_id)
+            return {"exchange": client.exchange_id, "symbol": symbol, "error": str(e) or type(e).__name__}
+
+    async def _worker(self, client: Any, symbols: Iterator[str], rows: asyncio.Queue, stop: asyncio.Event) -> None:
+        # Workers of one venue share the iterator, so each symbol is fetched once
+        for symbol in symbols:
+            if stop.is_set():
+                return
+            await rows.put(await self._fetch_one(client, symbol))
+
+    async def scan(self, symbols: Mapping[str, Sequence[str]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields one row per (venue, symbol) as soon as it is priced.
+
+        Args:
+            symbols: {exchange_id: symbols to scan there}.
+
+        Yields:
+            summarize_book rows plus an 'error' key (None, or the failure
+            message with only exchange and symbol set).
+        """
+        rows: asyncio.Queue = asyncio.Queue(maxsize=len(self.clients) * self.concurrency)
+        stop = asyncio.Event()
+        workers = []
+        for exc, venue_symbols in symbols.items():
+            shared = iter(list(venue_symbols))
+            workers += [asyncio.ensure_future(self._worker(self.clients[exc], shared, rows, stop))
+                        for _ in range(min(self.concurrency, len(venue_symbols)))]
+        if not workers:
+            return
+        running = asyncio.ensure_future(asyncio.gather(*workers))
+        try:
+            while not (running.done() and rows.empty()):
+                getter = asyncio.ensure_future(rows.get())
+                await asyncio.wait({getter, running}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+        finally:
+            stop.set()
+            running.cancel()
+            while not running.done():
+                # A fetch that completes as it is cancelled can swallow the cancellation (asyncio.wait_for);
+                # take its row so the worker is not left blocked on a full queue
+                while not rows.empty():
+                    rows.get_nowait()
+                await asyncio.wait({running}, timeout=0.01)
+            await asyncio.gather(running, return_exceptions=True)
+
+
+def stream_scan(scanner: LiquidityScanner, symbols: Mapping[str, Sequence[str]],
+                loop: asyncio.AbstractEventLoop) -> Iterator[Dict[str, Any]]:
+    """
+    Runs scanner.scan on `loop` (running in another thread) and yields its rows in the calling thread.
+
+    Closing the generator early cancels the scan.
+    """
+    rows: queue.Queue = queue.Queue()
+    done = object()
+    finished = threading.Event()
+
+    async def run() -> None:
+        scan = scanner.scan(symbols)
+        try:
+            async for row in scan:
+                rows.put(row)
+        finally:
+            # Closes the scan (cancelling its fetchers) before reporting the end
+            await scan.aclose()
+            rows.put(done)
+            finished.set()
+
+    future = asyncio.run_coroutine_threadsafe(run(), loop)
+    try:
+        while True:
+            row = rows.get()
+            if row is done:
+                break
+            yield row
+        future.result()
+    finally:
+        future.cancel()
+        finished.wait()
+
+
+def rank_rows(rows: Sequence[Dict[str, Any]], by: str = f"cost_{size_label(SCAN_SIZES_USD[1])}_bps") -> List[Dict[str, Any]]:
+    """Successful rows sorted by `by` ascending (cheapest first); rows missing it (NaN) go last."""
+    priced = [row for row in rows if row.get("error") is None]
+
+    def key(row: Dict[str, Any]):
+        value = row.get(by, math.nan)
+        return (0, value) if np.isfinite(value) else (1, 0.0)
+
+    return sorted(priced, key=key)
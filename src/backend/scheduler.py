@@ -0,0 +1,459 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import random
+import threading
+import time
+import ccxt
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+from .sim_exchange import DEFAULT_CONFIG as SIM_CONFIG, is_simulated
+
+# Priorities: lower values are served first
+LIVE = 0      # Order books a quote is waiting on
+MARKETS = 1   # Market metadata (load_markets)
+HISTORY = 2   # OHLCV history pulls and backfills
+PRIORITY_NAMES = {LIVE: 'live', MARKETS: 'markets', HISTORY: 'history'}
+
+# How long work may wait (queue + retries) before it is dropped as stale, seconds (None = never)
+DEFAULT_DEADLINES = {LIVE: 10.0, MARKETS: 60.0, HISTORY: None}
+
+# Tokens are ccxt cost units: an endpoint costs its `cost` (or `byLimit` entry) and a venue
+# sustains 1000 / rateLimit units per second. Requests run at this share of that rate.
+RATE_HEADROOM = 0.9
+
+# Burst per venue in cost units (ccxt's own throttle never bursts); e.g. one 5000-level binance book costs 50
+VENUE_BURSTS = {
+    'binance': 50,
+    'kraken': 3,
+    'coinbase': 15,
+    'kucoin': 20,
+    'okx': 10,
+    'bybit': 20,
+}
+DEFAULT_BURST = 5
+DEFAULT_RATE_LIMIT_MS = 200.0  # Venues ccxt does not know
+
+# Cost units spent by the exchange calls of the current scheduled call (see meter_exchange)
+_spent: contextvars.ContextVar = contextvars.ContextVar('scheduler_spent', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Queued work dropped because its deadline passed before it could be sent."""
+
+
+class _Ticket:
+    __slots__ = ('priority', 'cost', 'deadline', 'enqueued', 'grant', 'done')
+
+    def __init__(self, priority: int, cost: float, deadline: Optional[float], enqueued: float,
+                 grant: Callable[[Optional[Exception]], None]):
+        self.priority = priority
+        self.cost = cost
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.grant = grant
+        self.done = False
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket scheduler for one venue's API calls.
+
+    Every call takes tokens for its cost before it is sent. When too few
+    are left, calls queue by priority (LIVE before MARKETS before HISTORY,
+    FIFO within one) and a dispatcher thread releases them as tokens
+    refill, so a history backfill never delays a live book by more than the
+    request in flight.
+    Network errors (429, 5xx, timeouts) are retried with jittered
+    exponential backoff; a 429 also drains the bucket and pauses the whole
+    venue for the backoff. Queued work whose deadline passes is dropped with
+    DeadlineExceeded instead of being sent late.
+
+    Tokens are endpoint cost units. A call is charged the last cost seen for
+    its `cost_key` (1 the first time) when it is granted, and settled against
+    what its requests actually cost once it returns (ccxt exchanges wrapped
+    by meter_exchange report each request's cost), so a heavy endpoint such
+    as a deep order book drains the bucket as much as the venue counts it.
+    A call costing more than the burst waits for a full bucket and leaves it
+    in debt.
+
+    Sync callers use call(); coroutines use acall(). Both may share one
+    scheduler across threads and event loops.
+    """
+
+    def __init__(self, exchange_id: str, rate: Optional[float] = None, burst: float = 1, max_retries: int = 4,
+                 base_delay: float = 0.25, max_delay: float = 8.0, seed: Optional[int] = None):
+        """
+        Args:
+            exchange_id: Venue id (metrics label).
+            rate: Sustained cost units per second (None = unlimited, priorities never wait).
+            burst: Bucket capacity in cost units.
+            max_retries: Retries of a call after network errors.
+            base_delay: First backoff, seconds; doubles per retry.
+            max_delay: Backoff cap, seconds.
+            seed: Seeds the backoff jitter (tests).
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        if burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.exchange_id = exchange_id
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int, _Ticket]] = []
+        self._seq = itertools.count()
+        self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self._costs: Dict[Any, float] = {}  # Last measured cost per cost_key
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"granted": 0, "queued": 0, "retries": 0, "throttled": 0, "dropped": 0, "cost": 0.0}
+
+    # --- Token bucket and queue (all under self._cond) ---
+
+    def _refill(self, now: float) -> None:
+        # Nothing accrues while the venue is paused after a 429
+        start = max(self._updated, self.paused_until)
+        if self.rate is not None and now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def _try_take(self, now: float, cost: float) -> bool:
+        """Takes `cost` tokens right away if nobody is queued ahead and the venue is not paused."""
+        if self._queue or now < self.paused_until:
+            return False
+        self._refill(now)
+        if self.rate is None:
+            return True
+        if self.tokens >= min(cost, self.burst):
+            self.tokens -= cost
+            return True
+        return False
+
+    def _set_depth(self, priority: int, delta: int) -> None:
+        self._depth[priority] += delta
+        metrics.gauge('scheduler_queue_depth', self._depth[priority],
+                      exchange=self.exchange_id, priority=PRIORITY_NAMES[priority])
+
+    def _granted(self, priority: int, waited: float) -> None:
+        self.stats["granted"] += 1
+        metrics.observe('scheduler_wait', waited, exchange=self.exchange_id, priority=PRIORITY_NAMES[priority])
+
+    def _enqueue(self, priority: int, cost: float, deadline: Optional[float], now: float,
+                 grant: Callable[[Optional[Exception]], None]) -> _Ticket:
+        ticket = _Ticket(priority, cost, deadline, now, grant)
+        heapq.heappush(self._queue, (priority, next(self._seq), ticket))
+        self.stats["queued"] += 1
+        self._set_depth(priority, 1)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"scheduler-{self.exchange_id}", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+        return ticket
+
+    def _finish(self, ticket: _Ticket, error: Optional[Exception], now: float) -> None:
+        ticket.done = True
+        self._set_depth(ticket.priority, -1)
+        if error is None:
+            self._granted(ticket.priority, now - ticket.enqueued)
+        ticket.grant(error)
+
+    def _drop_expired(self, now: float) -> Optional[float]:
+        """Fails queued tickets past their deadline; returns the earliest remaining deadline."""
+        kept, earliest = [], None
+        for entry in self._queue:
+            ticket = entry[2]
+            if ticket.done:
+                continue
+            if ticket.deadline is not None and now >= ticket.deadline:
+                self.stats["dropped"] += 1
+                metrics.incr('scheduler_dropped', exchange=self.exchange_id, priority=PRIORITY_NAMES[ticket.priority])
+                self._finish(ticket, DeadlineExceeded(
+                    f"{self.exchange_id}: {PRIORITY_NAMES[ticket.priority]} request waited "
+                    f"{now - ticket.enqueued:.2f}s and missed its deadline"), now)
+                continue
+            kept.append(entry)
+            if ticket.deadline is not None and (earliest is None or ticket.deadline < earliest):
+                earliest = ticket.deadline
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+        return earliest
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        """Grants tokens to the head of the queue; returns seconds until there is more to do (None = idle)."""
+        earliest = self._drop_expired(now)
+        while self._queue:
+            if now < self.paused_until:
+                ready = self.paused_until
+            else:
+                self._refill(now)
+                ticket = self._queue[0][2]
+                if ticket.done:
+                    heapq.heappop(self._queue)
+                    continue
+                needed = min(ticket.cost, self.burst)
+                if self.rate is None or self.tokens >= needed:
+                    heapq.heappop(self._queue)
+                    if self.rate is not None:
+                        self.tokens -= ticket.cost
+                    self._finish(ticket, None, now)
+                    continue
+                ready = now + (needed - self.tokens) / self.rate
+            return max(0.0, (min(ready, earliest) if earliest is not None else ready) - now)
+        return None
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._closed:
+                wait = self._dispatch(time.monotonic())
+                self._cond.wait(wait if wait is None else max(wait, 1e-4))
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        with self._cond:
+            if not ticket.done:
+                ticket.done = True
+                self._set_depth(ticket.priority, -1)
+
+    # --- Costs ---
+
+    def _estimate(self, cost_key: Any) -> float:
+        return self._costs.get(cost_key, 1.0) if cost_key is not None else 1.0
+
+    def _settle(self, cost_key: Any, charged: float, spent: List[float]) -> None:
+        """Charges (or refunds) the difference between the measured and the charged cost."""
+        if not spent[0]:
+            spent[0] = charged  # Not metered (e.g. the simulated exchange): the estimate stands
+        with self._cond:
+            if cost_key is not None:
+                self._costs[cost_key] = spent[0]
+            self.stats["cost"] += spent[0]
+            if self.rate is not None and spent[0] != charged:
+                self._refill(time.monotonic())
+                self.tokens = min(self.burst, self.tokens - (spent[0] - charged))
+                self._cond.notify()
+
+    # --- Retries ---
+
+    def _retry_delay(self, error: Exception, attempt: int, expires: Optional[float]) -> Optional[float]:
+        """Backoff before retry `attempt` (0-based), or None to give up and re-raise."""
+        if not isinstance(error, ccxt.NetworkError) or attempt >= self.max_retries:
+            return None
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = cap / 2 + self._rng.uniform(0, cap / 2)
+        now = time.monotonic()
+        if expires is not None and now + delay >= expires:
+            return None
+        with self._cond:
+            self.stats["retries"] += 1
+            if isinstance(error, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)):
+                # The venue says we are over its limit: stop everyone, not just this call
+                self.stats["throttled"] += 1
+                self._refill(now)
+                self.tokens = 0.0
+                self.paused_until = max(self.paused_until, now + delay)
+                self._cond.notify()
+        metrics.incr('scheduler_retries', exchange=self.exchange_id, error=type(error).__name__)
+        return delay
+
+    # --- Public API ---
+
+    def _acquire(self, priority: int, cost: float, expires: Optional[float]) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if self._try_take(now, cost):
+                self._granted(priority, 0.0)
+                return
+            event = threading.Event()
+            outcome: List[Optional[Exception]] = []
+            self._enqueue(priority, cost, expires, now, lambda error: (outcome.append(error), event.set()))
+        event.wait()
+        if outcome[0] is not None:
+            raise outcome[0]
+
+    async def _acquire_async(self, priority: int, cost: float, expires: Optional[float]) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            now = time.monotonic()
+            if self._try_take(now, cost):
+                self._granted(priority, 0.0)
+                return
+            future = loop.create_future()
+
+            def grant(error: Optional[Exception]) -> None:
+                try:
+                    loop.call_soon_threadsafe(_resolve, future, error)
+                except RuntimeError:  # Loop already closed
+                    pass
+
+            ticket = self._enqueue(priority, cost, expires, now, grant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._cancel(ticket)
+            raise
+
+    def call(self, fn: Callable[..., Any], *args: Any, priority: int = LIVE, deadline: Optional[float] = None,
+             cost_key: Any = None, **kwargs: Any) -> Any:
+        """
+        Runs fn(*args, **kwargs) once its tokens are free, retrying network errors.
+
+        Args:
+            fn: The exchange call.
+            priority: LIVE, MARKETS or HISTORY.
+            deadline: Seconds from now after which waiting work is dropped (None = never).
+            cost_key: Identifies calls of the same cost (e.g. method and depth) for the
+                up-front charge; None charges 1 and settles afterwards.
+
+        Raises:
+            DeadlineExceeded: The call was still queued when its deadline passed.
+            Exception: fn's own error once retries are exhausted or not applicable.
+        """
+        expires = time.monotonic() + deadline if deadline is not None else None
+        for attempt in itertools.count():
+            charged = self._estimate(cost_key)
+            self._acquire(priority, charged, expires)
+            spent = [0.0]
+            reset = _spent.set(spent)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, expires)
+                if delay is None:
+                    raise
+            finally:
+                _spent.reset(reset)
+                self._settle(cost_key, charged, spent)
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args: Any, priority: int = LIVE,
+                    deadline: Optional[float] = None, cost_key: Any = None, **kwargs: Any) -> Any:
+        """asyncio counterpart of call(); `fn` returns an awaitable."""
+        expires = time.monotonic() + deadline if deadline is not None else None
+        for attempt in itertools.count():
+            charged = self._estimate(cost_key)
+            await self._acquire_async(priority, charged, expires)
+            spent = [0.0]
+            reset = _spent.set(spent)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, expires)
+                if delay is None:
+                    raise
+            finally:
+                _spent.reset(reset)
+                self._settle(cost_key, charged, spent)
+            await asyncio.sleep(delay)
+
+    def describe(self) -> Dict[str, Any]:
+        """Current state: queue depth per priority, tokens left, pause remaining and counters."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "exchange": self.exchange_id,
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": self.tokens,
+                "paused_for": max(0.0, self.paused_until - now),
+                "queue_depth": {PRIORITY_NAMES[p]: n for p, n in self._depth.items()},
+                **self.stats
+            }
+
+    def close(self) -> None:
+        """Stops the dispatcher; anything still queued fails with DeadlineExceeded."""
+        with self._cond:
+            self._closed = True
+            now = time.monotonic()
+            for _, _, ticket in self._queue:
+                if not ticket.done:
+                    self._finish(ticket, DeadlineExceeded(f"{self.exchange_id}: scheduler closed"), now)
+            self._queue = []
+            self._cond.notify()
+
+
+def _resolve(future: asyncio.Future, error: Optional[Exception]) -> None:
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+def meter_exchange(exchange: Any) -> Any:
+    """
+    Makes a ccxt exchange (sync or async) report each request's cost to the scheduled call it runs in.
+
+    The cost is ccxt's own (endpoint `cost` / `byLimit`), taken where ccxt
+    would throttle. Build the exchange with enableRateLimit=False: the
+    scheduler does the throttling, by priority, instead of ccxt's FIFO.
+    """
+    fetch2 = exchange.fetch2
+
+    def metered_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+        spent = _spent.get()
+        if spent is not None:
+            spent[0] += exchange.calculate_rate_limiter_cost(api, method, path, params, config)
+        return fetch2(path, api, method, params, headers, body, config)
+
+    exchange.fetch2 = metered_fetch2
+    return exchange
+
+
+@functools.lru_cache(maxsize=None)
+def _rate_limit_ms(exchange_id: str) -> float:
+    """ccxt's milliseconds per cost unit for a venue."""
+    exchange_class = getattr(ccxt, exchange_id, None)
+    return float(exchange_class().rateLimit) if exchange_class else DEFAULT_RATE_LIMIT_MS
+
+
+def venue_limits(exchange_id: str, config: Optional[Dict[str, Any]] = None) -> Tuple[Optional[float], float]:
+    """
+    (rate, burst) for a venue.
+
+    Real venues: cost units per second from ccxt's rateLimit (ms per unit),
+    times RATE_HEADROOM, and VENUE_BURSTS. Simulated venues: their
+    configured rate_limit and burst (every request costs 1).
+    """
+    if is_simulated(exchange_id):
+        config = {**SIM_CONFIG, **(config or {})}
+        return config['rate_limit'], config['burst']
+    rate_limit_ms = (config or {}).get('rateLimit') or _rate_limit_ms(exchange_id)
+    return 1000.0 / rate_limit_ms * RATE_HEADROOM, VENUE_BURSTS.get(exchange_id.lower(), DEFAULT_BURST)
+
+
+_schedulers: Dict[Tuple[str, Optional[float], float], RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(exchange_id: str, config: Optional[Dict[str, Any]] = None) -> RateLimitScheduler:
+    """
+    The process-wide scheduler of a venue.
+
+    Venue limits apply per client IP, so every client of a venue (sync or
+    async, UI or background) shares the same bucket and queue.
+    """
+    rate, burst = venue_limits(exchange_id, config)
+    key = (exchange_id, rate, burst)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = _schedulers[key] = RateLimitScheduler(exchange_id, rate, burst)
+        return scheduler
+
+
+def all_schedulers() -> List[RateLimitScheduler]:
+    with _schedulers_lock:
+        return list(_schedulers.values())
@@ -0,0 +1,263 @@
+import asyncio
+import math
+import threading
+import time
+import zlib
+import ccxt
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SYMBOLS = {'BTC/USDT': 30000.0, 'ETH/USDT': 2000.0, 'SOL/USDT': 60.0}
+
+DEFAULT_CONFIG = {
+    'seed': 0,
+    'latency': 0.0,           # Mean response time, seconds
+    'jitter': 0.0,            # Std dev added to latency (log-normal tail), seconds
+    'error_rate': 0.0,        # Probability a request fails with ccxt.NetworkError
+    'rate_limit': None,       # Requests per second allowed (None = unlimited)
+    'burst': 10,              # Token bucket capacity
+    'max_depth': 5000,        # Levels per side available
+    'book_refresh_ms': 250,   # Books change every this many ms
+    'extra_symbols': 0,       # Additional SIMn/USDT markets (for market-wide scans)
+}
+
+
+def is_simulated(exchange_id: str) -> bool:
+    """'sim' and 'sim-<name>' ids select the simulated exchange (the name seeds an independent venue)."""
+    return exchange_id == 'sim' or exchange_id.startswith('sim-')
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SimulatedMarket:
+    """
+    Deterministic market data generator shared by the sync and async exchanges.
+
+    Mid prices follow a smooth seeded path plus noise with an intraday
+    volatility/volume cycle (busiest around 13-16 UTC), so books, candles and
+    time-of-day analysis all look plausible and are reproducible for a seed.
+    """
+
+    def __init__(self, exchange_id: str = 'sim', config: Optional[Dict[str, Any]] = None):
+        self.id = exchange_id
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.seed = int(self.config['seed']) ^ zlib.crc32(exchange_id.encode())
+        self.symbols = dict(self.config.get('symbols') or DEFAULT_SYMBOLS)
+        for i in range(int(self.config['extra_symbols'])):
+            self.symbols[f"SIM{i}/USDT"] = 10.0 ** (1 + (i * 7919) % 4)
+
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(self.seed)
+        rate = self.config['rate_limit']
+        self._bucket = _TokenBucket(rate, self.config['burst']) if rate else None
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def _rng_for(self, *keys: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, *keys])
+
+    def _symbol_key(self, symbol: str) -> int:
+        if symbol not in self.symbols:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        return zlib.crc32(symbol.encode())
+
+    def mid_price(self, symbol: str, ts: int) -> float:
+        """Deterministic mid at `ts` (ms): a few seeded sine waves in log space."""
+        key = self._symbol_key(symbol)
+        phases = self._rng_for(key, 1).uniform(0, 2 * math.pi, 4)
+        periods = (7 * 86400e3, 86400e3, 4 * 3600e3, 1800e3)
+        amplitudes = (0.05, 0.01, 0.002, 0.0005)
+        log_move = sum(a * math.sin(2 * math.pi * ts / p + ph) for a, p, ph in zip(amplitudes, periods, phases))
+        return self.symbols[symbol] * math.exp(log_move)
+
+    @staticmethod
+    def activity(ts: np.ndarray) -> np.ndarray:
+        """Intraday activity multiplier (1.0 quiet, ~2.5 at the 13-16 UTC peak)."""
+        hour = (ts // 3600000) % 24
+        return 1.0 + 1.5 * np.exp(-((hour - 14.5) ** 2) / 8.0)
+
+    # --- Request plumbing ---
+
+    def _admit(self) -> float:
+        """Applies rate limit and error injection; returns the delay to simulate."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self._bucket is not None and not self._bucket.take():
+                self.stats["rate_limited"] += 1
+                raise ccxt.RateLimitExceeded(f"{self.id} 429 Too Many Requests")
+            if self.config['error_rate'] and self._rng.random() < self.config['error_rate']:
+                self.stats["errors"] += 1
+                raise ccxt.NetworkError(f"{self.id} simulated network error")
+            delay = self.config['latency']
+            if self.config['jitter']:
+                delay += self._rng.lognormal(0.0, 1.0) * self.config['jitter']
+        return max(0.0, delay)
+
+    def milliseconds(self) -> int:
+        return int(time.time() * 1000)
+
+    def markets(self) -> Dict[str, Dict[str, Any]]:
+        markets = {}
+        for symbol, base_price in self.symbols.items():
+            base, quote = symbol.split('/')
+            price_precision = max(0, 4 - int(math.floor(math.log10(base_price))))
+            markets[symbol] = {
+                'id': symbol.replace('/', ''),
+                'symbol': symbol,
+                'base': base,
+                'quote': quote,
+                'active': True,
+                'type': 'spot',
+                'spot': True,
+                'precision': {'price': 10.0 ** -price_precision, 'amount': 1e-6},
+                'limits': {'amount': {'min': 1e-6, 'max': None}, 'cost': {'min': 5.0, 'max': None}},
+                'info': {'maxOrderBookDepth': self.config['max_depth']}
+            }
+        return markets
+
+    def order_book(self, symbol: str, limit: Optional[int] = None, ts: Optional[int] = None) -> Dict[str, Any]:
+        ts = self.milliseconds() if ts is None else ts
+        depth = min(limit or 100, self.config['max_depth'])
+        bucket = ts // self.config['book_refresh_ms']
+        key = self._symbol_key(symbol)
+        # One stream per array, so a shallower request returns a prefix of a deeper one (as real venues do)
+        stream = lambda i: self._rng_for(key, 2, bucket, i)
+
+        mid = self.mid_price(symbol, bucket * self.config['book_refresh_ms'])
+        tick = mid * 1e-5
+        half_spread = tick * (1 + stream(0).integers(0, 3))
+        # Level gaps widen and sizes grow away from the touch
+        distance = np.arange(depth)
+        ask_prices = mid + half_spread + tick * np.cumsum(stream(1).integers(1, 4, depth))
+        bid_prices = mid - half_spread - tick * np.cumsum(stream(2).integers(1, 4, depth))
+        notional_scale = 20000.0 / mid
+        ask_sizes = stream(3).lognormal(0.0, 0.8, depth) * notional_scale * (1 + distance / 50)
+        bid_sizes = stream(4).lognormal(0.0, 0.8, depth) * notional_scale * (1 + distance / 50)
+        return {
+            'symbol': symbol,
+            'timestamp': int(ts),
+            'datetime': None,
+            'nonce': int(bucket),
+            'bids': np.column_stack((bid_prices, bid_sizes)).tolist(),
+            'asks': np.column_stack((ask_prices, ask_sizes)).tolist()
+        }
+
+    def ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None, limit: Optional[int] = None) -> List[list]:
+        step = int(ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+        now = self.milliseconds()
+        limit = min(limit or 500, 1000)
+        if since is None:
+            since = now - limit * step
+        start = -(-since // step) * step
+        ts = np.arange(start, min(start + limit * step, now + 1), step, dtype=np.int64)
+        if len(ts) == 0:
+            return []
+
+        key = self._symbol_key(symbol)
+        open_ = np.array([self.mid_price(symbol, int(t)) for t in ts])
+        close = np.array([self.mid_price(symbol, int(t + step)) for t in ts])
+        activity = self.activity(ts)
+        # Per-candle noise is keyed by timestamp so overlapping requests agree
+        noise = np.array([self._rng_for(key, 3, int(t) // step).random(3) for t in ts])
+        range_pct = 0.0008 * math.sqrt(step / 60000) * activity * (0.5 + noise[:, 0])
+        high = np.maximum(open_, close) * (1 + range_pct * noise[:, 1])
+        low = np.minimum(open_, close) * (1 - range_pct * (1 - noise[:, 1]))
+        volume = 50000.0 / open_ * (step / 60000) * activity * (0.5 + noise[:, 2])
+        return np.column_stack((ts, open_, high, low, close, volume)).tolist()
+
+
+class SimulatedExchange:
+    """
+    Local stand-in for a ccxt exchange (sync API subset used by ExchangeClient).
+
+    Supports fetch_order_book, fetch_ohlcv, load_markets, has and milliseconds,
+    with configurable latency, jitter, error rate and rate limit (see DEFAULT_CONFIG).
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, exchange_id: str = 'sim'):
+        self.sim = SimulatedMarket(exchange_id, config)
+        self.id = exchange_id
+        self.has = {'fetchOrderBook': True, 'fetchOHLCV': True, 'fetchMarkets': True}
+        self.markets: Optional[Dict[str, Any]] = None
+        self.currencies: Optional[Dict[str, Any]] = None
+        self.symbols: List[str] = []
+
+    def milliseconds(self) -> int:
+        return self.sim.milliseconds()
+
+    def load_markets(self, reload: bool = False) -> Dict[str, Any]:
+        if self.markets is None or reload:
+            time.sleep(self.sim._admit())
+            self.set_markets(self.sim.markets())
+        return self.markets
+
+    def set_markets(self, markets: Dict[str, Any], currencies: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.markets = dict(markets)
+        self.currencies = currencies
+        self.symbols = list(self.markets)
+        return self.markets
+
+    def fetch_order_book(self, symbol: str, limit: Optional[int] = None, params: Optional[dict] = None) -> Dict[str, Any]:
+        time.sleep(self.sim._admit())
+        return self.sim.order_book(symbol, limit)
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None, limit: Optional[int] = None,
+                    params: Optional[dict] = None) -> List[list]:
+        time.sleep(self.sim._admit())
+        return self.sim.ohlcv(symbol, timeframe, since, limit)
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncSimulatedExchange:
+    """asyncio counterpart of SimulatedExchange (ccxt.async_support API subset)."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, exchange_id: str = 'sim'):
+        self.sim = SimulatedMarket(exchange_id, config)
+        self.id = exchange_id
+        self.has = {'fetchOrderBook': True, 'fetchOHLCV': True, 'fetchMarkets': True}
+        self.markets: Optional[Dict[str, Any]] = None
+        self.currencies: Optional[Dict[str, Any]] = None
+        self.symbols: List[str] = []
+
+    def milliseconds(self) -> int:
+        return self.sim.milliseconds()
+
+    async def load_markets(self, reload: bool = False) -> Dict[str, Any]:
+        if self.markets is None or reload:
+            await asyncio.sleep(self.sim._admit())
+            self.set_markets(self.sim.markets())
+        return self.markets
+
+    def set_markets(self, markets: Dict[str, Any], currencies: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.markets = dict(markets)
+        self.currencies = currencies
+        self.symbols = list(self.markets)
+        return self.markets
+
+    async def fetch_order_book(self, symbol: str, limit: Optional[int] = None, params: Optional[dict] = None) -> Dict[str, Any]:
+        await asyncio.sleep(self.sim._admit())
+        return self.sim.order_book(symbol, limit)
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None, limit: Optional[int] = None,
+                          params: Optional[dict] = None) -> List[list]:
+        await asyncio.sleep(self.sim._admit())
+        return self.sim.ohlcv(symbol, timeframe, since, limit)
+
+    async def close(self) -> None:
+        pass
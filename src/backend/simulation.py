@@ -1,16 +1,324 @@
-import pandas as pd
-from typing import Dict, List, Tuple
+import numpy as np
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple, Union
+
+from .metrics import metrics
+from .orderbook import OrderBookSnapshot, levels_to_arrays
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _slippage(avg_price: np.ndarray, has_fill: np.ndarray, reference_price: float, side: str) -> np.ndarray:
+    """Signed slippage vs a reference price; positive is a cost for either side."""
+    if reference_price <= 0:
+        return np.zeros_like(avg_price)
+    if side.lower() == 'buy':
+        slippage = (avg_price - reference_price) / reference_price
+    else:
+        slippage = (reference_price - avg_price) / reference_price
+    return np.where(has_fill, slippage, 0.0)
+
+
+class BookSide:
+    """
+    Precompiled form of one side of an order book.
+
+    Cumulative notional and quantity are built once, so any trade size can be
+    answered with a binary search plus one partial-level interpolation instead
+    of walking the levels in Python.
+    """
+
+    def __init__(self, prices: np.ndarray, sizes: np.ndarray,
+                 cum_notional: np.ndarray = None, cum_qty: np.ndarray = None):
+        """
+        Args:
+            prices: Level prices, best first.
+            sizes: Level sizes (base asset).
+            cum_notional, cum_qty: Precomputed prefix sums (e.g. maintained
+                incrementally by a local book); computed here if omitted.
+        """
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self.sizes = np.ascontiguousarray(sizes, dtype=np.float64)
+        self.cum_notional = np.cumsum(self.prices * self.sizes) if cum_notional is None else cum_notional
+        self.cum_qty = np.cumsum(self.sizes) if cum_qty is None else cum_qty
+        self._vwap = None
+
+    @classmethod
+    def from_levels(cls, levels: Sequence) -> "BookSide":
+        return cls(*levels_to_arrays(levels))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def top_price(self) -> float:
+        return float(self.prices[0]) if len(self.prices) else 0.0
+
+    @property
+    def total_notional(self) -> float:
+        return float(self.cum_notional[-1]) if len(self.cum_notional) else 0.0
+
+    def fill(self, amounts_usd: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fills each USD amount against this side.
+
+        Args:
+            amounts_usd: Array of trade sizes in USD.
+
+        Returns:
+            Tuple of (quantity acquired, USD spent, USD left unfilled) arrays.
+        """
+        amounts = np.maximum(np.asarray(amounts_usd, dtype=np.float64), 0.0)
+        n = len(self.prices)
+        if n == 0:
+            zeros = np.zeros_like(amounts)
+            return zeros, zeros.copy(), amounts.copy()
+
+        # Number of levels consumed entirely by each amount
+        full = np.searchsorted(self.cum_notional, amounts, side='right')
+        notional_before = np.concatenate(([0.0], self.cum_notional))[full]
+        qty_before = np.concatenate(([0.0], self.cum_qty))[full]
+        if metrics.enabled:
+            # Levels a level-by-level walk would have visited
+            metrics.incr('levels_walked', int(np.minimum(full + 1, n).sum()))
+
+        # Partial fill of the next level (if the book is not exhausted)
+        in_book = full < n
+        next_price = self.prices[np.minimum(full, n - 1)]
+        remaining = amounts - notional_before
+        partial_qty = np.where(in_book, remaining / next_price, 0.0)
+
+        qty = qty_before + partial_qty
+        spent = np.where(in_book, amounts, notional_before)
+        unfilled = np.where(in_book, 0.0, remaining)
+        return qty, spent, unfilled
+
+    @property
+    def vwap(self) -> np.ndarray:
+        """Average price of consuming the first k + 1 levels (monotone in k; built once)."""
+        if self._vwap is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._vwap = self.cum_notional / self.cum_qty
+        return self._vwap
+
+    def max_fill(self, vwap_limits: Sequence[float], descending: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Largest fill whose average price stays within each limit (inverse of fill).
+
+        The VWAP of the levels consumed so far only moves away from the top of
+        book, so each limit is one binary search over the per-level VWAPs plus
+        a closed-form partial fill of the next level.
+
+        Args:
+            vwap_limits: Worst acceptable average price per query.
+            descending: True for bids (limit is a floor), False for asks (a ceiling).
+
+        Returns:
+            Tuple of (quantity, USD notional, exhausted) arrays; exhausted means the
+            whole side fits within the limit.
+        """
+        limits = np.asarray(vwap_limits, dtype=np.float64)
+        n = len(self.prices)
+        if n == 0:
+            zeros = np.zeros_like(limits)
+            return zeros, zeros.copy(), np.ones_like(limits, dtype=bool)
+
+        # Levels that can be consumed entirely
+        if descending:
+            full = np.searchsorted(-self.vwap, -limits, side='right')
+        else:
+            full = np.searchsorted(self.vwap, limits, side='right')
+        notional_before = np.concatenate(([0.0], self.cum_notional))[full]
+        qty_before = np.concatenate(([0.0], self.cum_qty))[full]
+
+        # Part of the next level that brings the average exactly to the limit:
+        # (notional + p * x) / (qty + x) = limit
+        exhausted = full >= n
+        next_price = self.prices[np.minimum(full, n - 1)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            partial = (limits * qty_before - notional_before) / (next_price - limits)
+        partial = np.where(exhausted | ~np.isfinite(partial), 0.0, np.clip(partial, 0.0, self.sizes[np.minimum(full, n - 1)]))
+        return qty_before + partial, notional_before + partial * next_price, exhausted
+
+
+class CompiledOrderBook:
+    """Array-backed order book with both sides precompiled for fast size queries."""
+
+    def __init__(self, bids: BookSide, asks: BookSide):
+        self.bids = bids
+        self.asks = asks
+        # Bucketed depth per (bucket_bps, range_bps); the book never changes once compiled
+        self._depth: Dict[Tuple[float, float], Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_ccxt(cls, order_book: Dict[str, Any]) -> "CompiledOrderBook":
+        return cls(BookSide.from_levels(order_book.get('bids')), BookSide.from_levels(order_book.get('asks')))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: OrderBookSnapshot) -> "CompiledOrderBook":
+        """Compiles a snapshot, reusing its price/size arrays without copying."""
+        return cls(BookSide(snapshot.bid_prices, snapshot.bid_sizes), BookSide(snapshot.ask_prices, snapshot.ask_sizes))
+
+    def side_for(self, side: str) -> BookSide:
+        """Returns the side consumed by a trade (asks for a buy, bids for a sell)."""
+        return self.asks if side.lower() == 'buy' else self.bids
+
+    @property
+    def mid_price(self) -> float:
+        """Mid of the top of book, or 0.0 if either side is empty."""
+        if len(self.bids) == 0 or len(self.asks) == 0:
+            return 0.0
+        return (self.bids.top_price + self.asks.top_price) / 2
+
+    def max_size_within(self, side: str, budgets: Sequence[float], reference_price: float = None,
+                        fee_rate: float = 0.0) -> Dict[str, np.ndarray]:
+        """
+        Largest trade whose total drag (slippage vs reference + fee) stays within each budget.
+
+        Args:
+            side: 'buy' or 'sell'.
+            budgets: Drag limits as fractions (e.g. 0.001 for 10 bps); with
+                fee_rate 0 they are pure slippage limits.
+            reference_price: Price slippage is measured against (mid by default).
+            fee_rate: Fee added to the slippage (as in CostCalculator).
+
+        Returns:
+            Dictionary of arrays aligned with `budgets`: notional_usd, quantity,
+            avg_price (0 when nothing fits) and exhausted (the whole side fits).
+        """
+        budgets = np.asarray(budgets, dtype=np.float64)
+        ref = self.mid_price if reference_price is None else reference_price
+        slippage = budgets - fee_rate
+        is_buy = side.lower() == 'buy'
+        if ref <= 0:
+            zeros = np.zeros_like(budgets)
+            return {"notional_usd": zeros, "quantity": zeros.copy(), "avg_price": zeros.copy(),
+                    "exhausted": np.zeros_like(budgets, dtype=bool)}
+
+        limits = ref * (1 + slippage) if is_buy else ref * (1 - slippage)
+        qty, notional, exhausted = self.side_for(side).max_fill(limits, descending=not is_buy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = np.where(qty > 0, notional / qty, 0.0)
+        return {"notional_usd": notional, "quantity": qty, "avg_price": avg_price, "exhausted": exhausted}
+
+    def depth_within(self, offsets_bps: Sequence[float], reference_price: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cumulative USD resting within each distance of the reference price (mid by default).
+
+        Args:
+            offsets_bps: Distances from the reference in basis points.
+            reference_price: Price the distances are measured from.
+
+        Returns:
+            Tuple of (bid notional, ask notional) arrays aligned with `offsets_bps`:
+            bids priced at or above ref * (1 - offset), asks at or below ref * (1 + offset).
+        """
+        offsets = np.asarray(offsets_bps, dtype=np.float64) / 10000.0
+        ref = self.mid_price if reference_price is None else reference_price
+        if ref <= 0:
+            return np.zeros_like(offsets), np.zeros_like(offsets)
+        # Bids are descending: search the negated prices
+        bid_count = np.searchsorted(-self.bids.prices, -ref * (1 - offsets), side='right')
+        ask_count = np.searchsorted(self.asks.prices, ref * (1 + offsets), side='right')
+        bid_notional = np.concatenate(([0.0], self.bids.cum_notional))[bid_count]
+        ask_notional = np.concatenate(([0.0], self.asks.cum_notional))[ask_count]
+        return bid_notional, ask_notional
+
+    def depth_profile(self, bucket_bps: float = 5.0, range_bps: float = 500.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        depth_within mid at every bucket edge 0, bucket_bps, ..., range_bps (cached per book).
+
+        Returns:
+            Tuple of (bid notional, ask notional) arrays of length
+            range_bps / bucket_bps + 1; treat them as read-only.
+        """
+        if bucket_bps <= 0 or range_bps <= 0:
+            raise ValueError("bucket_bps and range_bps must be positive")
+        key = (float(bucket_bps), float(range_bps))
+        profile = self._depth.get(key)
+        if profile is None:
+            edges = np.arange(int(round(range_bps / bucket_bps)) + 1) * float(bucket_bps)
+            profile = self._depth[key] = self.depth_within(edges)
+        return profile
+
+    def simulate_many(self, side: str, sizes: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Vectorized equivalent of OrderBookWalker.simulate_trade for many sizes.
+
+        Args:
+            side: 'buy' or 'sell'.
+            sizes: Trade sizes in USD.
+
+        Returns:
+            Dictionary of arrays aligned with `sizes`: total_asset_acquired,
+            avg_price, slippage_percent (vs top of book) and filled.
+        """
+        book_side = self.side_for(side)
+        with metrics.span('simulate'):
+            qty, spent, unfilled = book_side.fill(sizes)
+
+        has_fill = qty > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = np.where(has_fill, spent / qty, 0.0)
+
+        return {
+            "total_asset_acquired": qty,
+            "avg_price": avg_price,
+            "slippage_percent": _slippage(avg_price, has_fill, book_side.top_price, side),
+            "filled": has_fill & (unfilled <= 1.0)  # Same tolerance as the level walk
+        }
+
+    def simulate_trade(self, side: str, amount_usd: float) -> Dict[str, float]:
+        """Single-size query with the same output as OrderBookWalker.simulate_trade."""
+        if len(self.side_for(side)) == 0:
+            return {
+                "total_asset_acquired": 0.0,
+                "avg_price": 0.0,
+                "filled": False
+            }
+
+        res = self.simulate_many(side, [amount_usd])
+        return {
+            "total_asset_acquired": float(res["total_asset_acquired"][0]),
+            "avg_price": float(res["avg_price"][0]),
+            "slippage_percent": float(res["slippage_percent"][0]),
+            "filled": bool(res["filled"][0])
+        }
+
 
 class OrderBookWalker:
     def __init__(self):
         pass
 
-    def simulate_trade(self, order_book: Dict[str, Any], side: str, amount_usd: float) -> Dict[str, float]:
+    @staticmethod
+    def compile(order_book: Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook]) -> CompiledOrderBook:
+        """Builds (or passes through) the precompiled array form of a book."""
+        if isinstance(order_book, CompiledOrderBook):
+            return order_book
+        if isinstance(order_book, OrderBookSnapshot):
+            return order_book.compile()
+        return CompiledOrderBook.from_ccxt(order_book or {})
+
+    def simulate_many(self, order_book: Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook], side: str, sizes: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Prices a whole batch of trade sizes in one vectorized pass.
+
+        Args:
+            order_book: Raw ccxt book, OrderBookSnapshot or CompiledOrderBook (compile once, query many).
+            side: 'buy' or 'sell'.
+            sizes: Trade sizes in USD.
+
+        Returns:
+            Dictionary of numpy arrays, see CompiledOrderBook.simulate_many.
+        """
+        return self.compile(order_book).simulate_many(side, sizes)
+
+    def simulate_trade(self, order_book: Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook], side: str, amount_usd: float) -> Dict[str, float]:
         """
         Simulates a trade by walking the order book.
         
         Args:
-            order_book: Dictionary containing 'bids' and 'asks'.
+            order_book: Dictionary containing 'bids' and 'asks' (or an OrderBookSnapshot/CompiledOrderBook).
             side: 'buy' or 'sell'.
             amount_usd: Total trade size in USD.
             
@@ -22,6 +330,9 @@ class OrderBookWalker:
             - slippage_percent (vs top of book)
             - filled: Boolean, True if simulating full amount was possible
         """
+        if isinstance(order_book, (CompiledOrderBook, OrderBookSnapshot)):
+            return self.compile(order_book).simulate_trade(side, amount_usd)
+
         if not order_book or 'bids' not in order_book or 'asks' not in order_book:
             return {
                 "total_asset_acquired": 0.0,
@@ -92,3 +403,124 @@ class OrderBookWalker:
             "slippage_percent": slippage_percent,
             "filled": remaining_usd <= 1.0 # Consider filled if remaining is negligible
         }
+
+
+def size_grid(max_size: float, points: int = 500, scale: str = 'log', min_size: float = None) -> np.ndarray:
+    """
+    Builds an ascending grid of trade sizes for a slippage curve.
+
+    Args:
+        max_size: Largest trade size in USD.
+        points: Number of grid points.
+        scale: 'log' or 'linear' spacing.
+        min_size: Smallest trade size (defaults to 1% of max_size).
+
+    Returns:
+        Ascending float64 array of sizes.
+    """
+    if max_size <= 0 or points <= 0:
+        return np.empty(0, dtype=np.float64)
+    if min_size is None or min_size <= 0:
+        min_size = max_size * 0.01
+    min_size = min(min_size, max_size)
+
+    if scale.lower() == 'log':
+        return np.geomspace(min_size, max_size, points)
+    if scale.lower() == 'linear':
+        return np.linspace(min_size, max_size, points)
+    raise ValueError(f"Unknown grid scale '{scale}' (expected 'log' or 'linear')")
+
+
+class SlippageCurve:
+    """
+    Slippage/impact curve for one side of one venue, stored as parallel arrays.
+
+    Slippage is measured against `reference_price` (top of book by default, the
+    mid price when the caller passes it), using the same sign convention as
+    CostCalculator: positive is a cost.
+    """
+
+    def __init__(self, sizes: np.ndarray, avg_price: np.ndarray, slippage_percent: np.ndarray,
+                 filled: np.ndarray, side: str, reference_price: float, exchange: str = None):
+        self.sizes = sizes
+        self.avg_price = avg_price
+        self.slippage_percent = slippage_percent
+        self.filled = filled
+        self.side = side.lower()
+        self.reference_price = reference_price
+        self.exchange = exchange
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    @property
+    def max_filled_size(self) -> float:
+        """Largest grid size the book could fill completely."""
+        sizes = self.sizes[self.filled]
+        return float(sizes[-1]) if len(sizes) else 0.0
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Exports the curve as a DataFrame (one row per grid point)."""
+        import pandas as pd  # Deferred: only exports need pandas
+        return pd.DataFrame({
+            "exchange": self.exchange,
+            "side": self.side,
+            "size_usd": self.sizes,
+            "avg_price": self.avg_price,
+            "slippage_percent": self.slippage_percent,
+            "filled": self.filled
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly export."""
+        return {
+            "exchange": self.exchange,
+            "side": self.side,
+            "reference_price": self.reference_price,
+            "size_usd": self.sizes.tolist(),
+            "avg_price": self.avg_price.tolist(),
+            "slippage_percent": self.slippage_percent.tolist(),
+            "filled": self.filled.tolist()
+        }
+
+
+def slippage_curve(order_book: Union[Dict[str, Any], OrderBookSnapshot, CompiledOrderBook], side: str, sizes: Sequence[float],
+                   reference_price: float = None, exchange: str = None) -> SlippageCurve:
+    """
+    Computes a dense slippage curve from one vectorized pass over one side of the book.
+
+    Args:
+        order_book: Raw ccxt book, OrderBookSnapshot or CompiledOrderBook.
+        side: 'buy' or 'sell'.
+        sizes: Trade sizes in USD (sorted internally if needed).
+        reference_price: Price slippage is measured against (defaults to top of book).
+        exchange: Optional venue label carried on the result.
+
+    Returns:
+        SlippageCurve with ascending sizes.
+    """
+    compiled = OrderBookWalker.compile(order_book)
+    book_side = compiled.side_for(side)
+
+    sizes = np.asarray(sizes, dtype=np.float64)
+    if len(sizes) > 1 and np.any(sizes[1:] < sizes[:-1]):
+        sizes = np.sort(sizes)
+
+    with metrics.span('curve'):
+        qty, spent, unfilled = book_side.fill(sizes)
+    has_fill = qty > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_price = np.where(has_fill, spent / qty, 0.0)
+
+    if reference_price is None:
+        reference_price = book_side.top_price
+
+    return SlippageCurve(
+        sizes=sizes,
+        avg_price=avg_price,
+        slippage_percent=_slippage(avg_price, has_fill, reference_price, side),
+        filled=has_fill & (unfilled <= 1.0),
+        side=side,
+        reference_price=float(reference_price),
+        exchange=exchange
+    )
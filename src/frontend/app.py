@@ -1,18 +1,33 @@
-import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import sys
+import time
+
+_SCRIPT_START = time.perf_counter()
+
+import asyncio
 import os
+import sys
+import threading
+
+import streamlit as st
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 
-import importlib
-from backend import exchange_client
-importlib.reload(exchange_client)
-from backend.exchange_client import ExchangeClient
-from backend.simulation import OrderBookWalker
-from backend.calculator import CostCalculator
+# Only lightweight modules load before the first paint; pandas, plotly, ccxt and the
+# pricing backend are imported where they are used (and pre-loaded by the warm-up).
+from backend.metrics import metrics
+
+_IMPORTS_DONE = time.perf_counter()
+
+# Cold-start budgets (ms): script imports and script start -> sidebar rendered
+IMPORT_BUDGET_MS = 150
+FIRST_PAINT_BUDGET_MS = 500
+
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT"]
+EXCHANGES = ["binance", "kraken", "coinbase", "kucoin", "sim"]
+DEFAULT_EXCHANGES = ["binance", "kraken"]
+DEFAULT_TRADE_SIZE = 1000000.0
+DEPTH_RANGE_BPS = 500  # Depth chart covers +/-5% of mid
+DRAG_BUDGETS_BPS = [10, 25, 50, 100]
 
 st.set_page_config(page_title="Best Execution Analyzer", layout="wide")
 
@@ -23,26 +38,131 @@ st.markdown("Compare excessive slippage costs on public exchanges vs. OTC desks.
 # --- Sidebar Inputs ---
 st.sidebar.header("Trade Parameters")
 
-import concurrent.futures
+# Market metadata on disk, shared by every server process (no load_markets per start)
+@st.cache_resource(show_spinner=False)
+def get_market_cache():
+    from backend.markets import MarketCache
+    return MarketCache()
+
+# Initialize Exchange Client (Cached per exchange; the ccxt exchange itself is built on first use)
+@st.cache_resource(show_spinner=False)
+def get_exchange_client_v2(exchange_id):
+    from backend.candle_store import CandleStore
+    from backend.exchange_client import ExchangeClient
+    return ExchangeClient(exchange_id, candle_store=CandleStore(), market_cache=get_market_cache())
+
+# One background event loop for the whole server process: async clients and
+# their HTTP sessions are bound to it and stay alive across reruns.
+@st.cache_resource(show_spinner=False)
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="exchange-io", daemon=True).start()
+    return loop
+
+@st.cache_resource(show_spinner=False)
+def get_async_client(exchange_id):
+    from backend.exchange_client import AsyncExchangeClient
+    return AsyncExchangeClient(exchange_id, market_cache=get_market_cache())
+
+def load_books(keys, timeout=10.0, deadline=15.0):
+    """Upstream loader for the book cache: fetches every (exchange, symbol, depth) concurrently on the shared loop."""
+    from backend.exchange_client import fetch_order_books
+    clients = [get_async_client(exc) for exc, _, _ in keys]
+
+    async def run():
+        batches = [
+            fetch_order_books([client], [sym], limit=depth, timeout=timeout, deadline=deadline)
+            for client, (_, sym, depth) in zip(clients, keys)
+        ]
+        done = await asyncio.gather(*batches)
+        return {key: next(iter(res.values())) for key, res in zip(keys, done)}
+
+    return asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result()
+
+# Shared by all sessions: reruns and concurrent users within max_age reuse the same
+# snapshot, and simultaneous misses for one key cause a single upstream call.
+@st.cache_resource(show_spinner=False)
+def get_book_cache():
+    from backend.cache import OrderBookCache
+    return OrderBookCache(load_books, max_age=1.0)
+
+def fetch_books(exchange_ids, symbol, limit, max_age=None):
+    """Returns {exchange: snapshot or Exception} through the shared book cache (limit: depth or {exchange: depth})."""
+    keys = [(exc, symbol, limit[exc] if isinstance(limit, dict) else limit) for exc in exchange_ids]
+    results = get_book_cache().get_many(keys, max_age=max_age)
+    return {exc: results[key] for exc, key in zip(exchange_ids, keys)}
 
-# ... (Imports remain same)
+# Remembers each book's depth profile so requests ask for just enough levels
+@st.cache_resource(show_spinner=False)
+def get_depth_planner():
+    from backend.adaptive_depth import DepthPlanner
+    return DepthPlanner()
 
-# Initialize Exchange Client (Cached per exchange)
+def fetch_books_for_trade(exchange_ids, symbol, trade_size, max_age=None):
+    """
+    Fetches each venue just deep enough for every Live panel; returns (books, depths).
+
+    That is the trade on both sides (the slippage curve plots both), every level within
+    DEPTH_RANGE_BPS of mid (depth chart) and the largest drag budget, whichever is deepest.
+    """
+    from backend.adaptive_depth import fetch_adaptive
+    return fetch_adaptive(lambda depths: fetch_books(list(depths), symbol, depths, max_age=max_age),
+                          exchange_ids, symbol, 'both', trade_size, get_depth_planner(),
+                          range_bps=DEPTH_RANGE_BPS, budget_bps=max(DRAG_BUDGETS_BPS))
+
+# Once per server process: imports the heavy stack, builds the default clients and
+# fetches their first books on a daemon thread while the first page renders.
+@st.cache_resource(show_spinner=False)
+def start_warmup(exchange_ids, symbol, trade_size):
+    state = {"done": threading.Event(), "seconds": None, "error": None}
+
+    def run():
+        start = time.perf_counter()
+        try:
+            with metrics.span('warmup'):
+                import pandas  # noqa: F401
+                import plotly.graph_objects  # noqa: F401
+                from backend import calculator, depth, historical, router, simulation  # noqa: F401
+                fetch_books_for_trade(list(exchange_ids), symbol, trade_size)
+        except Exception as e:
+            state["error"] = str(e)
+        finally:
+            state["seconds"] = time.perf_counter() - start
+            state["done"].set()
+
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+    return state
+
+# Cold-start timings of this server process (first script run)
+@st.cache_resource(show_spinner=False)
+def get_startup_timings():
+    return {"import_ms": (_IMPORTS_DONE - _SCRIPT_START) * 1e3, "first_paint_ms": None}
+
+# Optional Prometheus endpoint (OTC_METRICS_PORT) shared by all sessions
 @st.cache_resource
-def get_exchange_client_v2(exchange_id):
-    return ExchangeClient(exchange_id)
+def start_metrics_server(port):
+    return metrics.serve(port)
+
+if os.environ.get('OTC_METRICS_PORT'):
+    metrics.enabled = True
+    start_metrics_server(int(os.environ['OTC_METRICS_PORT']))
+
+warmup = None
+if os.environ.get('OTC_WARMUP', '1') != '0':
+    warmup = start_warmup(tuple(DEFAULT_EXCHANGES), SYMBOLS[0], DEFAULT_TRADE_SIZE)
 
 # Trading Pair
-symbol = st.sidebar.selectbox("Trading Pair", ["BTC/USDT", "ETH/USDT", "SOL/USDT"])
+# Markets found by the scanner can be analyzed too
+symbol = st.sidebar.selectbox("Trading Pair", SYMBOLS + [s for s in st.session_state.get('scan_symbols', []) if s not in SYMBOLS])
 
 # Exchanges to Compare
-exchanges = st.sidebar.multiselect("Exchanges to Compare", ["binance", "kraken", "coinbase", "kucoin"], default=["binance", "kraken"])
+exchanges = st.sidebar.multiselect("Exchanges to Compare", EXCHANGES, default=DEFAULT_EXCHANGES)
 
 # Trade Side
 side = st.sidebar.radio("Side", ["Buy", "Sell"])
 
 # Trade Size
-trade_size = st.sidebar.number_input("Trade Size (USD)", min_value=1000.0, value=1000000.0, step=10000.0, format="%f")
+trade_size = st.sidebar.number_input("Trade Size (USD)", min_value=1000.0, value=DEFAULT_TRADE_SIZE, step=10000.0, format="%f")
 
 # OTC Assumptions
 st.sidebar.header("OTC Assumptions")
@@ -53,21 +173,62 @@ otc_fee_percent = otc_bps / 10000.0
 exchange_fee_bps = st.sidebar.number_input("Exchange Fee (bps)", value=10)
 exchange_fee_percent = exchange_fee_bps / 10000.0
 
+# Market Data Settings
+st.sidebar.header("Market Data")
+max_book_age_ms = st.sidebar.number_input("Max Book Age (ms)", min_value=0, max_value=60000, value=1000, step=250)
+depth_bucket_bps = st.sidebar.select_slider("Depth Chart Bucket (bps)", [1, 2, 5, 10, 25], value=5)
+
+# Slippage Curve Settings
+st.sidebar.header("Slippage Curve")
+curve_scale = st.sidebar.radio("Size Grid", ["log", "linear"], horizontal=True)
+curve_points = st.sidebar.number_input("Curve Points", min_value=10, max_value=5000, value=500, step=50)
+
+# Sliced Execution Settings
+st.sidebar.header("Sliced Execution (TWAP)")
+twap_enabled = st.sidebar.checkbox("Simulate Execution Risk", value=False)
+twap_slices = st.sidebar.number_input("Slices", min_value=1, max_value=500, value=12, step=1)
+twap_horizon_hours = st.sidebar.number_input("Horizon (Hours)", min_value=0.0, max_value=72.0, value=2.0, step=0.5)
+twap_paths = st.sidebar.select_slider("Monte Carlo Paths", [1000, 5000, 20000, 50000], value=20000)
+
+# Diagnostics
+st.sidebar.header("Diagnostics")
+# The registry is shared by every session (and the Prometheus exporter): a session can switch
+# collection on for the process, but unticking only affects its own toggle, never the others'
+metrics_pinned = bool(os.environ.get('OTC_METRICS_PORT')) or os.environ.get('OTC_METRICS', '') not in ('', '0')
+collect_timings = st.sidebar.checkbox(
+    "Collect Stage Timings", value=metrics.enabled or metrics_pinned, key="collect_timings", disabled=metrics_pinned,
+    help="Always on: enabled by OTC_METRICS / OTC_METRICS_PORT." if metrics_pinned else
+    "Turns on latency collection for this server process (stays on for other sessions)."
+)
+if collect_timings and not metrics.enabled:
+    metrics.enabled = True
+
+# First paint: the sidebar is complete and the user can start interacting
+first_paint = time.perf_counter() - _SCRIPT_START
+startup = get_startup_timings()
+if startup["first_paint_ms"] is None:
+    startup["first_paint_ms"] = first_paint * 1e3
+    metrics.observe('startup_imports', _IMPORTS_DONE - _SCRIPT_START)
+metrics.observe('first_paint', first_paint)
+
 # --- Analysis Logic ---
 
-def analyze_exchange(exchange_id, symbol, side, trade_size):
+def analyze_exchange(exchange_id, order_book, side, trade_size):
     """
     Helper function to run simulation for a single exchange.
     Returns a dict with results or error.
     """
     try:
-        client = get_exchange_client_v2(exchange_id)
-        # Fetch order book
-        order_book = client.fetch_order_book(symbol, limit=3000)
-        
-        if not order_book['asks'] or not order_book['bids']:
+        if isinstance(order_book, Exception):
+            metrics.incr('fetch_errors', exchange=exchange_id)
+            raise order_book
+
+        if order_book.empty:
             return {"exchange": exchange_id, "error": "No data"}
 
+        from backend.calculator import CostCalculator
+        from backend.simulation import OrderBookWalker
+
         # Run Simulation
         walker = OrderBookWalker()
         sim_result = walker.simulate_trade(order_book, side, trade_size)
@@ -75,12 +236,10 @@ def analyze_exchange(exchange_id, symbol, side, trade_size):
         # Calculate Costs
         calculator = CostCalculator(exchange_fee_rate=exchange_fee_percent)
         
-         # Get Mid Price
-        best_bid = order_book['bids'][0][0] if order_book['bids'] else 0
-        best_ask = order_book['asks'][0][0] if order_book['asks'] else 0
-        mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else 0
+        # Get Mid Price
+        mid_price = order_book.mid_price
 
-        drag_metrics = calculator.calculate_total_drag(sim_result['avg_price'], mid_price, side)
+        drag_metrics = calculator.calculate_total_drag(sim_result['avg_price'], mid_price, side, exchange=exchange_id)
         
         return {
             "exchange": exchange_id,
@@ -89,7 +248,7 @@ def analyze_exchange(exchange_id, symbol, side, trade_size):
             "slippage_pct": drag_metrics['slippage_percent'],
             "filled": sim_result['filled'],
             "mid_price": mid_price,
-            "order_book": order_book, # Return for charting if needed (only for best usually)
+            "order_book": order_book, # Snapshot reference (arrays are shared, not copied) for charting
             "error": None
         }
     except Exception as e:
@@ -97,19 +256,30 @@ def analyze_exchange(exchange_id, symbol, side, trade_size):
 
 
 # --- Tabs ---
-tab_live, tab_hist = st.tabs(["Live Execution", "Historical Time-of-Day"])
+tab_live, tab_hist, tab_scan = st.tabs(["Live Execution", "Historical Time-of-Day", "Market Scanner"])
 
 with tab_live:
     # --- Analysis Logic ---
     if st.button("Analyze Execution", type="primary"):
         with st.spinner(f"Simulating Trade across {len(exchanges)} exchanges..."):
             
+            request_start = time.perf_counter()
+            import numpy as np
+            import pandas as pd
+            import plotly.graph_objects as go
+            from backend.calculator import CostCalculator
+            from backend.depth import depth_profiles, liquidity_at_budget
+            from backend.router import SmartOrderRouter
+            from backend.simulation import size_grid, slippage_curve
+            
+            # Concurrent fetch on the shared event loop, then simulate in-process
+            with metrics.span('fetch_books'):
+                books, book_depths = fetch_books_for_trade(exchanges, symbol, trade_size,
+                                                           max_age=max_book_age_ms / 1000.0)
             results = []
-            # Parallel Execution
-            with concurrent.futures.ThreadPoolExecutor(max_workers=len(exchanges)) as executor:
-                future_to_exchange = {executor.submit(analyze_exchange, exc, symbol, side, trade_size): exc for exc in exchanges}
-                for future in concurrent.futures.as_completed(future_to_exchange):
-                    results.append(future.result())
+            for exc, book in books.items():
+                with metrics.span('analyze', exchange=exc):
+                    results.append(analyze_exchange(exc, book, side, trade_size))
             
             # Process Results
             valid_results = [r for r in results if r['error'] is None]
@@ -193,117 +363,333 @@ with tab_live:
             # Comparison Table
             st.divider()
             st.subheader("Exchange Comparison")
-            comp_data = []
-            for r in valid_results:
-                comp_data.append({
-                    "Exchange": r['exchange'].upper(),
-                    "Effective Price": f"${r['effective_price']:,.2f}",
-                    "Slippage %": f"{r['slippage_pct']*100:.4f}%",
-                    "Total Drag %": f"{r['total_drag_pct']*100:.4f}%"
-                })
-            st.dataframe(pd.DataFrame(comp_data))
-
-            # --- Visualizations (For Best Exchange) ---
+            with metrics.span('dataframe', table='comparison'):
+                comp_data = []
+                for r in valid_results:
+                    comp_data.append({
+                        "Exchange": r['exchange'].upper(),
+                        "Effective Price": f"${r['effective_price']:,.2f}",
+                        "Slippage %": f"{r['slippage_pct']*100:.4f}%",
+                        "Total Drag %": f"{r['total_drag_pct']*100:.4f}%",
+                        "Levels Fetched": book_depths[r['exchange']],
+                        "Filled": "Yes" if r['filled'] else "No (book exhausted)"
+                    })
+                comp_df = pd.DataFrame(comp_data)
+            st.dataframe(comp_df)
+
+            # Inverse query: largest size per venue before total drag exceeds each budget
+            st.subheader("Liquidity at Drag Budget")
+            budget_table = liquidity_at_budget(
+                {r['exchange']: r['order_book'] for r in valid_results}, side, np.array(DRAG_BUDGETS_BPS) / 10000.0,
+                calculator=CostCalculator(exchange_fee_rate=exchange_fee_percent)
+            )
+            st.dataframe(pd.DataFrame(
+                [
+                    {"Exchange": exc.upper(), **{
+                        f"≤ {bps} bps": f"${budget_table.notional_usd[i, j]:,.0f}{'+' if budget_table.exhausted[i, j] else ''}"
+                        for j, bps in enumerate(DRAG_BUDGETS_BPS)
+                    }}
+                    for i, exc in enumerate(budget_table.exchanges)
+                ]
+            ))
+            st.caption("Max notional whose slippage vs mid plus exchange fee stays within each budget ('+': whole fetched book fits).")
+
+            # Monte Carlo cost of slicing the order on the best venue instead of sweeping it now
+            if twap_enabled:
+                st.subheader(f"Sliced Execution Risk ({best_res['exchange'].upper()}, {twap_slices} slices over {twap_horizon_hours:g}h)")
+                from backend.execution_risk import ExecutionRiskSimulator, SliceSchedule, hourly_volatility
+                with metrics.span('execution_risk'):
+                    candles = get_exchange_client_v2(best_res['exchange']).fetch_historical_volatility(symbol, '1h', days=30)
+                    if candles.empty:
+                        st.warning("No candle history for this venue; execution risk needs hourly volatility.")
+                    else:
+                        simulator = ExecutionRiskSimulator(CostCalculator(exchange_fee_rate=exchange_fee_percent),
+                                                           otc_spread_bps=otc_bps, paths=twap_paths)
+                        risk = simulator.run(best_res['order_book'], side, trade_size,
+                                             SliceSchedule.twap(twap_slices, twap_horizon_hours), hourly_volatility(candles))
+                if not candles.empty:
+                    stats = risk.summary()
+                    risk_cols = st.columns(4)
+                    risk_cols[0].metric("Median Drag (Sliced)", f"{stats['p50_percent']*100:.4f}%",
+                                        delta=f"{(stats['p50_percent'] - stats['instant_percent'])*100:.4f}% vs instant", delta_color="inverse")
+                    risk_cols[1].metric("95th Percentile Drag", f"{stats['p95_percent']*100:.4f}%")
+                    risk_cols[2].metric("P(Beats OTC)", f"{stats['prob_exchange_better']*100:.1f}%")
+                    risk_cols[3].metric("Expected Shortfall (95%)", f"${stats['expected_shortfall_95_usd']:,.0f}")
+                    fig_risk = go.Figure(go.Histogram(x=risk.total_percent[risk.filled] * 100, nbinsx=100, name="Sliced"))
+                    fig_risk.add_vline(x=otc_fee_percent * 100, line_dash="dash", line_color="red", annotation_text="OTC")
+                    if np.isfinite(stats['instant_percent']):
+                        fig_risk.add_vline(x=stats['instant_percent'] * 100, line_dash="dot", annotation_text="Instant")
+                    fig_risk.update_layout(title=f"Total Drag Distribution ({stats['paths']:,} paths, {stats['seconds']:.2f}s)",
+                                           xaxis_title="Total Drag vs Current Mid (%)", yaxis_title="Paths")
+                    with metrics.span('render', chart='execution_risk'):
+                        st.plotly_chart(fig_risk)
+                    st.caption("Mid paths use 30 days of hourly volatility by hour of day; liquidity taken by each slice "
+                               "refills with a 15-minute median half-life. Fill rate: "
+                               f"{stats['fill_rate']*100:.1f}% of paths.")
+
+            # Smart Order Routing (split across venues)
+            if len(valid_results) > 1:
+                st.subheader("Smart Order Routing (Split Execution)")
+                router = SmartOrderRouter(default_calculator=CostCalculator(exchange_fee_rate=exchange_fee_percent))
+                with metrics.span('route'):
+                    routed = router.route({r['exchange']: r['order_book'] for r in valid_results}, side, trade_size)
+                
+                route_col1, route_col2 = st.columns([2, 1])
+                with route_col1:
+                    st.dataframe(pd.DataFrame([
+                        {
+                            "Exchange": venue.upper(),
+                            "Allocation (USD)": f"${a['notional_usd']:,.2f}",
+                            "Share": f"{a['share']*100:.2f}%",
+                            "VWAP": f"${a['avg_price']:,.2f}",
+                            "Fees (USD)": f"${a['fee_usd']:,.2f}"
+                        }
+                        for venue, a in routed['allocations'].items()
+                    ]))
+                with route_col2:
+                    split_gain = (best_res['effective_price'] - routed['effective_price']) if side == 'Buy' else (routed['effective_price'] - best_res['effective_price'])
+                    st.metric("Blended Effective Price", f"${routed['effective_price']:,.2f}", delta=f"${split_gain:,.2f} vs best single venue")
+                    st.metric("Total Drag (Split)", f"{routed['total_percent']*100:.4f}%")
+
+            # --- Visualizations ---
             
             st.divider()
             chart_col1, chart_col2 = st.columns(2)
             
-            order_book = best_res['order_book']
-            mid_price = best_res['mid_price']
-            
             with chart_col1:
-                st.subheader(f"Liquidity Depth ({best_res['exchange'].upper()})")
-                
-                bids_data = [x[:2] for x in order_book['bids']]
-                asks_data = [x[:2] for x in order_book['asks']]
-                bids = pd.DataFrame(bids_data, columns=['price', 'amount'])
-                asks = pd.DataFrame(asks_data, columns=['price', 'amount'])
-                
-                bids['total_val'] = bids['price'] * bids['amount']
-                asks['total_val'] = asks['price'] * asks['amount']
+                st.subheader("Liquidity Depth (All Venues)")
                 
-                bids['cumulative'] = bids['total_val'].cumsum()
-                asks['cumulative'] = asks['total_val'].cumsum()
+                # Cumulative USD binned around each venue's mid (cached per snapshot),
+                # so the chart ships a few hundred points instead of every level
+                profile = depth_profiles({r['exchange']: r['order_book'] for r in valid_results},
+                                         bucket_bps=depth_bucket_bps, range_bps=DEPTH_RANGE_BPS)
                 
                 fig_depth = go.Figure()
-                fig_depth.add_trace(go.Scatter(x=bids['price'], y=bids['cumulative'], fill='tozeroy', name='Bids (Buy Walls)', line_color='green'))
-                fig_depth.add_trace(go.Scatter(x=asks['price'], y=asks['cumulative'], fill='tozeroy', name='Asks (Sell Walls)', line_color='red'))
+                single = len(profile) == 1
+                for i, exc in enumerate(profile.exchanges):
+                    fill = 'tozeroy' if exc == best_res['exchange'] else None
+                    fig_depth.add_trace(go.Scatter(
+                        x=profile.bid_prices(i), y=profile.bids[i], fill=fill, legendgroup=exc,
+                        name='Bids (Buy Walls)' if single else f"{exc.upper()} Bids", line_color='green' if single else None
+                    ))
+                    fig_depth.add_trace(go.Scatter(
+                        x=profile.ask_prices(i), y=profile.asks[i], fill=fill, legendgroup=exc, line_dash='solid' if single else 'dot',
+                        name='Asks (Sell Walls)' if single else f"{exc.upper()} Asks", line_color='red' if single else None
+                    ))
                 
-                range_pct = 0.05
                 fig_depth.update_layout(
-                    xaxis_range=[mid_price * (1-range_pct), mid_price * (1+range_pct)],
-                    title="Order Book Depth (Cumulative USD)",
+                    title=f"Order Book Depth (Cumulative USD, {depth_bucket_bps} bps buckets)",
                     xaxis_title="Price",
                     yaxis_title="Volume (USD)"
                 )
-                st.plotly_chart(fig_depth)
+                with metrics.span('render', chart='depth'):
+                    st.plotly_chart(fig_depth)
 
             with chart_col2:
-                st.subheader(f"Slippage Curve ({best_res['exchange'].upper()})")
+                st.subheader("Slippage Curve (All Venues)")
                 
-                # Recalculate curve for best exchange
-                walker = OrderBookWalker()
-                sizes = [trade_size * 0.1, trade_size * 0.25, trade_size * 0.5, trade_size * 0.75, trade_size]
-                slippages = []
-                
-                for s in sizes:
-                     res = walker.simulate_trade(order_book, side, s)
-                     if side == 'Buy':
-                         slip = (res['avg_price'] - mid_price) / mid_price
-                     else:
-                         slip = (mid_price - res['avg_price']) / mid_price
-                     slippages.append(slip * 100)
+                # One vectorized pass per venue/side over a dense size grid
+                sizes = size_grid(trade_size, points=curve_points, scale=curve_scale)
                 
                 fig_slip = go.Figure()
-                fig_slip.add_trace(go.Scatter(x=sizes, y=slippages, mode='lines+markers', name='Slippage %'))
+                for r in valid_results:
+                    for curve_side, dash in (("buy", "solid"), ("sell", "dot")):
+                        curve = slippage_curve(r['order_book'], curve_side, sizes, reference_price=r['mid_price'], exchange=r['exchange'])
+                        mask = curve.filled
+                        fig_slip.add_trace(go.Scatter(
+                            x=curve.sizes[mask],
+                            y=curve.slippage_percent[mask] * 100,
+                            mode='lines',
+                            line_dash=dash,
+                            name=f"{r['exchange'].upper()} {curve_side.capitalize()}"
+                        ))
+                
                 fig_slip.update_layout(
                     title="Slippage Impact vs Trade Size",
                     xaxis_title="Trade Size (USD)",
-                    yaxis_title="Slippage (%)"
+                    yaxis_title="Slippage vs Mid (%)",
+                    xaxis_type='log' if curve_scale == 'log' else 'linear'
                 )
-                st.plotly_chart(fig_slip)
+                with metrics.span('render', chart='slippage_curve'):
+                    st.plotly_chart(fig_slip)
+            
+            metrics.observe('request', time.perf_counter() - request_start)
+            if os.environ.get('OTC_METRICS_FILE'):
+                metrics.write_prometheus(os.environ['OTC_METRICS_FILE'])
     else:
         st.info("👈 Set parameters and click 'Analyze Execution' to start.")
 
+    with st.expander("Order Book Cache"):
+        st.json(get_book_cache().stats())
+
+    with st.expander("Performance (Stage Timings)"):
+        st.markdown("**Startup**")
+        startup_rows = [
+            {"Timing": "Script imports (cold start)", "ms": round(startup["import_ms"], 1), "Budget ms": IMPORT_BUDGET_MS},
+            {"Timing": "First paint (cold start)", "ms": round(startup["first_paint_ms"], 1), "Budget ms": FIRST_PAINT_BUDGET_MS},
+            {"Timing": "First paint (this run)", "ms": round(first_paint * 1e3, 1), "Budget ms": FIRST_PAINT_BUDGET_MS}
+        ]
+        # Markdown rather than st.table, which would pull in pandas on every page load
+        st.markdown("| Timing | ms | Budget ms |\n|---|---:|---:|\n" + "\n".join(
+            f"| {row['Timing']} | {row['ms']:,.1f} | {row['Budget ms']} |" for row in startup_rows
+        ))
+        for row in startup_rows:
+            if row["ms"] > row["Budget ms"]:
+                st.warning(f"{row['Timing']} took {row['ms']:,.0f} ms (budget {row['Budget ms']} ms).")
+        if warmup is None:
+            st.caption("Background warm-up disabled (OTC_WARMUP=0).")
+        elif not warmup["done"].is_set():
+            st.caption("Background warm-up still running...")
+        elif warmup["error"]:
+            st.caption(f"Background warm-up failed after {warmup['seconds']:.2f}s: {warmup['error']}")
+        else:
+            st.caption(f"Background warm-up (imports, clients, first books) finished in {warmup['seconds']:.2f}s.")
+
+        if not metrics.enabled:
+            st.caption("Enable 'Collect Stage Timings' in the sidebar to record per-stage latency.")
+        elif not collect_timings:
+            st.caption("Stage timings are being collected for this server by another session or the metrics exporter.")
+        perf = metrics.snapshot()
+        if perf['stages'] or perf['counters']:
+            import pandas as pd
+        if perf['stages']:
+            st.dataframe(pd.DataFrame(perf['stages']).round(3))
+        if perf['counters']:
+            st.dataframe(pd.DataFrame(perf['counters']))
+        # Only once a client exists; importing the scheduler here would pull ccxt into first paint
+        scheduler_module = sys.modules.get('backend.scheduler')
+        schedulers = scheduler_module.all_schedulers() if scheduler_module is not None else []
+        if schedulers:
+            st.markdown("**API Scheduler**")
+            scheduler_rows = []
+            for state in (scheduler.describe() for scheduler in schedulers):
+                tokens = "unlimited" if state["rate"] is None else f"{state['tokens']:.1f}"
+                queued = "/".join(str(state["queue_depth"][p]) for p in ("live", "markets", "history"))
+                scheduler_rows.append(f"| {state['exchange']} | {tokens} | {queued} | {state['granted']} | "
+                                      f"{state['retries']} | {state['throttled']} | {state['dropped']} |")
+            st.markdown("| Venue | Tokens | Queued (live/markets/history) | Granted | Retries | Throttled | Dropped |\n"
+                        "|---|---:|---|---:|---:|---:|---:|\n" + "\n".join(scheduler_rows))
+        prometheus_text = metrics.to_prometheus()
+        st.download_button("Download Prometheus Metrics", prometheus_text, file_name="otc_metrics.prom", mime="text/plain")
+        if st.button("Reset Timings"):
+            metrics.reset()
+
 with tab_hist:
     st.header("Historical Time-of-Day Analysis")
-    st.markdown("Analyze the last 30 days of price action to find the hour of day with the lowest volatility.")
+    st.markdown("Analyze recent price action across all selected venues to find the hours with the lowest volatility.")
+    
+    hist_col1, hist_col2, hist_col3 = st.columns(3)
+    hist_symbols = hist_col1.multiselect("Symbols", SYMBOLS, default=[symbol])
+    hist_timeframe = hist_col2.selectbox("Candle Timeframe", ["1h", "15m", "5m", "1m"])
+    hist_days = hist_col3.selectbox("Lookback (Days)", [30, 90, 365])
     
     if st.button("Analyze Best Trading Times"):
-        with st.spinner("Fetching Historical Data..."):
-            # Default to first exchange logic for simplicity or selection
-            # Let's use the first selected exchange
-            if not exchanges:
-                 st.error("Please select at least one exchange in the sidebar.")
-            else:
-                target_exchange = exchanges[0]
-                client = get_exchange_client_v2(target_exchange)
-                
-                df_hist = client.fetch_historical_volatility(symbol)
-                
-                if df_hist.empty:
-                    st.error(f"Could not fetch historical data for {symbol} from {target_exchange}.")
-                else:
-                    # Group by Hour
-                    hourly_vol = df_hist.groupby('hour')['volatility_pct'].mean().reset_index()
-                    hourly_vol['volatility_pct'] = hourly_vol['volatility_pct'] * 100 # Convert to %
-                    
-                    # Highlight Best
-                    best_hour = hourly_vol.loc[hourly_vol['volatility_pct'].idxmin()]
-                    
-                    st.success(f"🕒 **Best Time to Trade:** {int(best_hour['hour'])}:00 UTC (Avg Volatility: {best_hour['volatility_pct']:.4f}%)")
-                    
-                    # Bar Chart
-                    fig_hist = go.Figure(data=[
-                        go.Bar(x=hourly_vol['hour'], y=hourly_vol['volatility_pct'], marker_color='indianred')
-                    ])
-                    # Highlight best bar
-                    fig_hist.data[0].marker.color = ['green' if h == best_hour['hour'] else 'indianred' for h in hourly_vol['hour']]
-
-                    fig_hist.update_layout(
-                        title="Average Hourly Volatility (UTC) - Last 30 Days",
-                        xaxis_title="Hour (UTC)",
-                        yaxis_title="Avg Volatility (%)",
-                         xaxis=dict(tickmode='linear', tick0=0, dtick=1)
-                    )
-                    st.plotly_chart(fig_hist)
+        if not exchanges or not hist_symbols:
+            st.error("Please select at least one exchange in the sidebar and one symbol.")
+        else:
+            with st.spinner("Fetching Historical Data..."):
+                from backend.historical import analyze_time_of_day
+                # Served from the local candle store; only new candles hit the network
+                clients = {exc: get_exchange_client_v2(exc) for exc in exchanges}
+                with metrics.span('time_of_day'):
+                    st.session_state['tod_matrix'] = analyze_time_of_day(clients, hist_symbols, [hist_timeframe], days=hist_days)
+                st.session_state['tod_params'] = (hist_timeframe, hist_days)
+    
+    matrix = st.session_state.get('tod_matrix')
+    if matrix is not None:
+        if matrix.empty:
+            st.error("Could not fetch historical data for the selected venues/symbols.")
+        else:
+            import plotly.graph_objects as go
+            from backend.historical import best_hours, heatmap
+
+            tod_timeframe, tod_days = st.session_state['tod_params']
+            
+            # Best hour per venue/symbol
+            best = best_hours(matrix)
+            for row in best.itertuples():
+                st.success(f"🕒 **{row.exchange.upper()} {row.symbol}:** best time to trade {int(row.hour)}:00 UTC (Avg Volatility: {row.volatility_pct * 100:.4f}%)")
+            
+            # Average hourly volatility, one bar series per venue/symbol
+            hourly_vol = matrix.groupby(['exchange', 'symbol', 'hour'], observed=True)['volatility_pct'].mean().reset_index()
+            fig_hist = go.Figure()
+            for (exc, sym), grp in hourly_vol.groupby(['exchange', 'symbol'], observed=True):
+                fig_hist.add_trace(go.Bar(x=grp['hour'], y=grp['volatility_pct'] * 100, name=f"{exc.upper()} {sym}"))
+            
+            fig_hist.update_layout(
+                title=f"Average Hourly Volatility (UTC) - Last {tod_days} Days ({tod_timeframe} candles)",
+                xaxis_title="Hour (UTC)",
+                yaxis_title="Avg Volatility (%)",
+                barmode='group',
+                xaxis=dict(tickmode='linear', tick0=0, dtick=1)
+            )
+            st.plotly_chart(fig_hist)
+            
+            # Hour-of-day x day-of-week heatmap for one series
+            series_keys = [(row.exchange, row.symbol) for row in best.itertuples()]
+            heat_col1, heat_col2 = st.columns(2)
+            heat_series = heat_col1.selectbox("Heatmap Series", series_keys, format_func=lambda k: f"{k[0].upper()} {k[1]}")
+            heat_value = heat_col2.radio("Metric", ["volatility_pct", "volume_usd"], horizontal=True)
+            
+            grid = heatmap(matrix, heat_series[0], heat_series[1], tod_timeframe, value=heat_value)
+            fig_heat = go.Figure(data=go.Heatmap(
+                z=grid.to_numpy() * (100 if heat_value == 'volatility_pct' else 1),
+                x=list(grid.columns),
+                y=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+                colorscale='RdYlGn_r' if heat_value == 'volatility_pct' else 'Blues'
+            ))
+            fig_heat.update_layout(
+                title=f"{heat_series[0].upper()} {heat_series[1]} - {'Avg Volatility (%)' if heat_value == 'volatility_pct' else 'Avg Volume per Candle (USD)'}",
+                xaxis_title="Hour (UTC)",
+                xaxis=dict(tickmode='linear', tick0=0, dtick=1)
+            )
+            st.plotly_chart(fig_heat)
+
+with tab_scan:
+    st.header("Market-Wide Liquidity Scan")
+    st.markdown("Rank every market quoted on the selected venues by spread, resting depth near mid and the cost to trade.")
+
+    scan_col1, scan_col2, scan_col3 = st.columns(3)
+    scan_quote = scan_col1.selectbox("Quote Currency", ["USDT", "USD", "USDC", "BTC"])
+    scan_limit = scan_col2.number_input("Max Markets per Venue", min_value=1, max_value=5000, value=300, step=50)
+    scan_rank = scan_col3.selectbox("Rank By", ["Cost $1M (bps)", "Cost $100k (bps)", "Cost $5M (bps)", "Spread (bps)"])
+
+    if st.button("Scan Markets"):
+        if not exchanges:
+            st.error("Please select at least one exchange in the sidebar.")
+        else:
+            import pandas as pd
+            from backend.scanner import LiquidityScanner, stream_scan
+
+            with st.spinner("Loading markets..."):
+                scan_symbols = {exc: get_exchange_client_v2(exc).get_available_symbols(quote=scan_quote)[:int(scan_limit)]
+                                for exc in exchanges}
+            total = sum(len(v) for v in scan_symbols.values())
+            progress = st.progress(0.0, text=f"Scanning {total} markets...")
+            table = st.empty()
+            columns = {
+                "exchange": "Exchange", "symbol": "Symbol", "spread_bps": "Spread (bps)",
+                "depth_50bps_usd": "Depth ±50bps (USD)", "depth_100bps_usd": "Depth ±100bps (USD)",
+                "cost_100k_bps": "Cost $100k (bps)", "cost_1m_bps": "Cost $1M (bps)", "cost_5m_bps": "Cost $5M (bps)"
+            }
+
+            def render(rows):
+                frame = pd.DataFrame([r for r in rows if r['error'] is None], columns=list(columns)).rename(columns=columns)
+                table.dataframe(frame.sort_values(scan_rank, na_position='last').reset_index(drop=True))
+
+            # Rows arrive as each book is priced (the book itself is already discarded); redraw a few times a second
+            rows, errors, last_draw = [], 0, 0.0
+            scanner = LiquidityScanner([get_async_client(exc) for exc in scan_symbols])
+            with metrics.span('market_scan'):
+                for row in stream_scan(scanner, scan_symbols, get_event_loop()):
+                    rows.append(row)
+                    errors += row['error'] is not None
+                    if time.perf_counter() - last_draw > 0.5:
+                        last_draw = time.perf_counter()
+                        progress.progress(len(rows) / total, text=f"Scanned {len(rows)}/{total} markets ({errors} failed)")
+                        render(rows)
+            progress.progress(1.0, text=f"Scanned {len(rows)} markets ({errors} failed)")
+            render(rows)
+            st.session_state['scan_symbols'] = sorted({r['symbol'] for r in rows if r['error'] is None})
+            st.caption("Cost: mean of buy and sell drag vs mid (slippage plus taker fee); blank when the fetched book "
+                       "cannot fill the size. Scanned markets are added to the sidebar's Trading Pair list.")
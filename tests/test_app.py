@@ -0,0 +1,91 @@
+import json
+import subprocess
+import sys
+import os
+
+APP = os.path.join(os.path.dirname(__file__), '..', 'src', 'frontend', 'app.py')
+
+
+def _run_app(script, tmp_path):
+    """Renders the app headless in a fresh interpreter (module state must start cold)."""
+    env = dict(os.environ, OTC_WARMUP='0', OTC_CACHE_DIR=str(tmp_path), OTC_METRICS='')
+    code = "import json, sys\nfrom streamlit.testing.v1 import AppTest\n" \
+           f"at = AppTest.from_file({os.path.abspath(APP)!r}, default_timeout=120).run()\n" + script
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class TestDashboardStartup:
+    def test_first_paint_skips_heavy_imports(self, tmp_path):
+        report = _run_app(
+            "print(json.dumps({'exceptions': [e.value for e in at.exception],"
+            " 'loaded': [m for m in ('pandas', 'ccxt', 'backend.exchange_client') if m in sys.modules],"
+            " 'timings': any('First paint' in m.value for m in at.markdown)}))",
+            tmp_path
+        )
+        assert report == {'exceptions': [], 'loaded': [], 'timings': True}
+
+    def test_analyze_with_simulated_exchange(self, tmp_path):
+        report = _run_app(
+            "at.sidebar.multiselect[0].set_value(['sim']).run()\n"
+            "at.button[0].click().run()\n"
+            "print(json.dumps({'exceptions': [e.value for e in at.exception],"
+            " 'winner': [s.value for s in at.subheader if 'Winner' in s.value]}))",
+            tmp_path
+        )
+        assert report['exceptions'] == []
+        assert report['winner'] == ['🏆 Winner: SIM']
+
+    def test_timings_toggle_never_disables_shared_metrics(self, tmp_path):
+        report = _run_app(
+            "registry = sys.modules['backend.metrics'].metrics\n"
+            "before = registry.enabled\n"
+            "at.sidebar.checkbox(key='collect_timings').check().run()\n"
+            "on = registry.enabled\n"
+            "at.sidebar.checkbox(key='collect_timings').uncheck().run()\n"
+            "print(json.dumps({'exceptions': [e.value for e in at.exception], 'before': before, 'on': on,"
+            " 'after': registry.enabled}))",
+            tmp_path
+        )
+        # Unticking in one session leaves collection on for every other session
+        assert report == {'exceptions': [], 'before': False, 'on': True, 'after': True}
+
+    def test_live_panels_match_a_full_depth_book(self, tmp_path):
+        # A small trade on a frozen simulated book: the depth chart and drag budgets read the book by
+        # price, so the adaptive fetch must still reach as far as they look
+        report = _run_app(
+            "import base64\n"
+            "import numpy as np\n"
+            "from backend.calculator import CostCalculator\n"
+            "from backend.depth import depth_profiles, liquidity_at_budget\n"
+            "from backend.orderbook import OrderBookSnapshot\n"
+            "from backend.sim_exchange import SimulatedMarket\n"
+            "SimulatedMarket.milliseconds = lambda self: 1700000000000\n"
+            "at.sidebar.multiselect[0].set_value(['sim']).run()\n"
+            "at.sidebar.number_input[0].set_value(50000.0).run()\n"
+            "at.button[0].click().run()\n"
+            "full = OrderBookSnapshot.from_ccxt(SimulatedMarket('sim').order_book('BTC/USDT', 5000, ts=1700000000000),"
+            " exchange='sim', symbol='BTC/USDT')\n"
+            "budgets = liquidity_at_budget({'sim': full}, 'buy', np.array([10, 25, 50, 100]) / 10000.0,"
+            " calculator=CostCalculator(exchange_fee_rate=0.001))\n"
+            "profile = depth_profiles({'sim': full}, bucket_bps=5, range_bps=500)\n"
+            "ys = lambda chart: [np.frombuffer(base64.b64decode(t['y']['bdata'])) if isinstance(t['y'], dict)"
+            " else np.asarray(t['y']) for t in json.loads(chart.proto.spec)['data']]\n"
+            "depth_chart, slippage_chart = at.get('plotly_chart')[:2]\n"
+            "tables = [df.value for df in at.dataframe]\n"
+            "print(json.dumps({'exceptions': [e.value for e in at.exception],"
+            " 'levels': int(tables[0]['Levels Fetched'][0]),"
+            " 'budgets': tables[1].iloc[0, 1:].tolist(),"
+            " 'expected_budgets': [f'${v:,.0f}' + ('+' if x else '') for v, x in"
+            " zip(budgets.notional_usd[0], budgets.exhausted[0])],"
+            " 'depth_matches': all(np.array_equal(a, b) for a, b in zip(ys(depth_chart), [profile.bids[0], profile.asks[0]])),"
+            " 'curve_points': [len(y) for y in ys(slippage_chart)]}))",
+            tmp_path
+        )
+        assert report['exceptions'] == []
+        assert report['levels'] < 5000
+        assert report['budgets'] == report['expected_budgets']
+        assert not any(cell.endswith('+') for cell in report['budgets'])
+        assert report['depth_matches']
+        # Both sides of the slippage curve fill at every grid size
+        assert report['curve_points'] == [500, 500]
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.backtest import BacktestEngine, segmented_fill
+from backend.calculator import CostCalculator, FeeSchedule
+from backend.orderbook import OrderBookSnapshot
+from backend.recorder import SnapshotReader, SnapshotRecorder
+from backend.sim_exchange import SimulatedMarket
+from backend.simulation import BookSide
+
+T0 = 1_700_000_000_000
+MINUTE = 60000
+
+
+def _record(root, minutes=30, venues=('sim-a', 'sim-b'), symbols=('BTC/USDT', 'ETH/USDT'), depth=40):
+    with SnapshotRecorder(root) as recorder:
+        markets = {venue: SimulatedMarket(venue) for venue in venues}
+        for i in range(minutes):
+            for venue in venues:
+                for symbol in symbols:
+                    raw = markets[venue].order_book(symbol, limit=depth, ts=T0 + i * 20 * MINUTE)
+                    recorder.append(OrderBookSnapshot.from_ccxt(raw, exchange=venue, symbol=symbol))
+
+
+class TestSegmentedFill:
+    def test_matches_book_side_fill(self):
+        rng = np.random.default_rng(3)
+        lengths = np.array([5, 0, 12, 1, 30])
+        prices = np.concatenate([100 + np.cumsum(rng.uniform(0.01, 0.1, n)) for n in lengths])
+        sizes = rng.lognormal(0, 1, lengths.sum())
+        amounts = np.array([0.0, 50.0, 400.0, 3000.0, 1e9])
+
+        qty, spent, unfilled = segmented_fill(prices, sizes, lengths, amounts)
+        starts = np.cumsum(lengths) - lengths
+        for b, (s, n) in enumerate(zip(starts, lengths)):
+            expected = BookSide(prices[s:s + n], sizes[s:s + n]).fill(amounts)
+            np.testing.assert_allclose(qty[b], expected[0], rtol=1e-9, atol=1e-12)
+            np.testing.assert_allclose(spent[b], expected[1], rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(unfilled[b], expected[2], rtol=1e-9, atol=1e-6)
+
+
+class TestBacktestEngine:
+    def test_matches_per_snapshot_pricing(self, tmp_path):
+        root = str(tmp_path)
+        _record(root, minutes=5)
+        sizes = [1e4, 2e5, 1e8]
+        calc = CostCalculator(exchange_fee_rate=0.002, fee_schedules={'sim-a': FeeSchedule([0, 1e6], taker=[0.001, 0.0004])}, volume_usd=2e6)
+        result = BacktestEngine(root, calculator=calc, otc_spread_bps=30, max_workers=1).run(sizes)
+
+        reader = SnapshotReader(root)
+        assert len(result) == len(reader) * 2 * len(sizes)
+        df = result.frame
+        for row in range(len(reader)):
+            snapshot = reader[row]
+            for side in ('buy', 'sell'):
+                res = snapshot.compile().simulate_many(side, sizes)
+                got = df[(df['timestamp'] == snapshot.timestamp) & (df['exchange'] == snapshot.exchange)
+                         & (df['symbol'] == snapshot.symbol) & (df['side'] == side)]
+                np.testing.assert_allclose(got['avg_price'], res['avg_price'], rtol=1e-10)
+                assert got['filled'].tolist() == res['filled'].tolist()
+                for k, size in enumerate(sizes):
+                    if not res['filled'][k]:
+                        assert got['recommendation'].iloc[k] == 'OTC'
+                        continue
+                    drag = calc.calculate_total_drag(res['avg_price'][k], snapshot, side)
+                    assert got['total_drag_pct'].iloc[k] == pytest.approx(drag['total_percent'], rel=1e-9)
+                    expected = calc.compare_otc(drag['total_percent'], 0.003)['recommendation']
+                    assert got['recommendation'].iloc[k] == expected
+                    assert got['net_advantage_usd'].iloc[k] == pytest.approx((0.003 - drag['total_percent']) * size, rel=1e-9)
+
+    def test_process_pool_and_hourly_stats(self, tmp_path):
+        root = str(tmp_path)
+        _record(root, minutes=72)  # 24 hours at 20-minute spacing
+        engine = BacktestEngine(root, max_workers=2, chunk_snapshots=50, batch_snapshots=16)
+        sizes = [5e4, 5e5]
+        pooled = engine.run(sizes, exchanges=['sim-a'], symbols=['BTC/USDT'])
+        inline = BacktestEngine(root, max_workers=1).run(sizes, exchanges=['sim-a'], symbols=['BTC/USDT'])
+        assert len(pooled) == 72 * 2 * 2
+        np.testing.assert_allclose(pooled.frame['total_drag_pct'], inline.frame['total_drag_pct'], rtol=1e-9)
+
+        by_hour = pooled.drag_by_hour()
+        assert list(by_hour.columns) == ['p50', 'p95', 'mean', 'fill_rate', 'exchange_rate', 'snapshots']
+        assert len(by_hour) == 2 * 2 * 24
+        assert (by_hour['p95'] >= by_hour['p50']).all()
+        assert (by_hour['snapshots'] == 3).all()
+
+        series = pooled.time_series('sim-a', 'BTC/USDT', 'buy', 5e4)
+        assert len(series) == 72 and series.index.is_monotonic_increasing
+
+        window = engine.run(sizes, sides=['sell'], start=T0, end=T0 + 60 * MINUTE)
+        assert len(window) == 3 * 4 * 2
+
+    def test_validation_and_empty_selection(self, tmp_path):
+        root = str(tmp_path)
+        _record(root, minutes=1)
+        engine = BacktestEngine(root)
+        with pytest.raises(ValueError):
+            engine.run([1e4], sides=['hold'])
+        assert len(engine.run([1e4], exchanges=['missing'])) == 0
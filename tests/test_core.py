@@ -1,12 +1,21 @@
+import csv
+import io
 import pytest
+import numpy as np
+import pandas as pd
 import sys
 import os
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
-from backend.simulation import OrderBookWalker
-from backend.calculator import CostCalculator
+from backend.simulation import OrderBookWalker, size_grid, slippage_curve
+from backend.calculator import CostCalculator, FeeSchedule
+from backend.orderbook import OrderBookSnapshot
+from backend.router import SmartOrderRouter
+from backend.batch import BatchPricer, ResultWriter, SnapshotDirectory, read_trades
+from backend.depth import depth_profiles, liquidity_at_budget
+from backend.historical import best_hours, heatmap, stack_series, time_of_day_matrix
 
 class TestSimulation:
     def test_simple_buy(self):
@@ -67,3 +76,383 @@ class TestCalculator:
         # Should recommend OTC
         res = calc.compare_otc(0.015, 0.010)
         assert res['recommendation'] == 'OTC'
+
+    def test_tiered_fee_schedule(self):
+        schedule = FeeSchedule([0, 1e6, 5e7], taker=[0.001, 0.0008, 0.0005], maker=[0.0008, 0.0006, 0.0])
+        np.testing.assert_allclose(schedule.rates([0, 999999, 1e6, 2e8]), [0.001, 0.001, 0.0008, 0.0005])
+        np.testing.assert_allclose(schedule.rates([1e6, 1e8], maker=True), [0.0006, 0.0])
+        with pytest.raises(ValueError):
+            FeeSchedule([0, 0], taker=[0.001, 0.001])
+
+        calc = CostCalculator(0.002, fee_schedules={'a': schedule}, volume_usd=2e6)
+        assert calc.fee_rate('a') == 0.0008 and calc.fee_rate('b') == 0.002
+        np.testing.assert_allclose(
+            calc.fee_rates(['a', 'b', 'a'], volume_usd=[0, 0, 1e8], maker=[False, True, True]),
+            [0.001, 0.002, 0.0]
+        )
+
+    def test_vectorized_matches_scalar(self):
+        rng = np.random.default_rng(1)
+        n = 200
+        mids = rng.uniform(50, 150, n)
+        avgs = mids * (1 + rng.normal(0, 0.01, n))
+        sides = rng.choice(['buy', 'sell', 'Buy'], n)
+        venues = rng.choice(['a', 'b'], n)
+        otc = rng.uniform(0, 0.02, n)
+        notionals = rng.uniform(1e3, 1e7, n)
+        calc = CostCalculator(0.001, fee_schedules={'a': FeeSchedule([0, 1e6], taker=[0.002, 0.0004])}, volume_usd=5e6)
+
+        drag = calc.calculate_total_drag_many(avgs, mids, sides, exchanges=venues, notionals_usd=notionals)
+        cmp = calc.compare_otc_many(drag['total_percent'], otc, notionals_usd=notionals)
+        for i in range(n):
+            expected = calc.calculate_total_drag(avgs[i], mids[i], sides[i], exchange=venues[i])
+            assert drag['total_percent'][i] == pytest.approx(expected['total_percent'], rel=1e-12)
+            assert drag['fee_percent'][i] == expected['fee_percent']
+            scalar = calc.compare_otc(expected['total_percent'], otc[i])
+            assert cmp['recommendation'][i] == scalar['recommendation']
+            assert cmp['net_advantage_usd'][i] == pytest.approx((otc[i] - expected['total_percent']) * notionals[i], rel=1e-9)
+        np.testing.assert_allclose(drag['cost_usd'], drag['total_percent'] * notionals)
+
+        # Unfilled rows and zero mids
+        cmp = calc.compare_otc_many([0.001, np.nan], 0.01, filled=[False, True])
+        assert cmp['recommendation'].tolist() == ['OTC', 'OTC']
+        assert calc.calculate_total_drag_many([1.0], [0.0], 'sell')['total_percent'][0] == 0.0
+        with pytest.raises(ValueError):
+            calc.calculate_total_drag_many([1.0], [1.0], 'hold')
+
+
+class TestCompiledBook:
+    def _random_book(self, levels=200, seed=7):
+        rng = np.random.default_rng(seed)
+        asks = 100.0 + np.cumsum(rng.uniform(0.01, 0.5, levels))
+        bids = 100.0 - np.cumsum(rng.uniform(0.01, 0.5, levels))
+        return {
+            'asks': [[p, q] for p, q in zip(asks, rng.uniform(0.1, 5.0, levels))],
+            'bids': [[p, q] for p, q in zip(bids, rng.uniform(0.1, 5.0, levels))]
+        }
+
+    def test_matches_level_walk(self):
+        book = self._random_book()
+        walker = OrderBookWalker()
+        compiled = walker.compile(book)
+
+        for side in ('buy', 'sell'):
+            for size in (0.0, 50.0, 100.0, 12345.6, 50000.0, 1e9):
+                expected = walker.simulate_trade(book, side, size)
+                res = walker.simulate_trade(compiled, side, size)
+                assert res['filled'] == expected['filled']
+                assert abs(res['total_asset_acquired'] - expected['total_asset_acquired']) < 1e-9
+                assert abs(res['avg_price'] - expected['avg_price']) < 1e-9
+                assert abs(res['slippage_percent'] - expected['slippage_percent']) < 1e-12
+
+    def test_simulate_many(self):
+        book = self._random_book()
+        walker = OrderBookWalker()
+        sizes = np.linspace(1000.0, 80000.0, 500)
+
+        res = walker.simulate_many(book, 'buy', sizes)
+        assert res['avg_price'].shape == sizes.shape
+
+        for i in (0, 250, 499):
+            single = walker.simulate_trade(book, 'buy', sizes[i])
+            assert abs(res['avg_price'][i] - single['avg_price']) < 1e-9
+            assert bool(res['filled'][i]) == single['filled']
+
+    def test_empty_side(self):
+        compiled = OrderBookWalker.compile({'asks': [], 'bids': [[99.0, 1.0]]})
+        res = compiled.simulate_trade('buy', 100.0)
+        assert res['filled'] is False
+        assert res['avg_price'] == 0.0
+
+    def test_depth_profile_matches_brute_force(self):
+        book = self._random_book(levels=400)
+        compiled = OrderBookWalker.compile(book)
+        bids, asks = compiled.depth_profile(bucket_bps=10, range_bps=300)
+        assert len(bids) == len(asks) == 31
+        mid = compiled.mid_price
+        for k, offset in enumerate(np.arange(31) * 10.0):
+            expected_bids = sum(p * q for p, q in book['bids'] if p >= mid * (1 - offset / 10000.0))
+            expected_asks = sum(p * q for p, q in book['asks'] if p <= mid * (1 + offset / 10000.0))
+            assert bids[k] == pytest.approx(expected_bids, rel=1e-12, abs=1e-9)
+            assert asks[k] == pytest.approx(expected_asks, rel=1e-12, abs=1e-9)
+        # Cached on the compiled book
+        assert compiled.depth_profile(bucket_bps=10, range_bps=300)[0] is bids
+
+    def test_multi_venue_depth_profiles(self):
+        snapshots = {
+            venue: OrderBookSnapshot.from_ccxt(self._random_book(seed=seed), exchange=venue)
+            for venue, seed in (('a', 1), ('b', 2))
+        }
+        profile = depth_profiles(snapshots, bucket_bps=5, range_bps=100)
+        assert profile.exchanges == ['a', 'b'] and profile.bids.shape == (2, 21)
+        np.testing.assert_array_equal(profile.asks[1], snapshots['b'].compile().depth_profile(5, 100)[1])
+        assert profile.ask_prices(0)[-1] == pytest.approx(profile.mids[0] * 1.01)
+        np.testing.assert_allclose(profile.bucket_notional('asks').sum(axis=1), profile.asks[:, -1])
+        assert np.all(np.diff(profile.bids, axis=1) >= 0)
+
+        empty = depth_profiles({'x': {'bids': [], 'asks': [[101.0, 1.0]]}}, bucket_bps=5, range_bps=50)
+        assert empty.mids[0] == 0.0 and not empty.asks.any()
+
+    def test_max_size_within_inverts_fill(self):
+        book = self._random_book(levels=300)
+        compiled = OrderBookWalker.compile(book)
+        calc = CostCalculator(0.001)
+        budgets = np.array([0.0005, 0.002, 0.01, 0.05, 0.2, 5.0])
+        for side in ('buy', 'sell'):
+            res = compiled.max_size_within(side, budgets, fee_rate=0.001)
+            assert res['notional_usd'][0] == 0.0  # Budget below the fee plus half spread
+            assert np.all(np.diff(res['notional_usd']) >= 0)
+            assert res['exhausted'][-1] and not res['exhausted'][1]
+            for budget, notional, qty in zip(budgets, res['notional_usd'], res['quantity']):
+                if notional == 0 or notional >= compiled.side_for(side).total_notional:
+                    continue
+                fill = compiled.simulate_many(side, [notional, notional * 1.001])
+                assert fill['total_asset_acquired'][0] == pytest.approx(qty, rel=1e-9)
+                drag = [calc.calculate_total_drag(p, compiled.mid_price, side)['total_percent'] for p in fill['avg_price']]
+                assert drag[0] == pytest.approx(budget, abs=1e-12)
+                assert drag[1] > budget
+
+    def test_liquidity_at_budget_table(self):
+        books = {venue: self._random_book(levels=3000, seed=seed) for seed, venue in enumerate(('a', 'b', 'c', 'd'))}
+        calc = CostCalculator(0.001, fee_schedules={'b': FeeSchedule.flat(0.0)})
+        table = liquidity_at_budget(books, 'Buy', np.linspace(0.001, 0.05, 50), calculator=calc)
+        assert table.notional_usd.shape == (4, 50) and table.side == 'buy'
+        single = OrderBookWalker.compile(books['b']).max_size_within('buy', table.budgets, fee_rate=0.0)
+        np.testing.assert_array_equal(table.notional_usd[1], single['notional_usd'])
+        slippage_only = liquidity_at_budget(books, 'buy', [0.01], include_fees=False)
+        assert slippage_only.notional_usd[0, 0] > liquidity_at_budget(books, 'buy', [0.01]).notional_usd[0, 0]
+        with pytest.raises(ValueError):
+            liquidity_at_budget(books, 'hold', [0.01])
+
+
+class TestSlippageCurve:
+    def test_curve_matches_walker(self):
+        book = TestCompiledBook()._random_book(levels=300, seed=11)
+        walker = OrderBookWalker()
+        sizes = size_grid(100000.0, points=400, scale='log')
+        mid = (book['bids'][0][0] + book['asks'][0][0]) / 2
+
+        curve = slippage_curve(book, 'sell', sizes, reference_price=mid, exchange='test')
+        assert len(curve) == 400
+        assert np.all(np.diff(curve.slippage_percent[curve.filled]) >= -1e-12)
+
+        batch = walker.simulate_many(book, 'sell', sizes)
+        assert np.allclose(curve.avg_price, batch['avg_price'])
+        assert np.array_equal(curve.filled, batch['filled'])
+
+    def test_unsorted_sizes_and_level_boundaries(self):
+        book = {'asks': [[100.0, 1.0], [101.0, 1.0]], 'bids': []}
+        curve = slippage_curve(book, 'buy', [201.0, 100.0, 150.0])
+        assert list(curve.sizes) == [100.0, 150.0, 201.0]
+        assert curve.avg_price[0] == 100.0
+        assert bool(curve.filled[2])
+
+    def test_grid_scale(self):
+        assert np.allclose(size_grid(1000.0, points=3, scale='linear', min_size=0.0), [10.0, 505.0, 1000.0])
+        with pytest.raises(ValueError):
+            size_grid(1000.0, scale='cubic')
+
+
+class TestOrderBookSnapshot:
+    def test_from_ccxt(self):
+        raw = {
+            'symbol': 'BTC/USDT',
+            'timestamp': 1700000000000,
+            'nonce': 42,
+            'bids': [[99.0, 2.0, 3], [98.0, 1.0, 1]],
+            'asks': [[101.0, 1.0, 2], [102.0, 4.0, 5]]
+        }
+        snap = OrderBookSnapshot.from_ccxt(raw, exchange='binance')
+
+        assert snap.symbol == 'BTC/USDT' and snap.nonce == 42
+        assert snap.bid_prices.dtype == np.float64 and snap.bid_prices.flags['C_CONTIGUOUS']
+        assert snap.mid_price == 100.0
+        assert abs(snap.spread - 0.02) < 1e-12
+        assert snap.nbytes == 8 * 8
+        assert snap.to_ccxt()['asks'] == [[101.0, 1.0], [102.0, 4.0]]
+        with pytest.raises(AttributeError):
+            snap.extra = 1
+
+    def test_walker_and_calculator_accept_snapshot(self):
+        book = TestCompiledBook()._random_book()
+        snap = OrderBookSnapshot.from_ccxt(book)
+        walker = OrderBookWalker()
+
+        expected = walker.simulate_trade(book, 'buy', 25000.0)
+        res = walker.simulate_trade(snap, 'buy', 25000.0)
+        assert abs(res['avg_price'] - expected['avg_price']) < 1e-9
+
+        # Compiled form is cached and shares the snapshot's arrays
+        assert walker.compile(snap) is walker.compile(snap)
+        assert np.shares_memory(walker.compile(snap).asks.prices, snap.ask_prices)
+
+        calc = CostCalculator(exchange_fee_rate=0.001)
+        drag = calc.calculate_total_drag(res['avg_price'], snap, 'buy')
+        assert drag == calc.calculate_total_drag(res['avg_price'], snap.mid_price, 'buy')
+
+
+def _volatility_frame(start_ms, hours, seed):
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.arange(hours, dtype=np.int64) * 3600 * 1000
+    close = 100.0 + rng.normal(0, 1, hours).cumsum()
+    return pd.DataFrame({
+        'timestamp': ts,
+        'close': close,
+        'volume': rng.uniform(1, 10, hours),
+        'volatility_pct': rng.uniform(0.001, 0.02, hours)
+    })
+
+
+class TestTimeOfDay:
+    def test_matrix_matches_per_series_groupby(self):
+        start = 1_699_833_600_000  # Monday 00:00 UTC
+        series = {
+            (exc, sym, '1h'): _volatility_frame(start, 24 * 21, seed)
+            for seed, (exc, sym) in enumerate([('binance', 'BTC/USDT'), ('kraken', 'BTC/USDT'), ('kraken', 'ETH/USDT')])
+        }
+        series[('coinbase', 'BTC/USDT', '1h')] = pd.DataFrame()  # failed fetch
+
+        matrix = time_of_day_matrix(stack_series(series))
+        assert len(matrix) == 3 * 7 * 24
+        assert matrix['candles'].eq(3).all()
+
+        df = series[('kraken', 'ETH/USDT', '1h')]
+        date = pd.to_datetime(df['timestamp'], unit='ms')
+        expected = df[(date.dt.dayofweek == 2) & (date.dt.hour == 5)]['volatility_pct'].mean()
+        assert abs(matrix.loc[('kraken', 'ETH/USDT', '1h', 2, 5), 'volatility_pct'] - expected) < 1e-15
+
+        grid = heatmap(matrix, 'binance', 'BTC/USDT', '1h')
+        assert grid.shape == (7, 24)
+        best = best_hours(matrix)
+        assert len(best) == 3
+
+    def test_process_pool_path(self):
+        series = {('sim', f'S{i}/USDT', '1h'): _volatility_frame(1_699_833_600_000, 48, i) for i in range(4)}
+        pooled = stack_series(series, max_workers=2, process_threshold=2)
+        inline = stack_series(series)
+        pd.testing.assert_frame_equal(pooled, inline)
+
+
+class TestSmartOrderRouter:
+    def _books(self):
+        return {
+            'a': TestCompiledBook()._random_book(levels=150, seed=21),
+            'b': TestCompiledBook()._random_book(levels=150, seed=22),
+            'c': TestCompiledBook()._random_book(levels=150, seed=23),
+        }
+
+    def test_split_beats_single_venue(self):
+        books = self._books()
+        router = SmartOrderRouter({'a': CostCalculator(0.001), 'b': CostCalculator(0.0005)}, CostCalculator(0.002))
+        res = router.route(books, 'buy', 30000.0)
+
+        assert res['filled']
+        assert len(res['allocations']) > 1
+        assert abs(sum(a['notional_usd'] for a in res['allocations'].values()) - 30000.0) < 1e-6
+
+        walker = OrderBookWalker()
+        for venue, book in books.items():
+            single = walker.simulate_trade(book, 'buy', 30000.0)
+            single_effective = single['avg_price'] * (1 + router.fee_rate(venue))
+            assert res['effective_price'] <= single_effective + 1e-9
+
+    def test_matches_brute_force_merge(self):
+        books = self._books()
+        router = SmartOrderRouter({'a': CostCalculator(0.001), 'b': CostCalculator(0.0005), 'c': CostCalculator(0.003)})
+        sizes = np.linspace(1000.0, 60000.0, 50)
+
+        for side in ('buy', 'sell'):
+            levels = []
+            for venue, book in books.items():
+                fee = router.fee_rate(venue)
+                key = 'asks' if side == 'buy' else 'bids'
+                for price, qty in book[key]:
+                    eff = price * (1 + fee) if side == 'buy' else -price * (1 - fee)
+                    levels.append((eff, price, qty, venue))
+            levels.sort(key=lambda x: x[0])
+
+            batch = router.route_many(books, side, sizes)
+            for j in (0, 25, 49):
+                remaining, alloc = sizes[j], {}
+                for _, price, qty, venue in levels:
+                    take = min(remaining, price * qty)
+                    alloc[venue] = alloc.get(venue, 0.0) + take
+                    remaining -= take
+                    if remaining <= 0:
+                        break
+                for v, venue in enumerate(batch['venues']):
+                    assert abs(batch['allocation_usd'][v, j] - alloc.get(venue, 0.0)) < 1e-6
+
+            single = router.route(books, side, sizes[25])
+            assert abs(single['effective_price'] - batch['effective_price'][25]) < 1e-9
+
+    def test_exhausted_books(self):
+        books = {'a': {'asks': [[100.0, 1.0]], 'bids': []}, 'b': {'asks': [[101.0, 1.0]], 'bids': []}}
+        res = SmartOrderRouter().route(books, 'buy', 1000.0)
+        assert not res['filled']
+        assert abs(res['total_asset_acquired'] - 2.0) < 1e-12
+
+
+class TestBatchPricer:
+    def test_offline_blotter(self, tmp_path):
+        snapshots = SnapshotDirectory(str(tmp_path / 'books'))
+        for i, venue in enumerate(['binance', 'kraken']):
+            book = TestCompiledBook()._random_book(levels=200, seed=30 + i)
+            snapshots.save(OrderBookSnapshot.from_ccxt(book, exchange=venue, symbol='BTC/USDT'))
+
+        trades = tmp_path / 'trades.csv'
+        trades.write_text("symbol,side,size_usd,otc_bps,desk\n"
+                          "BTC/USDT,buy,5000,50,emea\n"
+                          "BTC/USDT,sell,20000,5,emea\n"
+                          "ETH/USDT,buy,1000,50,apac\n"
+                          "BTC/USDT,buy,1e9,50,apac\n"
+                          "BTC/USDT,bye,5000,50,apac\n"
+                          "BTC/USDT,sell,lots,50,us\n"
+                          ",sell,5000,50,us\n")
+
+        calls = []
+
+        def source(exchange_id, symbol):
+            calls.append((exchange_id, symbol))
+            return snapshots.load(exchange_id, symbol)
+
+        results = []
+        out = io.StringIO()
+        writer = ResultWriter(out, 'csv')
+        pricer = BatchPricer(['binance', 'kraken'], source, exchange_fee_rate=0.001)
+        stats = pricer.run(read_trades(str(trades), chunk_rows=2), lambda row: (results.append(row), writer(row)))
+
+        assert stats['rows'] == 7 and stats['books_fetched'] == 2 and stats['book_errors'] == 2
+        assert len(calls) == 4  # each (venue, symbol) fetched once across chunks
+
+        walker = OrderBookWalker()
+        expected = min(
+            walker.simulate_trade(snapshots.load(v, 'BTC/USDT'), 'buy', 5000.0)['avg_price'] * 1.001
+            for v in ('binance', 'kraken')
+        )
+        assert abs(results[0]['effective_price'] - expected) < 1e-9
+        assert results[0]['recommendation'] in ('EXCHANGE', 'OTC') and results[0]['filled'] is True
+        assert results[2]['best_exchange'] is None and 'No recorded snapshot' in results[2]['error']
+        assert results[3]['filled'] is False
+        # Typos are reported, not priced as the other side
+        assert results[4]['best_exchange'] is None and "unknown side 'bye'" in results[4]['error']
+        assert results[5]['recommendation'] is None and 'invalid size_usd' in results[5]['error']
+        assert results[6]['error'] == 'missing symbol'
+        assert pricer.price_chunk([{'side': 'buy', 'size_usd': 1000}])[0]['error'] == 'missing symbol'
+
+        # Extra input columns come through in the CSV output
+        written = list(csv.DictReader(io.StringIO(out.getvalue())))
+        assert [row['desk'] for row in written] == ['emea', 'emea', 'apac', 'apac', 'apac', 'us', 'us']
+        assert written[6]['error'] == 'missing symbol'
+
+    def test_unfilled_rows_fall_back_to_otc(self):
+        # $200 of asks: a cheap-looking partial fill must not be recommended over the OTC desk
+        book = OrderBookSnapshot.from_ccxt({'bids': [[99.99, 10.0]], 'asks': [[100.01, 2.0]]},
+                                           exchange='binance', symbol='BTC/USDT')
+        pricer = BatchPricer(['binance'], lambda exchange_id, symbol: book, exchange_fee_rate=0.001)
+        small, large = pricer.price_chunk([
+            {'symbol': 'BTC/USDT', 'side': 'buy', 'size_usd': '100', 'otc_bps': '50'},
+            {'symbol': 'BTC/USDT', 'side': 'buy', 'size_usd': '1000000', 'otc_bps': '50'}
+        ])
+        assert small['filled'] is True and small['recommendation'] == 'EXCHANGE'
+        assert large['filled'] is False and large['recommendation'] == 'OTC'
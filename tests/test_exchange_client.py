@@ -0,0 +1,440 @@
+import asyncio
+import ccxt
+import threading
+import time
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from backend.adaptive_depth import DepthPlanner, fetch_adaptive, snap_depth
+from backend.exchange_client import AsyncExchangeClient, ExchangeClient, fetch_order_books
+from backend.candle_store import CandleStore
+from backend.cache import ENTRY_OVERHEAD_BYTES, OrderBookCache
+from backend.orderbook import OrderBookSnapshot
+from backend.markets import MarketCache, market_summary
+from backend.sim_exchange import SimulatedExchange
+
+
+class FakeAsyncExchange:
+    """Minimal stand-in for a ccxt.async_support exchange."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.closed = False
+
+    async def fetch_order_book(self, symbol, limit=None):
+        self.calls.append((symbol, limit))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("exchange down")
+        return {
+            'symbol': symbol,
+            'timestamp': 1700000000000,
+            'nonce': None,
+            'bids': [[99.0, 1.0], [98.0, 2.0]],
+            'asks': [[101.0, 1.0], [102.0, 2.0]]
+        }
+
+    async def close(self):
+        self.closed = True
+
+
+class TestAsyncExchangeClient:
+    def test_fetch_order_book(self):
+        fake = FakeAsyncExchange()
+
+        async def run():
+            async with AsyncExchangeClient('kucoin', exchange=fake) as client:
+                return await client.fetch_order_book('BTC/USDT', limit=3000)
+
+        snap = asyncio.run(run())
+        assert snap.exchange == 'kucoin' and snap.mid_price == 100.0
+        assert fake.calls == [('BTC/USDT', 100)]  # KuCoin depth cap
+        assert fake.closed
+
+    def test_gather_with_timeouts_and_deadline(self):
+        clients = [
+            AsyncExchangeClient('fast', exchange=FakeAsyncExchange()),
+            AsyncExchangeClient('broken', exchange=FakeAsyncExchange(fail=True)),
+            AsyncExchangeClient('slow', exchange=FakeAsyncExchange(delay=5.0)),
+        ]
+
+        results = asyncio.run(fetch_order_books(clients, ['BTC/USDT', 'ETH/USDT'], timeout=10.0, deadline=0.2))
+
+        assert len(results) == 6
+        assert results[('fast', 'ETH/USDT')].symbol == 'ETH/USDT'
+        assert isinstance(results[('broken', 'BTC/USDT')], RuntimeError)
+        assert isinstance(results[('slow', 'BTC/USDT')], asyncio.TimeoutError)
+
+    def test_per_request_timeout(self):
+        client = AsyncExchangeClient('slow', exchange=FakeAsyncExchange(delay=5.0))
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(client.fetch_order_book('BTC/USDT', timeout=0.05))
+
+    def test_unknown_exchange(self):
+        with pytest.raises(ValueError):
+            AsyncExchangeClient('not_a_real_venue')
+
+
+def _snapshot(exchange, symbol, levels=10):
+    return OrderBookSnapshot(
+        np.linspace(99.0, 90.0, levels), np.ones(levels),
+        np.linspace(101.0, 110.0, levels), np.ones(levels),
+        exchange=exchange, symbol=symbol
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestOrderBookCache:
+    def test_ttl_and_stats(self):
+        calls = []
+        clock = FakeClock()
+
+        def fetch_many(keys):
+            calls.append(list(keys))
+            return {key: _snapshot(key[0], key[1]) for key in keys}
+
+        cache = OrderBookCache(fetch_many, max_age=0.5, clock=clock)
+        first = cache.get('binance', 'BTC/USDT', 100)
+        assert cache.get('binance', 'BTC/USDT', 100) is first
+
+        clock.now = 1.0
+        assert cache.get('binance', 'BTC/USDT', 100) is not first
+        # Looser per-call max age accepts the cached book
+        clock.now = 1.8
+        cache.get('binance', 'BTC/USDT', 100, max_age=5.0)
+
+        stats = cache.stats()
+        assert len(calls) == 2
+        assert stats['hits'] == 2 and stats['misses'] == 2 and stats['expired'] == 1
+        assert abs(stats['max_age_seen'] - 0.8) < 1e-9
+
+    def test_lru_bounded_by_bytes(self):
+        entry_bytes = _snapshot('x', 'y').nbytes + ENTRY_OVERHEAD_BYTES
+        cache = OrderBookCache(lambda keys: {k: _snapshot(k[0], k[1]) for k in keys}, max_age=60, max_bytes=2 * entry_bytes)
+
+        cache.get('a', 'BTC/USDT', 100)
+        cache.get('b', 'BTC/USDT', 100)
+        cache.get('a', 'BTC/USDT', 100)  # touch 'a' so 'b' is least recent
+        cache.get('c', 'BTC/USDT', 100)
+
+        stats = cache.stats()
+        assert stats['entries'] == 2 and stats['evictions'] == 1
+        assert stats['bytes'] <= 2 * entry_bytes
+        cache.get('a', 'BTC/USDT', 100)
+        assert cache.stats()['hits'] == 2
+
+    def test_single_flight(self):
+        calls = []
+        release = threading.Event()
+
+        def fetch_many(keys):
+            calls.append(list(keys))
+            release.wait(5)
+            return {key: _snapshot(key[0], key[1]) for key in keys}
+
+        cache = OrderBookCache(fetch_many, max_age=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('binance', 'BTC/USDT', 100))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert len(results) == 8 and all(r is results[0] for r in results)
+
+    def test_errors_are_not_cached(self):
+        attempts = []
+
+        def fetch_many(keys):
+            attempts.append(keys)
+            return {key: RuntimeError("rate limited") for key in keys}
+
+        cache = OrderBookCache(fetch_many, max_age=60)
+        with pytest.raises(RuntimeError):
+            cache.get('binance', 'BTC/USDT', 100)
+        results = cache.get_many([('binance', 'BTC/USDT', 100)])
+        assert isinstance(results[('binance', 'BTC/USDT', 100)], RuntimeError)
+        assert len(attempts) == 2 and cache.stats()['errors'] == 2
+
+
+HOUR_MS = 60 * 60 * 1000
+
+
+class FakeOHLCVExchange:
+    """Sync exchange serving a deterministic hourly candle series from `listed` up to `now`."""
+
+    has = {'fetchOHLCV': True}
+
+    def __init__(self, now, listed=0, ignore_since=False):
+        self.now = now
+        self.listed = listed
+        self.ignore_since = ignore_since
+        self.calls = []
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append(since)
+        if self.ignore_since:
+            # Always the latest page
+            since = self.now - (limit - 1) * HOUR_MS
+        start = max(-(-since // HOUR_MS) * HOUR_MS, self.listed)
+        rows = []
+        for ts in range(start, self.now + 1, HOUR_MS)[:limit]:
+            price = 100.0 + (ts // HOUR_MS) % 24
+            rows.append([ts, price, price * 1.01, price * 0.99, price, 10.0])
+        return rows
+
+
+class TestCandleStore:
+    def test_pages_and_fetches_incrementally(self, tmp_path):
+        now = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+        fake = FakeOHLCVExchange(now)
+        store = CandleStore(str(tmp_path), page_limit=100, refresh_interval=0.0)
+
+        since = now - 30 * 24 * HOUR_MS
+        candles = store.sync(fake, 'fake', 'BTC/USDT', '1h', since, until=now)
+        assert len(candles) == 30 * 24
+        assert len(fake.calls) == 8  # 720 candles in pages of 100
+        assert np.all(np.diff(candles[:, 0]) == HOUR_MS)
+
+        # Two hours later only the tail is requested
+        fake.calls.clear()
+        fake.now = now + 2 * HOUR_MS
+        candles = store.sync(fake, 'fake', 'BTC/USDT', '1h', since, until=fake.now)
+        assert fake.calls == [now - HOUR_MS]
+        assert candles[-1, 0] == now + HOUR_MS
+
+        # A longer window only backfills the missing head
+        fake.calls.clear()
+        store.sync(fake, 'fake', 'BTC/USDT', '1h', since - 24 * HOUR_MS, until=fake.now - 5 * HOUR_MS)
+        assert fake.calls == [since - 24 * HOUR_MS]
+        assert store.keys() == [('fake', 'BTC-USDT', '1h')]
+
+    def test_repeat_syncs_remember_the_venues_first_candle(self, tmp_path):
+        now = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+        since = now - 30 * 24 * HOUR_MS
+        store = CandleStore(str(tmp_path), page_limit=100)
+        venues = {
+            'listed-late': FakeOHLCVExchange(now, listed=now - 10 * 24 * HOUR_MS),  # Market younger than the window
+            'no-since': FakeOHLCVExchange(now, ignore_since=True),                   # Only ever serves the latest page
+        }
+        for name, fake in venues.items():
+            store.sync(fake, name, 'BTC/USDT', '1h', since, until=now)
+            first = store.load(name, 'BTC/USDT', '1h')[0, 0]
+            assert store.earliest(name, 'BTC/USDT', '1h') == first
+
+            fake.calls.clear()
+            for _ in range(2):
+                candles = store.sync(fake, name, 'BTC/USDT', '1h', since, until=now)
+            assert fake.calls == [] and candles[0, 0] == first
+
+        # A window inside what is stored never consults the marker
+        assert len(store.sync(venues['no-since'], 'no-since', 'BTC/USDT', '1h', now - 5 * HOUR_MS, until=now)) == 5
+
+    def test_client_serves_volatility_from_disk(self, tmp_path):
+        now = 1_700_000_000_000 // HOUR_MS * HOUR_MS
+        fake = FakeOHLCVExchange(now)
+        client = ExchangeClient('binance', candle_store=CandleStore(str(tmp_path)))
+        client.exchange = fake
+
+        df = client.fetch_historical_volatility('BTC/USDT', timeframe='1h', days=90)
+        assert len(df) == 90 * 24
+        assert list(df.columns) == ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'date', 'hour', 'volatility_pct']
+        assert abs(df['volatility_pct'].iloc[0] - 0.02) < 1e-12
+
+        # Within refresh_interval a repeat query needs no network
+        fake.calls.clear()
+        assert len(client.fetch_historical_volatility('BTC/USDT', timeframe='1h', days=90)) == 90 * 24
+        assert fake.calls == []
+
+
+class TestSimulatedExchange:
+    def test_client_selects_simulator(self):
+        client = ExchangeClient('sim')
+        assert isinstance(client.exchange, SimulatedExchange)
+        assert client.get_available_symbols() == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+        book = client.fetch_order_book('BTC/USDT', limit=50)
+        assert len(book.bid_prices) == 50 and len(book.ask_prices) == 50
+        assert book.best_bid < book.best_ask
+        assert np.all(np.diff(book.ask_prices) > 0) and np.all(np.diff(book.bid_prices) < 0)
+
+        df = client.fetch_historical_volatility('ETH/USDT', timeframe='1h', days=10)
+        assert len(df) == 240
+        assert (df['high'] >= df[['open', 'close']].max(axis=1)).all()
+        assert (df['low'] <= df[['open', 'close']].min(axis=1)).all()
+
+    def test_seeded_and_deterministic(self):
+        a = SimulatedExchange({'seed': 7})
+        b = SimulatedExchange({'seed': 7})
+        ts = 1_700_000_000_000
+        assert a.sim.order_book('BTC/USDT', 20, ts=ts) == b.sim.order_book('BTC/USDT', 20, ts=ts)
+        assert a.sim.order_book('BTC/USDT', 20, ts=ts) != SimulatedExchange({'seed': 8}).sim.order_book('BTC/USDT', 20, ts=ts)
+
+        # Overlapping candle requests agree
+        first = a.sim.ohlcv('BTC/USDT', '1h', since=ts, limit=10)
+        second = a.sim.ohlcv('BTC/USDT', '1h', since=ts + 5 * HOUR_MS, limit=5)
+        assert first[5:] == second
+
+    def test_errors_and_rate_limit(self):
+        with pytest.raises(ccxt.BadSymbol):
+            SimulatedExchange().fetch_order_book('DOGE/USDT')
+
+        flaky = SimulatedExchange({'error_rate': 1.0})
+        with pytest.raises(ccxt.NetworkError):
+            flaky.fetch_order_book('BTC/USDT')
+
+        limited = SimulatedExchange({'rate_limit': 1, 'burst': 3})
+        for _ in range(3):
+            limited.fetch_order_book('BTC/USDT')
+        with pytest.raises(ccxt.RateLimitExceeded):
+            limited.fetch_order_book('BTC/USDT')
+        assert limited.sim.stats == {"requests": 4, "errors": 0, "rate_limited": 1}
+
+    def test_async_fan_out_with_latency(self):
+        async def run():
+            clients = [AsyncExchangeClient(f"sim-{i}", config={'latency': 0.05}) for i in range(3)]
+            start = time.perf_counter()
+            results = await fetch_order_books(clients, ['BTC/USDT', 'ETH/USDT'], limit=20)
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+        assert len(results) == 6
+        assert all(isinstance(r, OrderBookSnapshot) for r in results.values())
+        # Venues are independent and requests overlap
+        assert results[('sim-0', 'BTC/USDT')].best_bid != results[('sim-1', 'BTC/USDT')].best_bid
+        assert elapsed < 0.25
+
+
+class TestMarketCache:
+    def test_lazy_client_and_cross_process_reuse(self, tmp_path):
+        cache = MarketCache(str(tmp_path))
+        client = ExchangeClient('sim', market_cache=cache)
+        assert client._exchange is None  # Nothing built until first use
+
+        assert client.get_available_symbols() == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+        assert client.exchange.sim.stats["requests"] == 1
+        assert cache.is_fresh(cache.load('sim'))
+
+        # A new process restores markets from disk without downloading them
+        other = ExchangeClient('sim', market_cache=MarketCache(str(tmp_path)))
+        assert other.get_available_symbols() == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+        assert other.exchange.sim.stats["requests"] == 0
+
+        summary = market_summary(cache.load('sim')['markets'])
+        assert summary['BTC/USDT']['quote'] == 'USDT'
+        assert summary['BTC/USDT']['max_depth'] == 5000
+
+        with pytest.raises(ValueError):
+            ExchangeClient('not-a-venue')
+
+    def test_stale_entry_served_while_refreshing(self, tmp_path):
+        now = [1_000_000.0]
+        cache = MarketCache(str(tmp_path), ttl=60, clock=lambda: now[0])
+        cache.save('sim', {'OLD/USDT': {'symbol': 'OLD/USDT'}})
+        now[0] += 120
+
+        client = ExchangeClient('sim', market_cache=cache)
+        assert client.get_available_symbols() == ['OLD/USDT']
+
+        deadline = time.monotonic() + 5
+        while cache._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert cache.is_fresh(cache.load('sim'))
+        assert client.get_available_symbols() == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+    def test_refresh_lock(self, tmp_path):
+        cache = MarketCache(str(tmp_path), lock_timeout=60)
+        loader = lambda: ({'A/B': {'symbol': 'A/B'}}, None)
+        lock_path = cache.path('sim') + '.lock'
+
+        open(lock_path, 'w').close()
+        assert cache.refresh('sim', loader) is None  # Another process is refreshing
+
+        os.utime(lock_path, (time.time() - 120, time.time() - 120))
+        entry = cache.refresh('sim', loader)  # Abandoned lock is broken
+        assert entry['markets'] == {'A/B': {'symbol': 'A/B'}}
+        assert not os.path.exists(lock_path)
+
+    def test_async_client_restores_cached_markets(self, tmp_path):
+        cache = MarketCache(str(tmp_path))
+        ExchangeClient('sim', market_cache=cache).get_available_symbols()
+
+        async def run():
+            client = AsyncExchangeClient('sim', market_cache=cache)
+            book = await client.fetch_order_book('ETH/USDT', limit=10)
+            return client, book
+
+        client, book = asyncio.run(run())
+        assert len(book.ask_prices) == 10
+        assert list(client.exchange.markets) == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+
+class TestAdaptiveDepth:
+    def test_venue_depth_table(self):
+        assert [snap_depth('kucoin', n) for n in (5, 20, 21, 3000)] == [20, 20, 100, 100]
+        assert snap_depth('binance', 8000) == 5000 and snap_depth('kraken', 3000) == 500
+        assert snap_depth('somevenue', 1234) == 1234
+        assert snap_depth('sim', 9000) == 5000 and snap_depth('sim', 9000, {'max_depth': 800}) == 800
+
+    def test_fetches_just_enough_and_deepens_when_exhausted(self):
+        client = ExchangeClient('sim-adaptive', config={'book_refresh_ms': 10 ** 9})  # Books hold still
+        requests = []
+
+        def fetch_many(depths):
+            requests.append(dict(depths))
+            return {exc: client.fetch_order_book('BTC/USDT', limit=depth) for exc, depth in depths.items()}
+
+        full = client.fetch_order_book('BTC/USDT', limit=5000).compile()
+        planner = DepthPlanner()
+
+        # A small trade: one request, and far fewer levels once the book's density is known
+        books, depths = fetch_adaptive(fetch_many, ['sim-adaptive'], 'BTC/USDT', 'buy', 5e4, planner)
+        assert requests == [{'sim-adaptive': 100}]
+        books, depths = fetch_adaptive(fetch_many, ['sim-adaptive'], 'BTC/USDT', 'buy', 5e4, planner)
+        assert depths['sim-adaptive'] < 100
+        assert books['sim-adaptive'].compile().simulate_trade('buy', 5e4)['filled']
+
+        # A large trade exhausts the planned book and is refetched deeper, then matches the full book
+        planner = DepthPlanner(initial_depth=50)
+        requests.clear()
+        books, depths = fetch_adaptive(fetch_many, ['sim-adaptive'], 'BTC/USDT', 'sell', 2e8, planner)
+        assert len(requests) > 1 and depths['sim-adaptive'] < 5000
+        res = books['sim-adaptive'].compile().simulate_trade('sell', 2e8)
+        assert res['filled'] and res['avg_price'] == pytest.approx(full.simulate_trade('sell', 2e8)['avg_price'], rel=1e-12)
+
+        # More than the venue has: stops at its maximum depth, unfilled
+        books, depths = fetch_adaptive(fetch_many, ['sim-adaptive'], 'BTC/USDT', 'buy', 1e11, planner)
+        assert depths['sim-adaptive'] == 5000
+        assert not books['sim-adaptive'].compile().simulate_trade('buy', 1e11)['filled']
+
+        # Views that read the book by price: every level within 500 bps and the 100 bps budget, on both sides
+        books, depths = fetch_adaptive(fetch_many, ['sim-adaptive'], 'BTC/USDT', 'both', 5e4, DepthPlanner(),
+                                       range_bps=500, budget_bps=100)
+        book = books['sim-adaptive'].compile()
+        assert depths['sim-adaptive'] < 5000
+        for got, want in zip(book.depth_within([500]), full.depth_within([500])):
+            assert got[0] == want[0]
+        for side in ('buy', 'sell'):
+            fit = book.max_size_within(side, [0.01])
+            assert not fit['exhausted'][0] and fit['notional_usd'][0] == full.max_size_within(side, [0.01])['notional_usd'][0]
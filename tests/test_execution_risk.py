@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.exchange_client import ExchangeClient
+from backend.execution_risk import ExecutionRiskSimulator, SliceSchedule, hourly_volatility
+from backend.simulation import OrderBookWalker
+
+
+@pytest.fixture(scope='module')
+def book():
+    return ExchangeClient('sim', config={'latency': 0.0, 'jitter': 0.0}).fetch_order_book('BTC/USDT', limit=2000)
+
+
+class TestExecutionRiskSimulator:
+    def test_static_market_matches_one_sweep(self, book):
+        # No volatility, no refill and no depth noise: slicing walks the book exactly like one sweep
+        simulator = ExecutionRiskSimulator(paths=50, recovery_half_life_minutes=1e12, recovery_dispersion=0.0,
+                                           liquidity_noise=0.0)
+        for side in ('buy', 'sell'):
+            result = simulator.run(book, side, 3000000, SliceSchedule.twap(6, 3), 0.0, start_hour=0)
+            instant = OrderBookWalker().simulate_trade(book, side, 3000000)
+            assert result.filled.all()
+            np.testing.assert_allclose(result.avg_price, instant['avg_price'], rtol=1e-12)
+            assert result.summary()['p50_percent'] == pytest.approx(result.instant_percent, rel=1e-9)
+
+    def test_recovery_lowers_impact_and_volatility_widens_it(self, book):
+        schedule = SliceSchedule.twap(10, 5)
+        calm = ExecutionRiskSimulator(paths=2000, liquidity_noise=0.0).run(book, 'buy', 20000000, schedule, 0.0)
+        # Liquidity refills between slices, so a large order pays less than sweeping the book at once
+        assert calm.summary()['p95_percent'] < calm.instant_percent
+
+        volatile = ExecutionRiskSimulator(paths=2000).run(book, 'buy', 20000000, schedule, np.full(24, 0.01))
+        stats = volatile.summary()
+        assert stats['p5_percent'] < calm.summary()['p50_percent'] < stats['p95_percent']
+        assert stats['std_percent'] > 10 * calm.summary()['std_percent']
+        assert 0.0 < stats['prob_exchange_better'] < 1.0
+        assert stats['expected_shortfall_95_usd'] > 0
+        assert len(volatile.to_dict()['total_percent']) == 2000
+
+    def test_seeded_paths_do_not_depend_on_workers(self, book):
+        args = (book, 'sell', 5000000, SliceSchedule([1, 2, 1], [0.0, 0.5, 2.0]), 0.02)
+        serial = ExecutionRiskSimulator(paths=3000, seed=7, chunk_paths=1000).run(*args, start_hour=9)
+        pooled = ExecutionRiskSimulator(paths=3000, seed=7, chunk_paths=1000, max_workers=2).run(*args, start_hour=9)
+        np.testing.assert_array_equal(serial.total_percent, pooled.total_percent)
+        other = ExecutionRiskSimulator(paths=3000, seed=8, chunk_paths=1000).run(*args, start_hour=9)
+        assert not np.array_equal(serial.total_percent, other.total_percent)
+
+    def test_invalid_inputs(self, book):
+        with pytest.raises(ValueError):
+            SliceSchedule([0.5, 0.5], [1.0, 0.0])
+        with pytest.raises(ValueError):
+            ExecutionRiskSimulator().run(book, 'buy', 1000, SliceSchedule.twap(2, 1), [0.01] * 12)
+
+
+def test_hourly_volatility_by_hour_of_day():
+    # 15m candles: a calm hour 3 and a volatile hour 14, other hours missing
+    frame = pd.DataFrame({'hour': [3] * 8 + [14] * 8, 'volatility_pct': [0.001] * 8 + [0.004] * 8})
+    sigma = hourly_volatility(frame, timeframe='15m')
+    assert sigma.shape == (24,)
+    # Parkinson: sigma_15m = ln(1 + range) / sqrt(4 ln 2), scaled by sqrt(4) to an hour
+    assert sigma[3] == pytest.approx(np.log1p(0.001) / np.sqrt(4 * np.log(2)) * 2)
+    assert sigma[14] == pytest.approx(4 * sigma[3], rel=1e-2)
+    assert sigma[0] == pytest.approx(np.sqrt((sigma[3] ** 2 + sigma[14] ** 2) / 2))
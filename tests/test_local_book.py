@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from backend.local_book import (BookEvent, FakeDeltaFeed, LocalBookEngine, LocalOrderBook, ReplayFeed,
+                                SequenceGapError, write_events)
+from backend.orderbook import OrderBookSnapshot
+from backend.simulation import OrderBookWalker
+
+
+def assert_matches_truth(book, feed):
+    truth = OrderBookSnapshot.from_ccxt({'bids': feed.truth_snapshot().bids, 'asks': feed.truth_snapshot().asks})
+    snap = book.to_snapshot()
+    assert np.array_equal(snap.bid_prices, truth.bid_prices)
+    assert np.array_equal(snap.ask_sizes, truth.ask_sizes)
+
+    # Incrementally maintained prefix sums agree with a full recompute
+    compiled = book.compile()
+    assert np.allclose(compiled.asks.cum_notional, np.cumsum(truth.ask_prices * truth.ask_sizes))
+    assert np.allclose(compiled.bids.cum_qty, np.cumsum(truth.bid_sizes))
+
+
+class TestLocalOrderBook:
+    def test_deltas_and_gaps(self):
+        book = LocalOrderBook('fake', 'BTC/USDT')
+        book.apply_snapshot([[99.0, 1.0], [98.0, 1.0]], [[101.0, 1.0], [102.0, 1.0]], sequence=10)
+
+        assert book.apply_delta(11, bids=[[99.5, 2.0]], asks=[[101.0, 0.0]])
+        assert book.best_bid == 99.5 and book.best_ask == 102.0
+        assert not book.apply_delta(11, bids=[[99.5, 0.0]], asks=[])  # duplicate is ignored
+        assert book.best_bid == 99.5
+
+        with pytest.raises(SequenceGapError):
+            book.apply_delta(13, bids=[], asks=[])
+        assert not book.synced
+
+    def test_quote_matches_walker(self):
+        feed = FakeDeltaFeed(seed=3, levels=300, updates=200)
+        engine = LocalBookEngine(feed, 'fake', 'BTC/USDT')
+        engine.run()
+
+        walker = OrderBookWalker()
+        snap = engine.book.to_snapshot()
+        for side in ('buy', 'sell'):
+            expected = walker.simulate_trade(snap.to_ccxt(), side, 20000.0)
+            res = engine.quote(side, 20000.0)
+            assert abs(res['avg_price'] - expected['avg_price']) < 1e-9
+
+
+    def test_quotes_track_updates_without_a_rebuild(self):
+        # Small blocks so updates split and empty blocks, exercising the Fenwick rebuilds
+        feed = FakeDeltaFeed(seed=4, levels=400, updates=3000, batch=3)
+        engine = LocalBookEngine(feed, 'fake', 'BTC/USDT')
+        engine.book.bids.BLOCK_SIZE = engine.book.asks.BLOCK_SIZE = 4
+        walker = OrderBookWalker()
+        for event in feed:
+            engine.on_event(event)
+            if event.sequence % 100 == 0:
+                truth = feed.truth_snapshot()
+                book = {'bids': truth.bids, 'asks': truth.asks}
+                for side in ('buy', 'sell'):
+                    for size in (0.0, 50.0, 20000.0, 3e5, 1e7):
+                        expected = walker.simulate_trade(book, side, size)
+                        res = engine.quote(side, size)
+                        assert res['filled'] == expected['filled']
+                        assert res['avg_price'] == pytest.approx(expected['avg_price'], rel=1e-12)
+                        assert res['total_asset_acquired'] == pytest.approx(expected['total_asset_acquired'], rel=1e-9)
+        assert_matches_truth(engine.book, feed)
+
+    def test_empty_side(self):
+        book = LocalOrderBook()
+        book.apply_snapshot([], [], sequence=1)
+        assert book.quote('buy', 100.0) == {'total_asset_acquired': 0.0, 'avg_price': 0.0, 'filled': False}
+        book.apply_delta(2, bids=[[99.0, 0.0]], asks=[[101.0, 2.0]])
+        assert book.best_ask == 101.0 and book.best_bid == 0.0
+        assert book.quote('buy', 101.0)['filled']
+        book.apply_delta(3, bids=[], asks=[[101.0, 0.0]])
+        assert len(book.asks) == 0 and book.to_snapshot().ask_prices.tolist() == []
+
+
+class TestLocalBookEngine:
+    def test_tracks_feed(self):
+        feed = FakeDeltaFeed(seed=1, levels=200, updates=2000)
+        engine = LocalBookEngine(feed)
+        # Interleave quotes with updates so the incremental refresh path is exercised
+        for event in feed:
+            engine.on_event(event)
+            if event.sequence % 50 == 0:
+                engine.book.compile()
+
+        assert engine.stats['deltas'] == 2000 and engine.stats['gaps'] == 0
+        assert_matches_truth(engine.book, feed)
+
+    def test_gap_triggers_resync(self):
+        feed = FakeDeltaFeed(seed=2, levels=200, updates=2000, drop_rate=0.02)
+        engine = LocalBookEngine(feed)
+        engine.run()
+
+        assert engine.stats['gaps'] > 0
+        assert engine.stats['resyncs'] == engine.stats['gaps']
+        assert engine.book.sequence == feed.sequence
+        assert_matches_truth(engine.book, feed)
+
+    def test_replay_waits_for_snapshot_after_gap(self, tmp_path):
+        path = str(tmp_path / 'events.jsonl')
+        events = [
+            BookEvent.snapshot(1, [[99.0, 1.0]], [[101.0, 1.0]]),
+            BookEvent.delta(2, [[99.0, 2.0]], []),
+            BookEvent.delta(4, [[98.0, 1.0]], []),  # gap
+            BookEvent.delta(5, [[97.0, 1.0]], []),
+            BookEvent.snapshot(5, [[99.0, 3.0]], [[101.0, 1.0]]),
+            BookEvent.delta(6, [], [[100.5, 1.0]]),
+        ]
+        assert write_events(path, events) == 6
+
+        engine = LocalBookEngine(ReplayFeed(path))
+        book = engine.run()
+
+        assert engine.stats['gaps'] == 1 and engine.stats['dropped'] == 1
+        assert book.sequence == 6 and book.best_ask == 100.5
+        assert book.to_snapshot().bid_sizes.tolist() == [3.0]
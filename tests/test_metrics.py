@@ -0,0 +1,102 @@
+import urllib.request
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.exchange_client import ExchangeClient
+from backend.metrics import LatencyHistogram, MetricsRegistry, metrics
+from backend.simulation import OrderBookWalker
+
+
+@pytest.fixture
+def enabled_metrics():
+    previous = metrics.enabled
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = previous
+    metrics.reset()
+
+
+class TestLatencyHistogram:
+    def test_percentiles_within_bucket_precision(self):
+        values = np.random.default_rng(0).lognormal(-6, 1.5, 20000)
+        h = LatencyHistogram()
+        for v in values:
+            h.record(float(v))
+        assert h.count == 20000
+        assert h.mean == pytest.approx(values.mean())
+        for q in (0.5, 0.9, 0.99, 0.999):
+            exact = np.quantile(values, q)
+            assert exact <= h.percentile(q) <= exact * 1.07
+        assert h.percentile(1.0) == values.max()
+
+    def test_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(0.001)
+        b.record(0.1)
+        a.merge(b)
+        assert a.count == 2 and a.min == 0.001 and a.max == 0.1
+
+
+class TestMetricsRegistry:
+    def test_disabled_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        with registry.span('fetch', exchange='x'):
+            pass
+        registry.incr('cache_hits')
+        assert registry.snapshot() == {"stages": [], "counters": []}
+
+    def test_spans_counters_and_errors(self):
+        registry = MetricsRegistry(enabled=True)
+        for _ in range(3):
+            with registry.span('fetch', exchange='binance'):
+                pass
+        with pytest.raises(RuntimeError):
+            with registry.span('fetch', exchange='kraken'):
+                raise RuntimeError("boom")
+        registry.incr('levels_walked', 40)
+        registry.incr('levels_walked', 2)
+
+        assert registry.histogram('fetch', exchange='binance').count == 3
+        assert registry.counter('errors', exchange='kraken', stage='fetch') == 1
+        assert registry.counter('levels_walked') == 42
+
+        text = registry.to_prometheus()
+        assert '# TYPE otc_stage_seconds summary' in text
+        assert 'otc_stage_seconds_count{stage="fetch",exchange="binance"} 3' in text
+        assert 'otc_stage_seconds{stage="fetch",exchange="binance",quantile="0.99"}' in text
+        assert 'otc_levels_walked_total 42' in text
+        assert 'otc_errors_total{exchange="kraken",stage="fetch"} 1' in text
+
+    def test_file_and_http_export(self, tmp_path):
+        registry = MetricsRegistry(enabled=True)
+        registry.observe('request', 0.25)
+        path = registry.write_prometheus(str(tmp_path / 'metrics' / 'otc.prom'))
+        with open(path) as f:
+            assert 'otc_stage_seconds_sum{stage="request"} 0.25' in f.read()
+
+        port = registry.serve(0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                assert response.status == 200
+                assert b'otc_stage_seconds_count{stage="request"} 1' in response.read()
+        finally:
+            registry.shutdown()
+
+
+class TestPipelineInstrumentation:
+    def test_fetch_and_simulate_are_timed(self, enabled_metrics):
+        client = ExchangeClient('sim')
+        client.get_available_symbols()
+        book = client.fetch_order_book('BTC/USDT', limit=50)
+        OrderBookWalker().simulate_trade(book, 'buy', 1e5)
+
+        for stage in ('load_markets', 'fetch', 'parse'):
+            assert enabled_metrics.histogram(stage, exchange='sim').count == 1
+        assert enabled_metrics.histogram('simulate').count == 1
+        assert enabled_metrics.counter('levels_walked') >= 1
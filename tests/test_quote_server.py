@@ -0,0 +1,154 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.calculator import CostCalculator
+from backend.quote_server import HotBooks, QuoteServer
+
+SIM = {'latency': 0.0, 'jitter': 0.0}
+
+
+async def _get(reader, writer, path):
+    """One request on a keep-alive connection; returns (status, decoded JSON body)."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode()
+    status = int(head.split(' ')[1])
+    length = int(next(line.split(':')[1] for line in head.split('\r\n') if line.lower().startswith('content-length')))
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _run(scenario, **server_kwargs):
+    async def main():
+        books = HotBooks(depth=500, refresh_interval=0.05, config=SIM)
+        for venue in ('sim-a', 'sim-b'):
+            books.subscribe(venue, 'BTC/USDT')
+        server = QuoteServer(books, **server_kwargs)
+        port = await server.start(port=0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            return await scenario(server, lambda path: _get(reader, writer, path))
+        finally:
+            writer.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+class TestQuoteServer:
+    def test_quote_matches_direct_pricing(self):
+        calc = CostCalculator(0.0015)
+
+        async def scenario(server, get):
+            status, body = await get('/quote?symbol=BTC/USDT&side=buy&size=2500000')
+            assert status == 200
+            venues = {q['exchange'] for q in body['quotes']}
+            assert venues == {'sim-a', 'sim-b'} and body['best'] == body['quotes'][0]['exchange']
+            for q in body['quotes']:
+                book, _ = server.books.get(q['exchange'], 'BTC/USDT')
+                res = book.compile().simulate_trade('buy', 2.5e6)
+                drag = calc.calculate_total_drag(res['avg_price'], book, 'buy')
+                assert q['avg_price'] == pytest.approx(res['avg_price'], rel=1e-12)
+                assert q['total_drag_pct'] == pytest.approx(drag['total_percent'], rel=1e-9)
+            assert body['quotes'][0]['total_drag_pct'] <= body['quotes'][1]['total_drag_pct']
+
+            status, otc = await get('/otc?symbol=BTC/USDT&side=buy&size=2500000&otc_bps=50')
+            best = otc['quotes'][0]
+            assert otc['recommendation'] == ('EXCHANGE' if best['total_drag_pct'] < 0.005 else 'OTC')
+            assert otc['net_advantage_usd'] == pytest.approx((0.005 - best['total_drag_pct']) * 2.5e6, rel=1e-6)
+
+            status, curve = await get('/curve?exchange=sim-a&symbol=BTC/USDT&side=sell&max_size=1e7&points=50')
+            assert status == 200 and len(curve['size_usd']) == 50
+            assert np.all(np.diff(curve['slippage_percent']) >= 0)
+
+            status, table = await get('/liquidity?symbol=BTC/USDT&side=sell&budgets_bps=20,80&exchanges=sim-b')
+            assert status == 200 and table['exchanges'] == ['sim-b']
+            assert table['notional_usd'][0][0] < table['notional_usd'][0][1]
+
+        _run(scenario, calculator=calc)
+
+    def test_errors_and_on_demand_subscription(self):
+        async def scenario(server, get):
+            assert (await get('/quote?symbol=BTC/USDT&side=hold&size=1'))[0] == 400
+            assert (await get('/quote?symbol=BTC/USDT&side=buy'))[0] == 400
+            assert (await get('/nope'))[0] == 404
+            assert (await get('/quote?symbol=XRP/USDT&side=buy&size=1'))[0] == 404
+            status, body = await get('/quote?symbol=BTC/USDT&side=buy&size=1000&exchanges=nonexistent_venue')
+            assert status == 400 and 'nonexistent_venue' in body['error']
+
+            # Named venues and symbols are subscribed and kept warm from then on
+            status, body = await get('/quote?symbol=ETH/USDT&side=sell&size=1000&exchanges=sim-c')
+            assert status == 200 and body['quotes'][0]['exchange'] == 'sim-c'
+            assert ('sim-c', 'ETH/USDT') in server.books.subscribed()
+
+            status, health = await get('/health')
+            assert health['status'] == 'ok' and health['books'] == 3 and health['errors'] == 5
+
+        _run(scenario)
+
+    def test_unknown_symbols_and_idle_subscriptions_are_dropped(self):
+        async def scenario(server, get):
+            server.books.idle_ttl = 0.3
+            typos = [f'BTC/USDTT{i}' for i in range(5)]
+            for typo in typos:
+                status, body = await get(f'/quote?symbol={typo}&side=buy&size=1000&exchanges=sim-a')
+                assert status == 404 and 'BadSymbol' in body['error']
+            # Rejected at the first poll: no longer polled, and repeats are refused without subscribing
+            errors = server.books.stats['poll_errors']
+            assert not any(key[1] in typos for key in server.books.subscribed())
+            assert (await get(f'/quote?symbol={typos[0]}&side=buy&size=1000&exchanges=sim-a'))[0] == 404
+            await asyncio.sleep(0.3)
+            assert server.books.stats['poll_errors'] == errors and server.books.stats['rejected'] == 5
+
+            # On-demand subscriptions expire once unread; the ones made up front stay
+            assert (await get('/quote?symbol=ETH/USDT&side=buy&size=1000&exchanges=sim-a'))[0] == 200
+            await asyncio.sleep(0.6)
+            assert server.books.subscribed() == [('sim-a', 'BTC/USDT'), ('sim-b', 'BTC/USDT')]
+            assert server.books.stats['expired'] == 1
+            # Asking again subscribes again
+            assert (await get('/quote?symbol=ETH/USDT&side=buy&size=1000&exchanges=sim-a'))[0] == 200
+
+        _run(scenario)
+
+    def test_malformed_content_length(self):
+        async def main():
+            server = QuoteServer(HotBooks(config=SIM))
+            port = await server.start(port=0)
+            try:
+                for value in ('abc', '-5'):
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                    writer.write(f"GET /health HTTP/1.1\r\nContent-Length: {value}\r\n\r\n".encode())
+                    await writer.drain()
+                    assert (await reader.readuntil(b'\r\n\r\n')).startswith(b'HTTP/1.1 400')
+                    writer.close()
+                # The server keeps serving
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                assert (await _get(reader, writer, '/health'))[0] == 200
+                writer.close()
+            finally:
+                await server.close()
+
+        asyncio.run(main())
+
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / 'quotes.sock')
+
+        async def main():
+            books = HotBooks(refresh_interval=0.05, config=SIM)
+            books.subscribe('sim', 'ETH/USDT')
+            server = QuoteServer(books)
+            await server.start(unix_path=path)
+            reader, writer = await asyncio.open_unix_connection(path)
+            try:
+                return await _get(reader, writer, '/quote?symbol=ETH/USDT&side=buy&size=5000')
+            finally:
+                writer.close()
+                await server.close()
+
+        status, body = asyncio.run(main())
+        assert status == 200 and body['quotes'][0]['filled']
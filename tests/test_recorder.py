@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.orderbook import OrderBookSnapshot
+from backend.recorder import INDEX_DTYPE, INDEX_FILE, SnapshotReader, SnapshotRecorder
+from backend.sim_exchange import SimulatedMarket
+from backend.simulation import OrderBookWalker
+
+T0 = 1_700_000_000_000
+
+
+def _snapshots(count, venues=('sim-a', 'sim-b'), symbols=('BTC/USDT', 'ETH/USDT')):
+    markets = {venue: SimulatedMarket(venue) for venue in venues}
+    out = []
+    for i in range(count):
+        for venue in venues:
+            for symbol in symbols:
+                raw = markets[venue].order_book(symbol, limit=20 + i, ts=T0 + i * 60000)
+                out.append(OrderBookSnapshot.from_ccxt(raw, exchange=venue, symbol=symbol))
+    return out
+
+
+class TestSnapshotLog:
+    def test_round_trip_is_exact_and_zero_copy(self, tmp_path):
+        snapshots = _snapshots(5)
+        with SnapshotRecorder(str(tmp_path)) as recorder:
+            recorder.append_many(snapshots)
+
+        reader = SnapshotReader(str(tmp_path))
+        assert len(reader) == len(snapshots)
+        for original, row in zip(snapshots, range(len(reader))):
+            restored = reader[row]
+            assert (restored.exchange, restored.symbol, restored.timestamp, restored.nonce) == \
+                   (original.exchange, original.symbol, original.timestamp, original.nonce)
+            for name in ('bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes'):
+                assert np.array_equal(getattr(restored, name), getattr(original, name))
+            # Views into the mapped file, priced like the original
+            assert np.shares_memory(restored.ask_prices, reader._data)
+            assert OrderBookWalker().simulate_trade(restored, 'buy', 50000) == \
+                   OrderBookWalker().simulate_trade(original, 'buy', 50000)
+
+    def test_select_and_top_of_book(self, tmp_path):
+        snapshots = _snapshots(10)
+        with SnapshotRecorder(str(tmp_path)) as recorder:
+            recorder.append_many(snapshots)
+        reader = SnapshotReader(str(tmp_path))
+
+        rows = reader.select(exchange='sim-b', symbol='ETH/USDT', start=T0 + 2 * 60000, end=T0 + 5 * 60000)
+        assert len(rows) == 3
+        assert all(reader[r].exchange == 'sim-b' and reader[r].symbol == 'ETH/USDT' for r in rows)
+        assert len(reader.select(exchange='sim-a')) == 20
+        assert len(reader.select(exchange='missing')) == 0
+
+        top = reader.top_of_book(rows)
+        assert np.array_equal(top["best_bid"], [snapshots[r].best_bid for r in rows])
+        assert np.array_equal(top["best_ask"], [snapshots[r].best_ask for r in rows])
+
+    def test_appends_across_sessions_and_refresh(self, tmp_path):
+        first, second = _snapshots(2), _snapshots(3)[8:]
+        with SnapshotRecorder(str(tmp_path)) as recorder:
+            recorder.append_many(first)
+        reader = SnapshotReader(str(tmp_path))
+        assert len(reader) == len(first)
+
+        # A torn trailing index row (interrupted write) is dropped on reopen
+        with open(os.path.join(str(tmp_path), INDEX_FILE), 'ab') as f:
+            f.write(b'\x00' * (INDEX_DTYPE.itemsize // 2))
+        with SnapshotRecorder(str(tmp_path)) as recorder:
+            assert recorder.rows == len(first)
+            recorder.append_many(second)
+
+        assert reader.refresh() == len(first) + len(second)
+        assert reader[len(first)].ask_prices.tolist() == second[0].ask_prices.tolist()
+        assert len(reader.keys) == 4
+
+    def test_empty_sides_and_missing_log(self, tmp_path):
+        empty = OrderBookSnapshot(np.empty(0), np.empty(0), np.array([100.0]), np.array([1.0]), exchange='x', symbol='Y/Z')
+        with SnapshotRecorder(str(tmp_path / 'log')) as recorder:
+            recorder.append(empty)
+        reader = SnapshotReader(str(tmp_path / 'log'))
+        assert reader[0].empty and reader[0].nonce is None and reader[0].timestamp > 0
+        top = reader.top_of_book()
+        assert np.isnan(top["best_bid"][0]) and top["best_ask"][0] == 100.0
+
+        with pytest.raises(FileNotFoundError):
+            SnapshotReader(str(tmp_path / 'nowhere'))
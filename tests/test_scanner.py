@@ -0,0 +1,80 @@
+import asyncio
+import math
+import threading
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.calculator import CostCalculator
+from backend.exchange_client import AsyncExchangeClient, ExchangeClient
+from backend.orderbook import OrderBookSnapshot
+from backend.scanner import LiquidityScanner, rank_rows, size_label, stream_scan, summarize_book
+
+CONFIG = {'extra_symbols': 40, 'latency': 0.0, 'jitter': 0.0, 'rate_limit': 2000, 'burst': 50}
+
+
+class TestSummarizeBook:
+    def test_metrics_match_the_walker(self):
+        book = OrderBookSnapshot.from_ccxt({
+            'bids': [[99.7, 1000], [99.2, 1000]],
+            'asks': [[100.3, 1000], [100.8, 1000]]
+        }, exchange='venue', symbol='X/USDT')
+        row = summarize_book(book, sizes_usd=[100, 150000, 1000000], bands_bps=[50, 100],
+                             calculator=CostCalculator(exchange_fee_rate=0.0))
+        assert row['mid_price'] == 100.0 and row['spread_bps'] == pytest.approx(60.0)
+        # +/-50 bps reaches the top level on each side, +/-100 bps both levels
+        assert row['depth_50bps_usd'] == pytest.approx(99700 + 100300)
+        assert row['depth_100bps_usd'] == pytest.approx(99700 + 99200 + 100300 + 100800)
+        # Small trades cost half the spread on each side
+        assert row['cost_100_bps'] == pytest.approx(30.0)
+        assert 30.0 < row['cost_150k_bps'] < 80.0
+        assert math.isnan(row['cost_1m_bps'])
+
+    def test_size_labels(self):
+        assert [size_label(s) for s in (100000, 1000000, 5000000, 2500000, 250)] == ['100k', '1m', '5m', '2.5m', '250']
+
+
+class TestLiquidityScanner:
+    def test_scan_streams_every_market_on_every_venue(self):
+        symbols = {exc: ExchangeClient(exc, config=CONFIG).get_available_symbols(quote='USDT')
+                   for exc in ('sim', 'sim-scan')}
+        assert len(symbols['sim']) == 43
+        symbols['sim'] = symbols['sim'] + ['NOPE/USDT']
+        clients = [AsyncExchangeClient(exc, config=CONFIG) for exc in symbols]
+
+        async def main():
+            scanner = LiquidityScanner(clients, concurrency=4)
+            rows = [row async for row in scanner.scan(symbols)]
+            for client in clients:
+                await client.close()
+            return rows
+
+        rows = asyncio.run(main())
+        assert len(rows) == 87
+        assert {(r['exchange'], r['symbol']) for r in rows} == {(e, s) for e, syms in symbols.items() for s in syms}
+        failed = [r for r in rows if r['error'] is not None]
+        assert [(r['exchange'], r['symbol']) for r in failed] == [('sim', 'NOPE/USDT')]
+
+        ranked = rank_rows(rows)
+        assert len(ranked) == 86
+        costs = [r['cost_1m_bps'] for r in ranked]
+        finite = [c for c in costs if not math.isnan(c)]
+        assert finite == sorted(finite) and costs[:len(finite)] == finite
+        assert all(r['depth_100bps_usd'] >= r['depth_50bps_usd'] > 0 for r in ranked)
+
+    def test_stream_yields_in_the_calling_thread_and_stops_early(self):
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        try:
+            symbols = {'sim': ExchangeClient('sim', config=CONFIG).get_available_symbols(quote='USDT')}
+            scanner = LiquidityScanner([AsyncExchangeClient('sim', config=CONFIG)], concurrency=2)
+            stream = stream_scan(scanner, symbols, loop)
+            first = [next(stream) for _ in range(5)]
+            stream.close()
+            assert all(row['error'] is None for row in first)
+            assert len(list(stream_scan(scanner, symbols, loop))) == len(symbols['sim'])
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+import time
+import ccxt
+import pytest
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backend.exchange_client import AsyncExchangeClient, ExchangeClient
+from backend.metrics import metrics
+from backend.scheduler import HISTORY, LIVE, DeadlineExceeded, RateLimitScheduler, scheduler_for, venue_limits
+
+BTC_USDT = {'id': 'BTCUSDT', 'symbol': 'BTC/USDT', 'base': 'BTC', 'quote': 'USDT', 'baseId': 'BTC', 'quoteId': 'USDT',
+            'type': 'spot', 'spot': True, 'active': True, 'precision': {'amount': 5, 'price': 2}, 'limits': {}}
+
+
+def stub_transport(exchange, sent):
+    """Answers ccxt's HTTP layer (sync or async) with a one-level depth response and records each request's limit."""
+    def respond(url):
+        sent.append(int(url.split('limit=')[1].split('&')[0]))
+        return json.loads('{"lastUpdateId": 1, "bids": [["100.0", "1.0"]], "asks": [["101.0", "1.0"]]}')
+
+    def fetch(url, method='GET', headers=None, body=None):
+        return respond(url)
+
+    async def fetch_async(url, method='GET', headers=None, body=None):
+        return respond(url)
+
+    def throttle(cost=None):
+        raise AssertionError("ccxt throttled a scheduled request")
+
+    asynchronous = asyncio.iscoroutinefunction(exchange.fetch)
+    exchange.set_markets([BTC_USDT])
+    exchange.fetch = fetch_async if asynchronous else fetch
+    exchange.throttle = throttle
+
+
+class TestRateLimitScheduler:
+    def test_live_work_preempts_queued_history(self):
+        scheduler = RateLimitScheduler('venue', rate=10, burst=1)
+        order = []
+        scheduler.call(order.append, 'first')  # Empties the bucket
+
+        def submit(priority, tag):
+            thread = threading.Thread(target=scheduler.call, args=(order.append, tag), kwargs={'priority': priority})
+            thread.start()
+            time.sleep(0.01)  # Queue in submission order
+            return thread
+
+        threads = [submit(HISTORY, f'history-{i}') for i in range(4)]
+        threads.append(submit(LIVE, 'live'))
+        for thread in threads:
+            thread.join(5)
+
+        # The live call jumps every queued history call; history keeps FIFO order
+        assert order == ['first', 'live', 'history-0', 'history-1', 'history-2', 'history-3']
+        state = scheduler.describe()
+        assert state['queue_depth'] == {'live': 0, 'markets': 0, 'history': 0}
+        assert state['granted'] == 6 and state['queued'] == 5
+
+    def test_retries_with_backoff_and_pauses_on_429(self):
+        scheduler = RateLimitScheduler('venue', rate=100, burst=5, base_delay=0.02, seed=1)
+        attempts = []
+
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise ccxt.RateLimitExceeded("429 Too Many Requests")
+            if len(attempts) == 2:
+                raise ccxt.ExchangeNotAvailable("503 Service Unavailable")
+            return 'ok'
+
+        assert scheduler.call(flaky) == 'ok'
+        assert len(attempts) == 3
+        assert attempts[1] - attempts[0] >= 0.01  # Backoff is at least half the first step
+        assert scheduler.stats['retries'] == 2 and scheduler.stats['throttled'] == 1
+
+        # Errors that are not transient surface at once; retries stop at max_retries
+        with pytest.raises(ccxt.BadSymbol):
+            scheduler.call(lambda: (_ for _ in ()).throw(ccxt.BadSymbol("no such market")))
+        impatient = RateLimitScheduler('venue', max_retries=1, base_delay=0.001)
+        calls = []
+        with pytest.raises(ccxt.NetworkError):
+            impatient.call(lambda: calls.append(1) or (_ for _ in ()).throw(ccxt.NetworkError("down")))
+        assert len(calls) == 2
+
+    def test_deadline_drops_stale_work(self):
+        scheduler = RateLimitScheduler('venue', rate=2, burst=1)
+        scheduler.call(lambda: None)
+        sent = []
+        with pytest.raises(DeadlineExceeded):
+            scheduler.call(sent.append, 'stale', priority=HISTORY, deadline=0.05)
+        assert sent == [] and scheduler.stats['dropped'] == 1
+
+        async def main():
+            # Cancelled async waiters leave the queue too
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.acall(asyncio.sleep, 0), 0.05)
+            return scheduler.describe()['queue_depth']['live']
+
+        assert asyncio.run(main()) == 0
+
+    def test_clients_share_the_venue_scheduler(self):
+        config = {'rate_limit': 20, 'burst': 2, 'latency': 0.0, 'jitter': 0.0}
+        previous = metrics.enabled
+        metrics.reset()
+        metrics.enabled = True
+        try:
+            client = ExchangeClient('sim-sched', config=config)
+            async_client = AsyncExchangeClient('sim-sched', config=config)
+            assert client.scheduler is async_client.scheduler is scheduler_for('sim-sched', config)
+
+            # Paced to the venue's limit, so the simulated 429s never reach the caller
+            for _ in range(6):
+                assert len(client.fetch_order_book('BTC/USDT', limit=20).bid_prices) == 20
+
+            async def fetch():
+                async with async_client:
+                    return await asyncio.gather(*(async_client.fetch_order_book('ETH/USDT', limit=5) for _ in range(4)))
+
+            assert all(len(book.ask_prices) == 5 for book in asyncio.run(fetch()))
+            assert client.scheduler.stats['granted'] >= 10
+            assert metrics.histogram('scheduler_wait', exchange='sim-sched', priority='live').count >= 10
+            assert metrics.gauge_value('scheduler_queue_depth', exchange='sim-sched', priority='live') == 0
+            assert 'otc_scheduler_queue_depth{exchange="sim-sched",priority="live"} 0' in metrics.to_prometheus()
+        finally:
+            metrics.enabled = previous
+            metrics.reset()
+
+    def test_real_ccxt_requests_are_charged_by_endpoint_cost(self):
+        # binance weighs a depth request by its limit: 1 up to 100 levels, 50 for 5000
+        assert venue_limits('binance') == (pytest.approx(1000 / 50 * 0.9), 50)
+        scheduler = RateLimitScheduler('binance', rate=1000, burst=50)
+        client = ExchangeClient('binance', scheduler=scheduler)
+        assert client.exchange.enableRateLimit is False
+        sent = []
+        stub_transport(client.exchange, sent)
+
+        client.fetch_order_book('BTC/USDT', limit=5000)
+        assert scheduler.stats['cost'] == 50 and scheduler.tokens < 1
+
+        def history():
+            scheduler.call(client.exchange.fetch_order_book, 'BTC/USDT', limit=5000, priority=HISTORY,
+                           cost_key=('fetch_order_book', 5000))
+
+        threads = [threading.Thread(target=history) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        # Each queued history book needs a full bucket; the 1-unit live book goes as soon as one unit is back
+        client.fetch_order_book('BTC/USDT', limit=100)
+        for thread in threads:
+            thread.join(5)
+        assert sent == [5000, 100, 5000, 5000, 5000]
+        assert scheduler.stats['cost'] == 50 * 4 + 1
+
+        async def fetch_async():
+            async_client = AsyncExchangeClient('binance', scheduler=scheduler)
+            assert async_client.exchange.enableRateLimit is False
+            stub_transport(async_client.exchange, sent)
+            async with async_client:
+                return await async_client.fetch_order_book('BTC/USDT', limit=500)
+
+        assert len(asyncio.run(fetch_async()).bid_prices) == 1
+        assert sent[-1] == 500 and scheduler.stats['cost'] == 50 * 4 + 1 + 5